@@ -0,0 +1,282 @@
+"""A local stand-in for the 9kw.eu service.
+
+Implements the API actions the clients use closely enough to exercise
+them over real HTTP, with tunable solve delay, injected errors and
+rate limits. Point a client at it with ``base_url``, or skip the
+network with its in-memory :meth:`Fake9kw.transport`::
+
+    with Fake9kw(solve_delay=2) as server:
+        api = api9kw("testkey123", base_url=server.base_url)
+        api = api9kw("testkey123", transport=server.transport())
+"""
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Sequence, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from captcha9kw.captcha9kw import errors
+from captcha9kw.transport import (API_PATH, STATUS_PATH, MemoryResponse,
+                                  MemoryTransport)
+
+
+class Fake9kw:
+    """A threaded HTTP server answering like the 9kw.eu API.
+
+    Every submitted captcha is answered with ``answer-<id>`` once
+    ``solve_delay`` seconds have passed. Captchas put up with
+    :meth:`add_task` are handed out to solvers; their answers end up in
+    :attr:`solutions`.
+
+    Parameters
+    ----------
+    solve_delay : float, default 1
+        Seconds from submission until a captcha is solved.
+    jitter : float, default 0
+        Random extra seconds of solve delay, up to this many.
+    error_rate : float, default 0
+        Share of API requests answered with one of ``error_codes``.
+    error_codes : sequence of str, default ("0017",)
+        Error codes to inject.
+    rate_limit : float, default None
+        Submissions per second accepted; faster ones are refused with
+        error 0015. Unlimited by default.
+    credits : int, default 1000000
+        The account's starting balance.
+    workers : int, default 10
+        Number of workers reported in ``servercheck.json``.
+    host : str, default "127.0.0.1"
+    port : int, default 0
+        Where to listen; any free port by default.
+    """
+
+    def __init__(self, solve_delay: float = 1, jitter: float = 0, error_rate: float = 0, error_codes: Sequence[str] = ("0017",), rate_limit: float = None, credits: int = 1000000, workers: int = 10, host: str = "127.0.0.1", port: int = 0):
+        self.solve_delay = solve_delay
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.rate_limit = rate_limit
+        self.credits = credits
+        self.workers = workers
+        self.requests = Counter()
+        """Counter: Number of requests per API action."""
+        self.captchas = {}
+        """dict: Maps captcha IDs to the time they are solved at."""
+        self.tasks = deque()
+        """deque: IDs of the captchas waiting for a solver."""
+        self.images = {}
+        """dict: Maps the IDs of captchas to solve to their images."""
+        self.solutions = {}
+        """dict: Maps the IDs of solved captchas to their answers;
+        skipped ones go back to :attr:`tasks`."""
+        self.__ids = itertools.count(1)
+        self.__uploads = deque()
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer((host, port), _handler(self))
+        self.__server.daemon_threads = True
+        self.__thread = None
+
+    @property
+    def base_url(self) -> str:
+        """str: The base URL to give to the clients.
+        """
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """Start serving in a background thread.
+        """
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, name="fake9kw", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Stop serving and close the socket.
+        """
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def add_task(self, image: bytes) -> int:
+        """Put up a captcha for solvers, returning its ID.
+        """
+        with self.__lock:
+            id = next(self.__ids)
+            self.images[id] = image
+            self.tasks.append(id)
+        return id
+
+    def transport(self) -> MemoryTransport:
+        """A transport answering like this server, without the network.
+        """
+        def handler(method, url, params):
+            status, body = self.respond(urlsplit(url).path, params)
+            return MemoryResponse(body or b"", status)
+        return MemoryTransport(handler, self.base_url)
+
+    def respond(self, path: str, params: dict) -> Tuple[int, dict]:
+        """Answer a request for a path.
+
+        Returns
+        -------
+        tuple
+            The HTTP status code and the body, a dictionary or bytes,
+            None if not found.
+        """
+        path = path.lstrip("/")
+        if(path == STATUS_PATH):
+            return 200, self.status()
+        if(path == API_PATH):
+            body = self.handle(params)
+            if(isinstance(body, dict)):
+                body["status"] = {"success": "error" not in body}
+            return 200, body
+        return 404, None
+
+    def status(self) -> dict:
+        """The contents of ``servercheck.json``.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            queue = sum(1 for solved in self.captchas.values() if solved > now)
+        return {"queue": queue, "worker": self.workers, "inwork": min(queue, self.workers),
+                "avg1h": self.solve_delay + self.jitter / 2}
+
+    def handle(self, params: dict):
+        """Answer one API request.
+
+        Returns
+        -------
+        dict or bytes
+            The results, or ``error`` with an error code.
+        """
+        action = params.get("action", "")
+        with self.__lock:
+            self.requests[action] += 1
+        if(params.get("apikey") is None):
+            return _error("0002")
+        if(self.error_rate and random.random() < self.error_rate):
+            return _error(random.choice(self.error_codes))
+        handler = getattr(self, "_action_" + action, None)
+        if(handler is None):
+            return _error("0006")
+        return handler(params)
+
+    def _action_usercaptchaupload(self, params: dict) -> dict:
+        now = time.monotonic()
+        with self.__lock:
+            if(self.rate_limit is not None):
+                while(self.__uploads and self.__uploads[0] <= now - 1):
+                    self.__uploads.popleft()
+                if(len(self.__uploads) >= self.rate_limit):
+                    return _error("0015")
+                self.__uploads.append(now)
+            if(self.credits < 10):
+                return _error("0011")
+            self.credits -= 10 + int(params.get("prio") or 0)
+            id = next(self.__ids)
+            self.captchas[id] = now + self.solve_delay + \
+                random.uniform(0, self.jitter)
+        return {"captchaid": id}
+
+    def _action_usercaptchacorrectdata(self, params: dict) -> dict:
+        with self.__lock:
+            solved = self.captchas.get(int(params.get("id", 0)))
+        if(solved is None):
+            return _error("0018")
+        if(time.monotonic() < solved):
+            return {"answer": "", "try_again": 1, "timeout": 0}
+        return {"answer": "answer-{}".format(params["id"])}
+
+    def _action_usercaptchacorrectback(self, params: dict) -> dict:
+        with self.__lock:
+            if(int(params.get("id", 0)) not in self.captchas):
+                return _error("0018")
+        return {}
+
+    def _action_usercaptchanew(self, params: dict) -> dict:
+        with self.__lock:
+            if(not self.tasks):
+                return {"captchaid": ""}
+            id = self.tasks.popleft()
+        return {"captchaid": id, "text": 1, "mouse": 0, "confirm": 0, "interactive": 0}
+
+    def _action_usercaptchashow(self, params: dict):
+        with self.__lock:
+            image = self.images.get(int(params.get("id", 0)))
+        if(image is None):
+            return "0008 No captcha found".encode()
+        return image
+
+    def _action_usercaptchacorrect(self, params: dict) -> dict:
+        id = int(params.get("id", 0))
+        with self.__lock:
+            if(id not in self.images or id in self.solutions):
+                return _error("0012")
+            if(params.get("skip") in (1, "1")):
+                self.tasks.append(id)
+                return {}
+            self.solutions[id] = params.get("captcha")
+            self.credits += 1
+        return {}
+
+    def _action_usercaptchaguthaben(self, params: dict) -> dict:
+        with self.__lock:
+            return {"credits": self.credits}
+
+    def _action_userconfig(self, params: dict) -> dict:
+        return {"id": 1, "selfonly": 0, "selfsend": 0, "selfsolve": 0}
+
+    def _action_userhistory(self, params: dict) -> dict:
+        return _error("0006")
+
+
+def _error(code: str) -> dict:
+    return {"error": f"{code} {errors.get(code, '')}".strip()}
+
+
+def _handler(server: Fake9kw):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.__respond()
+
+        def do_POST(self):
+            self.__respond()
+
+        def log_message(self, format, *args):
+            pass
+
+        def __respond(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            while(length > 0):
+                length -= len(self.rfile.read(min(length, 65536)))
+            url = urlsplit(self.path)
+            status, body = server.respond(
+                url.path, dict(parse_qsl(url.query)))
+            if(body is None):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            data, type = body, "application/octet-stream"
+            if(isinstance(body, dict)):
+                data, type = json.dumps(body).encode(), "application/json"
+            self.send_response(status)
+            self.send_header("Content-Type", type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
@@ -0,0 +1,161 @@
+"""Benchmarks of the client against the local stand-in server.
+
+Run from the repository's root::
+
+    python -m benchmarks.run
+    python -m benchmarks.run --save baseline.json
+    python -m benchmarks.run --baseline baseline.json --tolerance 0.2
+
+With ``--baseline``, the exit status is 1 if any result is worse than
+the baseline by more than the tolerance.
+"""
+import argparse
+import base64
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import wait
+
+from captcha9kw import api9kw, LatencyStats, MetricsRecorder
+from captcha9kw.latency import _quantile
+
+from .fake9kw import Fake9kw
+
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==")
+
+HIGHER_IS_BETTER = {"submit_per_second", "memory_submit_per_second"}
+"""Results that improve as they grow; all others improve as they
+shrink."""
+
+
+def _client(server: Fake9kw, **options) -> api9kw:
+    stats = LatencyStats(default_delay=0.2, interval=0.2, min_interval=0.05)
+    return api9kw("benchmark1", base_url=server.base_url, latency_stats=stats, backoff=0.01, **options)
+
+
+def bench_submit(count: int, concurrency: int, memory: bool = False) -> dict:
+    """Throughput of :meth:`api9kw.submit_image_captchas`, over HTTP or,
+    to measure the client alone, through an in-memory transport.
+    """
+    with Fake9kw() as server:
+        options = {"transport": server.transport()} if memory else {
+            "pool_size": concurrency}
+        with _client(server, **options) as api:
+            start = time.perf_counter()
+            results = list(api.submit_image_captchas(
+                [PNG] * count, concurrency=concurrency))
+            elapsed = time.perf_counter() - start
+    failed = sum(isinstance(id, Exception) for _, id in results)
+    prefix = "memory_" if memory else ""
+    return {prefix + "submit_per_second": count / elapsed, prefix + "submit_failures": failed}
+
+
+def bench_answers(count: int, solve_delay: float) -> dict:
+    """Latency from submission to answer and polls per captcha through
+    :meth:`api9kw.solve_image_captcha`.
+    """
+    recorder = MetricsRecorder()
+    with Fake9kw(solve_delay=solve_delay, jitter=solve_delay / 2) as server, _client(server, hooks=[recorder]) as api:
+        futures, latencies = [], []
+        for _ in range(count):
+            start = time.perf_counter()
+            future = api.solve_image_captcha(PNG, maxtimeout=60)
+            future.add_done_callback(
+                lambda f, start=start: latencies.append(time.perf_counter() - start))
+            futures.append(future)
+        wait(futures)
+        polls = server.requests["usercaptchacorrectdata"]
+    latencies.sort()
+    return {"answer_p50_seconds": _quantile(latencies, 0.5),
+            "answer_p90_seconds": _quantile(latencies, 0.9),
+            "answer_overshoot_seconds": _quantile(latencies, 0.5) - solve_delay * 1.25,
+            "polls_per_captcha": polls / count}
+
+
+def bench_memory(count: int) -> dict:
+    """Memory held per captcha waited on by the :class:`AnswerPoller`.
+    """
+    with Fake9kw(solve_delay=3600) as server, _client(server) as api:
+        ids = [api.submit_image_captcha(PNG) for _ in range(count)]
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        futures = [api.get_answer_future(id, timeout=3600) for id in ids]
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        used = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+        for future in futures:
+            future.cancel()
+    return {"bytes_per_inflight_captcha": used / count}
+
+
+def bench_import(repeat: int) -> dict:
+    """Seconds it takes to import the client in a fresh interpreter.
+    """
+    code = "import time; t = time.perf_counter(); from captcha9kw import api9kw; print(time.perf_counter() - t)"
+    times = sorted(float(subprocess.check_output([sys.executable, "-c", code]))
+                   for _ in range(repeat))
+    return {"import_seconds": times[len(times) // 2]}
+
+
+def run(quick: bool = False) -> dict:
+    """Run all benchmarks.
+    """
+    scale = 1 if quick else 10
+    results = {}
+    results.update(bench_submit(20 * scale, 8))
+    results.update(bench_submit(100 * scale, 8, memory=True))
+    results.update(bench_answers(5 * scale, 0.5))
+    results.update(bench_memory(100 * scale))
+    results.update(bench_import(3 if quick else 7))
+    return results
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """Names of the results worse than the baseline by more than the
+    tolerance, a share of the baseline value.
+    """
+    worse = []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if(base is None or value is None):
+            continue
+        margin = abs(base) * tolerance
+        if(name in HIGHER_IS_BETTER and value < base - margin):
+            worse.append(name)
+        elif(name not in HIGHER_IS_BETTER and value > base + margin):
+            worse.append(name)
+    return worse
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller workloads")
+    parser.add_argument("--save", metavar="FILE",
+                        help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="compare with earlier results")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed share of regression, default 0.2")
+    args = parser.parse_args(argv)
+
+    results = run(args.quick)
+    for name, value in results.items():
+        print(f"{name:28} {value:12.4f}")
+    if(args.save):
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if(args.baseline):
+        with open(args.baseline) as file:
+            worse = regressions(results, json.load(file), args.tolerance)
+        if(worse):
+            print("Regressed: " + ", ".join(worse))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
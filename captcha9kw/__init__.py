@@ -1,10 +1,60 @@
-import sys
-if(sys.version_info >= (3, 8)):
-    from importlib.metadata import version
-else:
-    from importlib_metadata import version
+import importlib
 
-__version__ = version(__package__)
+_exports = {
+    "api9kw": "captcha9kw", "APIError": "captcha9kw",
+    "CaptchaError": "captcha9kw", "FatalAPIError": "captcha9kw",
+    "RetryableAPIError": "captcha9kw",
+    "asyncapi9kw": "asyncapi9kw",
+    "AnswerCache": "cache",
+    "CancelToken": "cancel",
+    "CaptchaKind": "latency", "LatencyStats": "latency",
+    "CreditLedger": "ledger",
+    "LoadController": "load",
+    "FeedbackDispatcher": "feedback",
+    "Journal": "journal",
+    "HedgedSolver": "hedge",
+    "MetricsRecorder": "metrics",
+    "HistoryMirror": "mirror",
+    "KeyPool": "pool",
+    "ImageOptimizer": "optimize", "OptimizationReport": "optimize",
+    "AnswerPoller": "poller",
+    "RateLimiter": "ratelimit", "TokenBucket": "ratelimit",
+    "HttpxTransport": "transport", "MemoryResponse": "transport",
+    "MemoryTransport": "transport", "RequestsTransport": "transport",
+    "Transport": "transport",
+    "SolverTask": "worker", "SolverWorker": "worker",
+}
+"""Maps every public name to the submodule defining it; submodules
+are only imported on first access, to keep ``import captcha9kw``
+cheap."""
 
-from .captcha9kw import api9kw, CaptchaError
-__all__ = ["api9kw", "CaptchaError"]
+__all__ = ["api9kw", "asyncapi9kw", "AnswerCache", "AnswerPoller",
+           "APIError", "CaptchaError", "CaptchaKind", "CreditLedger",
+           "FatalAPIError", "HistoryMirror", "ImageOptimizer",
+           "LatencyStats", "LoadController", "MetricsRecorder",
+           "OptimizationReport", "RateLimiter",
+           "RetryableAPIError", "TokenBucket", "HttpxTransport",
+           "MemoryResponse", "MemoryTransport", "RequestsTransport",
+           "Transport", "SolverTask", "SolverWorker", "KeyPool", "Journal",
+           "FeedbackDispatcher", "HedgedSolver", "CancelToken"]
+
+
+def __getattr__(name):
+    if(name == "__version__"):
+        import sys
+        if(sys.version_info >= (3, 8)):
+            from importlib.metadata import version
+        else:
+            from importlib_metadata import version
+        value = version(__name__)
+    elif(name in _exports):
+        module = importlib.import_module("." + _exports[name], __name__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports) | {"__version__"})
@@ -0,0 +1,539 @@
+"""An asyncio-native counterpart to :class:`captcha9kw.api9kw`.
+"""
+import asyncio
+import io
+import re
+import time
+from collections import OrderedDict
+from typing import Tuple, Union
+
+from .cancel import CancelToken
+from .captcha9kw import (BASE_URL, CaptchaError, _parse_response,
+                         _prepare_params, _service_urls)
+from .image import open_image
+from .latency import CaptchaKind, LatencyStats, captcha_kind
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class asyncapi9kw:
+    """Class for accessing and using the 9kw.eu API from asyncio code.
+
+    Mirrors :class:`api9kw`, but every method that talks to the service
+    is a coroutine and every property that does so returns an
+    awaitable, e.g. ``await api.balance``. Settings that are properties
+    with setters in :class:`api9kw` have ``set_*`` coroutines instead.
+
+    All requests go through a single pooled ``httpx.AsyncClient``, so
+    one event loop can keep a large number of captchas in flight.
+    Requires the optional ``httpx`` dependency, i.e.
+    ``pip install captcha9kw[async]``.
+
+    Parameters
+    ----------
+    api_key : str, default None
+        The API key for 9kw.eu services.
+    client : httpx.AsyncClient, default None
+        An existing client to share between several instances. If not
+        given, one is created and owned by this instance.
+    max_connections : int, default 100
+        Maximum number of simultaneous connections in the pool, when
+        the client is created by this instance.
+    timeout : tuple of float, default (5, 3)
+        Connect and read timeouts in seconds, when the client is
+        created by this instance.
+    latency_stats : LatencyStats, default None
+        Solve-time statistics to schedule answer polls with. A new one
+        is created if not given.
+    base_url : str, default "https://www.9kw.eu/"
+        Where the service is, e.g. a local stand-in for testing.
+    """
+    __api_key: str = None
+    __name: str = "captcha9kw"
+    __client = None
+    __own_client: bool = False
+    __latency_stats: LatencyStats = None
+    __submissions: OrderedDict = None
+    __max_submissions: int = 10000
+    __base_url: str = BASE_URL
+
+    def __init__(self, api_key: str = None, client=None, max_connections: int = 100, timeout: Tuple[float, float] = (5, 3), latency_stats: LatencyStats = None, base_url: str = BASE_URL):
+        if(httpx is None):
+            raise ImportError(
+                "asyncapi9kw requires httpx: pip install captcha9kw[async]")
+        if(api_key is not None):
+            self.api_key = api_key
+        if(client is None):
+            limits = httpx.Limits(max_connections=max_connections,
+                                  max_keepalive_connections=max_connections)
+            client = httpx.AsyncClient(
+                limits=limits, timeout=httpx.Timeout(timeout[1], connect=timeout[0]))
+            self.__own_client = True
+        self.__client = client
+        self.__latency_stats = latency_stats or LatencyStats()
+        self.__submissions = OrderedDict()
+        self.__base_url = base_url
+        self.__api_url, self.__status_url = _service_urls(base_url)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the underlying HTTP client, if owned by this instance.
+        """
+        if(self.__own_client and self.__client is not None):
+            await self.__client.aclose()
+
+    @property
+    def account_id(self):
+        """Awaitable[int]: The ID number of the account the API key
+        belongs to.
+        """
+        return self.__setting_int("id")
+
+    @property
+    def api_key(self):
+        """str: The API key for 9kw.eu services.
+
+        The API key must be a string consisting only of characters
+        ``a-z``, ``A-Z`` and/or ``0-9``, with a minimum length of 5
+        and a maximum length of 50.
+        """
+        return self.__api_key
+
+    @api_key.setter
+    def api_key(self, key: str):
+        if(type(key) is not str):
+            raise TypeError("Incorrect type: API key must be a string.")
+        if(re.fullmatch(r"[a-zA-Z\d]*", key) and len(key) >= 5 and len(key) <= 50):
+            self.__api_key = key
+            return None
+        else:
+            raise ValueError(
+                "Invalid API key: minimum length is 5, maximum length is 50. Only a-z, A-Z and 0-9 allowed.")
+
+    @property
+    def base_url(self):
+        """str: Where the service is.
+        """
+        return self.__base_url
+
+    @property
+    def balance(self):
+        """Awaitable[int]: The account's balance.
+        """
+        return self.__balance()
+
+    @property
+    def latency_stats(self):
+        """LatencyStats: Observed solve times per kind of captcha, used
+        to schedule answer polls.
+        """
+        return self.__latency_stats
+
+    @property
+    def name(self):
+        """str: The name this software should identify itself as to
+        the services.
+
+        Parameter ``source`` in the `the official API documentation`_,
+        defaults to ``captcha9kw``. Must be in the range of 5 to 30
+        characters long.
+        """
+        return self.__name
+
+    @name.setter
+    def name(self, name: str):
+        if(type(name) is not str):
+            raise TypeError("Incorrect type: name must be a string.")
+        if(len(name) > 30):
+            raise ValueError("Name too long. Maximum length is 30 characters.")
+        self.__name = name
+
+    @property
+    def referrals(self):
+        """Awaitable[list]: The account's list of referrals.
+        """
+        params = {"action": "userconfigref",
+                  "json": 1, "apikey": self.__api_key, "source": self.__name}
+        return self.__apiGetKey(params, "refs")
+
+    @property
+    def referrals_archived(self):
+        """Awaitable[list]: The account's list of referrals, including
+        archived ones.
+        """
+        params = {"action": "userconfigref",
+                  "json": 1, "apikey": self.__api_key, "source": self.__name, "archiv": 1}
+        return self.__apiGetKey(params, "refs")
+
+    @property
+    def selfonly(self):
+        """Awaitable[int]: Corresponds to `selfonly` in account
+        settings.
+        """
+        return self.__setting_int("selfonly")
+
+    @property
+    def selfsend(self):
+        """Awaitable[int]: Corresponds to `selfsend` in account
+        settings.
+        """
+        return self.__setting_int("selfsend")
+
+    @property
+    def selfsolve(self):
+        """Awaitable[int]: Corresponds to `selfsolve` in account
+        settings.
+        """
+        return self.__setting_int("selfsolve")
+
+    @property
+    def settings(self):
+        """Awaitable[dict]: All the account-related settings.
+        """
+        return self.__settings()
+
+    @property
+    def service_status(self):
+        """Awaitable[dict]: Information about the service's status.
+        """
+        return self.__service_status()
+
+    @property
+    def source(self):
+        """str: The name this software should identify itself as to
+        the services.
+
+        Alias of :attr:`name`.
+        """
+        return self.__name
+
+    @source.setter
+    def source(self, name: str):
+        if(type(name) is not str):
+            raise TypeError("Incorrect type: The name must be a string.")
+        if(len(name) > 30):
+            raise ValueError(
+                "Name too long. The maximum length is 30 characters.")
+        self.__name = name
+
+    async def __apiGet(self, params):
+        if(not self.__api_key):
+            raise ValueError("API key has not been set.")
+        _prepare_params(params)
+        results = await self.__client.get(self.__api_url, params=params)
+        return _parse_response(results)
+
+    async def __apiGetKey(self, params, key):
+        return (await self.__apiGet(params))[key]
+
+    async def __apiPost(self, params, files):
+        if(not self.__api_key):
+            raise ValueError("API key has not been set.")
+        _prepare_params(params)
+        results = await self.__client.post(self.__api_url, params=params, files=files)
+        return _parse_response(results)
+
+    def __submitted(self, id: int, kind: CaptchaKind):
+        self.__submissions[id] = (kind, time.monotonic())
+        while(len(self.__submissions) > self.__max_submissions):
+            self.__submissions.popitem(last=False)
+
+    def __solved(self, id: int, last_miss: float = None):
+        submission = self.__submissions.pop(id, None)
+        if(submission is None):
+            return
+        elapsed = time.monotonic() - submission[1]
+        if(last_miss is not None):
+            elapsed = (last_miss + elapsed) / 2
+        self.__latency_stats.record(submission[0], elapsed)
+
+    async def __sleep(self, id: int, seconds: float, deadline: float = None, token: CancelToken = None):
+        if(deadline is not None):
+            seconds = min(seconds, deadline - time.monotonic())
+        seconds = max(0, seconds)
+        cancelled = token is not None and token.cancelled
+        if(token is not None and not cancelled):
+            loop = asyncio.get_running_loop()
+            event = asyncio.Event()
+
+            def wake():
+                loop.call_soon_threadsafe(event.set)
+            token.add_callback(wake)
+            try:
+                await asyncio.wait_for(event.wait(), seconds)
+                cancelled = True
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                token.remove_callback(wake)
+        elif(not cancelled):
+            await asyncio.sleep(seconds)
+        expired = deadline is not None and time.monotonic() >= deadline
+        if(not (cancelled or expired)):
+            return
+        try:
+            await self.captcha_cancel_submitted(id)
+        except Exception:
+            pass
+        if(cancelled):
+            raise CaptchaError("Cancelled waiting for answer to captcha.")
+        raise CaptchaError("Deadline passed waiting for answer to captcha.")
+
+    async def __balance(self):
+        params = {"action": "usercaptchaguthaben",
+                  "apikey": self.__api_key, "json": 1}
+        return (await self.__apiGet(params))["credits"]
+
+    async def __service_status(self):
+        results = await self.__client.get(self.__status_url)
+        if(results.status_code == 200):
+            return results.json()
+        else:
+            raise RuntimeError(
+                f"Connection error: {results.status_code}, '{results.reason_phrase}'.")
+
+    async def __settings(self, key=None, value=None):
+        if(value is None):
+            params = {"action": "userconfig",
+                      "apikey": self.__api_key, "json": 1}
+            results = await self.__apiGet(params)
+            return results if key is None else results[key]
+        params = {"action": f"userconfig{key}",
+                  "apikey": self.__api_key, "json": 1, key: value}
+        await self.__apiGet(params)
+
+    async def __setting_int(self, key):
+        return int(await self.__settings(key))
+
+    async def __set_flag(self, key, value):
+        if(type(value) not in [bool, int]):
+            raise TypeError("Argument is not an int.")
+        if(value not in [0, 1]):
+            raise ValueError("Argument value out of range (0 to 1).")
+        await self.__settings(key, int(value))
+
+    async def set_selfonly(self, value: int):
+        """Set `selfonly` in account settings, see :attr:`api9kw.selfonly`.
+        """
+        await self.__set_flag("selfonly", value)
+
+    async def set_selfsend(self, value: int):
+        """Set `selfsend` in account settings, see :attr:`api9kw.selfsend`.
+        """
+        await self.__set_flag("selfsend", value)
+
+    async def set_selfsolve(self, value: int):
+        """Set `selfsolve` in account settings, see
+        :attr:`api9kw.selfsolve`.
+        """
+        await self.__set_flag("selfsolve", value)
+
+    async def captcha_cancel_submitted(self, id: int):
+        """Cancel the already-submitted captcha.
+
+        See :meth:`api9kw.captcha_cancel_submitted`.
+        """
+        params = {"action": "usercaptchacorrectback", "json": 1,
+                  "id": id, "apikey": self.__api_key, "correct": 3, "source": self.__name}
+        await self.__apiGet(params)
+
+    async def captcha_details(self, id: int, archive: int = 0) -> dict:
+        """Query for details on a submitted captcha.
+
+        See :meth:`api9kw.captcha_details`.
+        """
+        params = {"action": "userhistorydetail", "json": 1,
+                  "apikey": self.__api_key, "id": id, "archiv": archive}
+        return await self.__apiGet(params)
+
+    async def captcha_feedback_correct(self, id: int, archive: int = 0):
+        """Mark the answer for the captcha as correct.
+
+        See :meth:`api9kw.captcha_feedback_correct`.
+        """
+        params = {"action": "usercaptchacorrectback", "json": 1,
+                  "id": id, "archiv": archive, "apikey": self.__api_key, "correct": 1, "source": self.__name}
+        await self.__apiGet(params)
+
+    async def captcha_feedback_incorrect(self, id: int, archive: int = 0):
+        """Mark the answer for the captcha as incorrect.
+
+        See :meth:`api9kw.captcha_feedback_incorrect`.
+        """
+        params = {"action": "usercaptchacorrectback", "json": 1,
+                  "id": id, "archiv": archive, "apikey": self.__api_key, "correct": 2, "source": self.__name}
+        await self.__apiGet(params)
+
+    async def captchas_failed(self, archive: int = 0, page: int = 0, onlyapikey: int = 0) -> dict:
+        """Query the list of failed or incorrect captchas associated
+        with the account.
+
+        See :meth:`api9kw.captchas_failed`.
+        """
+        params = {"action": "userhistory3",
+                  "json": 1, "apikey": self.__api_key, "archiv": archive, "page": page, "onlyapikey": onlyapikey}
+        return await self.__apiGet(params)
+
+    async def captchas_solved(self, source: str = None, correctsource: str = None, archive: int = 0, filter: str = None, confirm: int = 0, page: int = 0, onlyapikey: int = 0) -> dict:
+        """Query the list of captchas solved by the account.
+
+        See :meth:`api9kw.captchas_solved`.
+        """
+        params = {"action": "userhistory2",
+                  "json": 1, "apikey": self.__api_key}
+        for x in ["source", "correctsource", "archive", "filter", "confirm", "onlyapikey", "page"]:
+            if(locals()[x] is not None):
+                if(x == "archive"):
+                    params["archiv"] = locals()[x]
+                else:
+                    params[x] = locals()[x]
+        return await self.__apiGet(params)
+
+    async def captchas_submitted(self, source: str = None, correctsource: str = None, archive: int = 0, filter: str = None, page: int = 0, onlyapikey: int = 0) -> dict:
+        """Query the captchas submitted by the account to the service.
+
+        See :meth:`api9kw.captchas_submitted`.
+        """
+        params = {"action": "userhistory", "json": 1, "apikey": self.__api_key}
+        for x in ["source", "correctsource", "archive", "filter", "page", "onlyapikey"]:
+            if(locals()[x] is not None):
+                if(x == "archive"):
+                    params["archiv"] = locals()[x]
+                else:
+                    params[x] = locals()[x]
+        return await self.__apiGet(params)
+
+    async def create_account(self, credits: int, referrer: Union[int, str] = None) -> Tuple[str, str]:
+        """Create a new account while also transferring some credits
+        to it.
+
+        See :meth:`api9kw.create_account`.
+        """
+        params = {"action": "anmelden2_create",
+                  "json": 1, "apikey": self.__api_key, "source": self.__name, "code": credits}
+        if(referrer is not None):
+            params["ref"] = str(referrer)
+        results = await self.__apiGet(params)
+        return (results["newuser"], results["newpass"])
+
+    async def create_coupon(self, credits: int) -> str:
+        """Create a coupon code of credits from the account's balance.
+
+        See :meth:`api9kw.create_coupon`.
+        """
+        params = {"action": "usergutscheincreate",
+                  "json": 1, "apikey": self.__api_key, "source": self.__name, "guthaben": credits}
+        return (await self.__apiGet(params))["code"]
+
+    async def get_answer(self, id: int, archive: int = 0, wait: int = 0, deadline: float = None, token: CancelToken = None) -> str:
+        """Check for and receive the answer to a captcha.
+
+        Waiting does not block the event loop, so any number of
+        answers can be awaited concurrently. Polls are timed after
+        :attr:`latency_stats`. When the ``deadline`` passes or the
+        ``token`` is cancelled, waiting stops at once and the captcha
+        is withdrawn. See :meth:`api9kw.get_answer`.
+
+        Raises
+        ------
+        CaptchaError
+            Raised when a successfully submitted, active captcha times
+            out or encounters an other error, or when the ``deadline``
+            passes or the ``token`` is cancelled first.
+        """
+        params = {"action": "usercaptchacorrectdata", "json": 1,
+                  "id": id, "archiv": archive, "apikey": self.__api_key, "source": self.__name}
+        if(wait):
+            kind, submitted = self.__submissions.get(
+                id, (captcha_kind(), time.monotonic()))
+            last_miss = None
+            try:
+                for offset in self.__latency_stats.poll_offsets(kind, time.monotonic() - submitted):
+                    await self.__sleep(id, submitted + offset - time.monotonic(), deadline, token)
+                    results = await self.__apiGet(dict(params))
+                    if("answer" in results and results["answer"]):
+                        self.__solved(id, last_miss)
+                        return results["answer"]
+                    if("try_again" in results and not results["try_again"]):
+                        raise CaptchaError(
+                            "Timeout waiting for answer to captcha.")
+                    if("timeout" in results and results["timeout"]):
+                        raise CaptchaError(
+                            "Timeout waiting for answer to captcha.")
+                    last_miss = time.monotonic() - submitted
+            finally:
+                self.__submissions.pop(id, None)
+        else:
+            await self.__sleep(id, 0, deadline, token)
+            results = await self.__apiGet(params)
+            if("answer" in results):
+                if(results["answer"]):
+                    self.__solved(id)
+                return results["answer"]
+            else:
+                return ""
+
+    async def submit_image_captcha(self, data: Union[str, bytes, io.IOBase], maxtimeout: int = 600, prio: int = 0, confirm: int = 0, selfsolve: int = 0, nomd5: int = 0, ocr: int = 0, debug: int = 0) -> int:
+        """Submit an image-based captcha.
+
+        URLs are downloaded with the shared client and everything else
+        is read with :func:`open_image` in the default executor. See
+        :meth:`api9kw.submit_image_captcha`.
+        """
+        if(isinstance(data, str)):
+            import validators
+            if(validators.url(data)):
+                results = await self.__client.get(data, follow_redirects=True)
+                if(results.status_code != 200):
+                    raise RuntimeError(
+                        f"Error downloading image from given URL ('{data}')")
+                data = results.content
+
+        def read():
+            image = open_image(data)
+            try:
+                return image.read()
+            finally:
+                if(image is not data):
+                    image.close()
+        results = await asyncio.get_event_loop().run_in_executor(None, read)
+        params = {"action": "usercaptchaupload", "base64": 0, "json": 1,
+                  "maxtimeout": maxtimeout, "prio": prio, "selfsolve": selfsolve, "confirm": confirm, "apikey": self.__api_key, "nomd5": nomd5, "source": self.__name, "ocr": ocr, "debug": debug}
+        files = {"file-upload-01": results}
+        id = int((await self.__apiPost(params, files))["captchaid"])
+        self.__submitted(id, captcha_kind(0, prio, confirm))
+        return id
+
+    async def submit_interactive_captcha(self, sitekey: str, pageurl: str = None, captchatype: str = None, cookies: str = None, useragent: str = None, maxtimeout: int = 600, prio: int = 0, selfsolve: int = 0, confirm: int = 0, debug: int = 0) -> int:
+        """Submit an interactive captcha, like e.g. reCaptcha V2.
+
+        See :meth:`api9kw.submit_interactive_captcha`.
+        """
+        params = {"action": "usercaptchaupload", "json": 1, "maxtimeout": maxtimeout,
+                  "prio": prio, "selfsolve": selfsolve, "confirm": confirm, "apikey": self.__api_key, "interactive": 1, "source": self.__name}
+        files = {"file-upload-01": (None, sitekey)}
+        if(captchatype):
+            params["oldsource"] = captchatype
+        for x in ["cookies", "useragent", "pageurl", "debug"]:
+            if(locals()[x] is not None):
+                params[x] = locals()[x]
+        id = int((await self.__apiPost(params, files))["captchaid"])
+        self.__submitted(id, captcha_kind(1, prio, confirm))
+        return id
+
+    async def transfer_credits(self, credits: int, userid: int, transferart: int = 1) -> int:
+        """Transfer credits to another account.
+
+        See :meth:`api9kw.transfer_credits`.
+        """
+        params = {"action": "usertransfer",
+                  "json": 1, "apikey": self.__api_key, "source": self.__name, "guthaben": credits, "userid": userid, "transferart": transferart}
+        return int((await self.__apiGet(params))["transferid"])
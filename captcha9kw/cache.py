@@ -0,0 +1,131 @@
+"""A local cache of answers to already-solved image captchas.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class AnswerCache:
+    """Remember answers by a hash of the image they were for, so the
+    same captcha seen again is answered instantly and without cost.
+
+    Entries are evicted least-recently-used first once there are more
+    than ``max_entries``, and expire after ``ttl`` seconds. An entry is
+    dropped when its answer is reported as incorrect, see
+    :meth:`api9kw.captcha_feedback_incorrect`.
+
+    Parameters
+    ----------
+    max_entries : int, default 10000
+        Maximum number of answers to keep.
+    ttl : float, default None
+        Seconds after which an answer expires. Never by default.
+    path : str, default None
+        File of an SQLite database to keep the answers in, so they
+        survive restarts. Kept only in memory by default.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = None, path: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.__entries = OrderedDict()
+        self.__ids = {}
+        self.__lock = threading.Lock()
+        self.__db = None
+        if(path is not None):
+            import sqlite3
+            self.__db = sqlite3.connect(path, check_same_thread=False)
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT NOT NULL, created REAL NOT NULL, captcha_id INTEGER)")
+            self.__db.commit()
+            rows = self.__db.execute(
+                "SELECT key, answer, created, captcha_id FROM answers ORDER BY created DESC LIMIT ?", (max_entries,)).fetchall()
+            for key, answer, created, id in reversed(rows):
+                self.__entries[key] = (answer, created, id)
+                if(id is not None):
+                    self.__ids[id] = key
+
+    @staticmethod
+    def key_for(data: bytes) -> str:
+        """The cache key of some image data.
+        """
+        return hashlib.sha256(data).hexdigest()
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries)
+
+    def get(self, key: str) -> str:
+        """The cached answer for a key, or None.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if(entry is None):
+                return None
+            if(self.ttl is not None and time.time() - entry[1] > self.ttl):
+                self.__remove(key)
+                return None
+            self.__entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, answer: str, id: int = None):
+        """Cache an answer.
+
+        Parameters
+        ----------
+        key : str
+            The key, see :meth:`key_for`.
+        answer : str
+            The answer to the captcha.
+        id : int, default None
+            ID of the captcha the answer came from, so reporting it as
+            incorrect drops the answer.
+        """
+        created = time.time()
+        with self.__lock:
+            if(key in self.__entries):
+                self.__remove(key)
+            self.__entries[key] = (answer, created, id)
+            if(id is not None):
+                self.__ids[id] = key
+            if(self.__db is not None):
+                self.__db.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)",
+                                  (key, answer, created, id))
+            while(len(self.__entries) > self.max_entries):
+                self.__remove(next(iter(self.__entries)))
+            if(self.__db is not None):
+                self.__db.commit()
+
+    def invalidate(self, key: str):
+        """Drop the answer for a key.
+        """
+        with self.__lock:
+            self.__remove(key)
+            if(self.__db is not None):
+                self.__db.commit()
+
+    def invalidate_id(self, id: int):
+        """Drop the answer that came from the captcha with this ID.
+        """
+        with self.__lock:
+            key = self.__ids.get(id)
+            if(key is not None):
+                self.__remove(key)
+                if(self.__db is not None):
+                    self.__db.commit()
+
+    def close(self):
+        """Close the database, if one is in use.
+        """
+        with self.__lock:
+            if(self.__db is not None):
+                self.__db.close()
+                self.__db = None
+
+    def __remove(self, key: str):
+        entry = self.__entries.pop(key, None)
+        if(entry is not None and entry[2] is not None):
+            self.__ids.pop(entry[2], None)
+        if(self.__db is not None):
+            self.__db.execute("DELETE FROM answers WHERE key = ?", (key,))
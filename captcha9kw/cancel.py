@@ -0,0 +1,65 @@
+"""Cancellation tokens for giving up on answers.
+"""
+import threading
+from typing import Callable
+
+
+class CancelToken:
+    """A flag set once to give up waiting for answers, e.g. when the
+    request a captcha was solved for has been abandoned upstream.
+
+    Pass the same token to any number of calls of
+    :meth:`api9kw.get_answer`, :meth:`api9kw.get_answer_future` or
+    :meth:`asyncapi9kw.get_answer`; cancelling it stops all of them at
+    once and withdraws their captchas with
+    :meth:`api9kw.captcha_cancel_submitted`. Safe to use from any
+    thread.
+    """
+
+    def __init__(self):
+        self.__event = threading.Event()
+        self.__callbacks = []
+        self.__lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """bool: Whether :meth:`cancel` has been called.
+        """
+        return self.__event.is_set()
+
+    def cancel(self):
+        """Set the flag and call the callbacks, once.
+        """
+        with self.__lock:
+            if(self.__event.is_set()):
+                return
+            self.__event.set()
+            callbacks, self.__callbacks = self.__callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def wait(self, timeout: float = None) -> bool:
+        """Sleep until cancelled or for ``timeout`` seconds, returning
+        whether the token was cancelled.
+        """
+        return self.__event.wait(timeout)
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Call ``callback`` without arguments on cancellation, or right
+        away if already cancelled.
+        """
+        with self.__lock:
+            if(not self.__event.is_set()):
+                self.__callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]):
+        """Forget a callback added with :meth:`add_callback`.
+        """
+        with self.__lock:
+            if(callback in self.__callbacks):
+                self.__callbacks.remove(callback)
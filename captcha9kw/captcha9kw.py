@@ -1,14 +1,27 @@
 """The basic business-logic of captcha9kw.
 """
-import requests
-from typing import Tuple, Union
+from typing import TYPE_CHECKING, Iterable, Iterator, Tuple, Union
 import re
-import base64
-import filetype
 import io
-import validators
-import pathlib
+import threading
 import time
+from collections import OrderedDict, deque
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                wait)
+from .cache import AnswerCache
+from .cancel import CancelToken
+from .image import ImageSource, MultipartBody, open_image
+from .journal import Journal
+from .latency import CaptchaKind, LatencyStats, captcha_kind
+from .ledger import CreditLedger
+from .load import LoadController
+from .metrics import Hook, emit
+from .optimize import ImageOptimizer
+from .ratelimit import RateLimiter
+from .transport import (API_PATH, BASE_URL, STATUS_PATH, RequestsTransport,
+                        Transport)
+if(TYPE_CHECKING):
+    import requests
 
 errors = {
     "0001": "API key doesn't exist",
@@ -71,29 +84,330 @@ errors = {
 }
 
 
+BALANCE_ERRORS = ("0011", "0024")
+RATE_ERRORS = ("0015", "0056")
+RETRYABLE_ERRORS = ("0015", "0017")
+"""Error codes worth retrying the request for."""
+FATAL_ERRORS = ("0001", "0002", "0003", "0004", "0011", "0024")
+"""Error codes no retry will fix; the key or the account is unusable."""
+REJECTED_ERRORS = ("0015",)
+"""Error codes that guarantee a request had no effect, so even
+submissions can be retried."""
+DONE_ERRORS = ("0012",)
+"""Error codes that mean a retried feedback request already took
+effect."""
+IDEMPOTENT_ACTIONS = ("usercaptchaguthaben", "userconfig", "userconfigref", "userhistory", "userhistory2",
+                      "userhistory3", "userhistorydetail", "usercaptchacorrectdata", "usercaptchacorrectback",
+                      "usercaptchashow")
+"""API actions that are safe to repeat. Feedback, i.e.
+``usercaptchacorrectback``, is only safe because a repeat answered with
+one of the :data:`DONE_ERRORS` counts as done."""
+
+
 class CaptchaError(Exception):
     """Exception raised in relation to captchas, like e.g. timeout.
     """
     pass
 
 
+class APIError(RuntimeError):
+    """Exception raised when the service answers with an error.
+
+    Attributes
+    ----------
+    code : str
+        The service's four-digit error code, the HTTP status code for 
+        connection errors, or None if unknown.
+    body : str
+        The raw body of the response.
+    """
+
+    def __init__(self, message: str, code: str = None, body: str = None):
+        super().__init__(message)
+        self.code = code
+        self.body = body
+
+
+class RetryableAPIError(APIError):
+    """An error that may go away when the request is repeated, e.g. an 
+    HTTP 5xx, error 0015, "Captcha submitted too quickly", or a timeout 
+    or dropped connection, which have no code and are chained to the 
+    transport's own exception.
+    """
+    pass
+
+
+class FatalAPIError(APIError):
+    """An error no retry will fix, e.g. an invalid API key or 
+    insufficient balance.
+    """
+    pass
+
+
+def _api_error(message: str, code: str = None, body: str = None) -> APIError:
+    if(code in FATAL_ERRORS):
+        return FatalAPIError(message, code, body)
+    if(code in RETRYABLE_ERRORS or (code is not None and len(code) == 3 and code.startswith("5"))):
+        return RetryableAPIError(message, code, body)
+    return APIError(message, code, body)
+
+
+def _error_code(text: str) -> str:
+    code = str(text).strip().split(" ", 1)[0]
+    return code if re.fullmatch(r"\d{4}", code) else None
+
+
+def _service_urls(base_url: str) -> Tuple[str, str]:
+    """The URLs of the API and of the status of a service at a base URL.
+    """
+    base_url = base_url.rstrip("/") + "/"
+    return base_url + API_PATH, base_url + STATUS_PATH
+
+
+def _prepare_params(params: dict) -> dict:
+    """Convert boolean parameters into the integers the API expects.
+    """
+    for key in params:
+        if(type(params[key]) is bool):
+            params[key] = int(params[key])
+    return params
+
+
+def _parse_response(results) -> dict:
+    """Turn a response from the API into a dictionary or raise an 
+    :class:`APIError`.
+
+    Works with both ``requests`` and ``httpx`` responses.
+    """
+    body = results.content.decode('utf-8', 'replace')
+    if(results.status_code == 200):
+        try:
+            contents = results.json()
+        except ValueError:
+            code = _error_code(body)
+            raise _api_error(
+                f"Server error: '{errors.get(code, body.strip())}'", code, body)
+        if(contents["status"]["success"]):
+            return contents
+        else:
+            error = str(contents.get("error", ""))
+            code = _error_code(error)
+            raise _api_error(f"Server error: '{error}'", code, body)
+    else:
+        reason = getattr(results, "reason", None) or getattr(
+            results, "reason_phrase", "")
+        raise _api_error(
+            f"Connection error: {results.status_code}, '{reason}'.", str(results.status_code), body)
+
+
+def _parse_content(results) -> bytes:
+    """Return the raw body of a response from the API that isn't JSON, 
+    like an image, or raise an :class:`APIError`.
+    """
+    if(results.status_code != 200):
+        _parse_response(results)
+    content = results.content
+    if(len(content) < 256):
+        body = content.decode('utf-8', 'replace')
+        code = _error_code(body)
+        if(code is not None):
+            raise _api_error(
+                f"Server error: '{errors.get(code, body.strip())}'", code, body)
+    return content
+
+
+def _files_size(files: dict) -> int:
+    """Size in bytes of the fields and files of a multipart upload.
+    """
+    size = 0
+    for value in (files or {}).values():
+        if(isinstance(value, tuple)):
+            value = value[1]
+        if(isinstance(value, str)):
+            value = value.encode()
+        size += len(value) if hasattr(value, "__len__") else 0
+    return size
+
+
 class api9kw:
     """Class for accessing and using the 9kw.eu API.
 
     For any missing functionality or information, see 
     `the official API documentation`_.
 
+    All requests made by an instance go through one 
+    :class:`Transport`, by default a pooled, keep-alive 
+    ``requests.Session``. Call :meth:`close` when done, or use the 
+    instance as a context manager.
+
     .. _the official API documentation: https://www.9kw.eu/api.html
+
+    Parameters
+    ----------
+    api_key : str, default None
+        The API key for 9kw.eu services.
+    session : requests.Session, default None
+        An existing session to use. If not given, one is created and 
+        owned by this instance. Ignored when a ``transport`` is given.
+    pool_size : int, default 10
+        Maximum number of connections kept open to the service, when 
+        the session is created by this instance.
+    keep_alive : bool, default True
+        Whether connections are reused between requests.
+    timeout : tuple of float, default (5, 3)
+        Connect and read timeouts in seconds. Ignored when a 
+        ``transport`` is given.
+    poll_workers : int, default 4
+        Maximum number of concurrent polls made by :attr:`poller`.
+    latency_stats : LatencyStats, default None
+        Solve-time statistics to schedule answer polls with, e.g. to 
+        share them between instances. A new one is created if not 
+        given.
+    settings_ttl : float, default None
+        Seconds for which a fetched snapshot of the account settings 
+        serves :attr:`settings`, :attr:`selfonly`, :attr:`selfsend` 
+        and :attr:`selfsolve`. By default every read fetches them 
+        anew.
+    ledger : CreditLedger, default None
+        Keep a local estimate of the balance, see 
+        :attr:`estimated_balance`.
+    answer_cache : AnswerCache, default None
+        Answer images seen before from a local cache, see 
+        :meth:`solve_image_captcha`.
+    max_image_size : int, default None
+        Refuse images larger than this many bytes before reading or 
+        downloading all of them. No limit by default.
+    optimizer : ImageOptimizer, default None
+        Shrink images before uploading them.
+    rate_limiter : RateLimiter, default None
+        Limit the rate of requests per kind of action, slowing down 
+        further whenever the service answers with error 0015 or 0056. 
+        Can be shared between instances.
+    retries : int, default 2
+        How many times to repeat a request that failed with a 
+        :class:`RetryableAPIError`, a timeout or a connection error. 
+        Only queries, polls and feedback are repeated, plus 
+        submissions the service refused outright. Timeouts and 
+        connection errors left after the last try are raised as a 
+        :class:`RetryableAPIError` without a code.
+    backoff : float, default 0.5
+        Base of the exponential, jittered delay between retries in 
+        seconds.
+    max_backoff : float, default 10
+        Longest delay between retries in seconds.
+    load_controller : LoadController, default None
+        Pick ``prio`` and ``maxtimeout`` of submissions that don't set 
+        them from the service's current load.
+    hooks : iterable of callable, default None
+        Instrumentation hooks, see :attr:`hooks`.
+    base_url : str, default "https://www.9kw.eu/"
+        Where the service is, e.g. a local stand-in for testing. 
+        Ignored when a ``transport`` is given.
+    transport : Transport, default None
+        Send requests through this transport, e.g. an 
+        :class:`HttpxTransport` to multiplex them over HTTP/2, or a 
+        :class:`MemoryTransport` for testing. Not closed by 
+        :meth:`close`. By default a :class:`RequestsTransport` is 
+        created from the arguments above.
+    journal : Journal, default None
+        Record submissions, answers and feedback on disk, so the 
+        captchas in flight can be picked up again with :meth:`resume` 
+        after a crash. Futures cancelled by the caller end their 
+        captcha's record; those cancelled by :meth:`close` don't.
+    background_feedback : bool, default False
+        Queue the reports of :meth:`captcha_feedback_correct` and 
+        :meth:`captcha_feedback_incorrect` for the 
+        :attr:`feedback_dispatcher` to send, instead of waiting for 
+        them.
     """
     __api_key: str = None
     __name: str = "captcha9kw"
-    __session: requests.Session = None
+    __transport: Transport = None
+    __own_transport: bool = False
+    __poller = None
+    __poll_workers: int = 4
+    __latency_stats: LatencyStats = None
+    __submissions: OrderedDict = None
+    __max_submissions: int = 10000
+    __settings_ttl: float = None
+    __settings_snapshot: dict = None
+    __settings_time: float = 0
+    __account_id: int = None
+    __ledger: CreditLedger = None
+    __answer_cache: AnswerCache = None
+    __max_image_size: int = None
+    __optimizer: ImageOptimizer = None
+    __rate_limiter: RateLimiter = None
+    __retries: int = 2
+    __backoff: float = 0.5
+    __max_backoff: float = 10
+    __load_controller: LoadController = None
+    __hooks: list = None
+    __journal: Journal = None
+    __feedback_dispatcher = None
+    __background_feedback: bool = False
+    __closing: bool = False
+
+    def __init__(self, api_key: str = None, session: "requests.Session" = None, pool_size: int = 10, keep_alive: bool = True, timeout: Tuple[float, float] = (5, 3), poll_workers: int = 4, latency_stats: LatencyStats = None, settings_ttl: float = None, ledger: CreditLedger = None, answer_cache: AnswerCache = None, max_image_size: int = None, optimizer: ImageOptimizer = None, rate_limiter: RateLimiter = None, retries: int = 2, backoff: float = 0.5, max_backoff: float = 10, load_controller: LoadController = None, hooks: Iterable[Hook] = None, base_url: str = BASE_URL, transport: Transport = None, journal: Journal = None, background_feedback: bool = False):
+        self.__settings_lock = threading.RLock()
+        self.__settings_ttl = settings_ttl
+        self.__ledger = ledger
+        self.__answer_cache = answer_cache
+        self.__max_image_size = max_image_size
+        self.__optimizer = optimizer
+        self.__rate_limiter = rate_limiter
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__max_backoff = max_backoff
+        self.__load_controller = load_controller
+        self.__hooks = list(hooks or [])
+        self.__journal = journal
+        self.__background_feedback = background_feedback
+        if(api_key is not None):
+            self.api_key = api_key
+        if(transport is None):
+            transport = RequestsTransport(
+                session, base_url, timeout, pool_size, keep_alive)
+            self.__own_transport = True
+        self.__transport = transport
+        self.__poll_workers = poll_workers
+        self.__latency_stats = latency_stats or LatencyStats()
+        self.__submissions = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Send the feedback still queued, stop the :attr:`poller` and 
+        the :attr:`feedback_dispatcher`, if started, and close the 
+        :attr:`transport` and its connections, if owned by this 
+        instance.
+        """
+        if(self.__feedback_dispatcher is not None):
+            self.__feedback_dispatcher.close()
+            self.__feedback_dispatcher = None
+        if(self.__poller is not None):
+            self.__closing = True
+            try:
+                self.__poller.close()
+            finally:
+                self.__closing = False
+            self.__poller = None
+        if(self.__own_transport and self.__transport is not None):
+            self.__transport.close()
 
     @property
     def account_id(self):
         """int: The ID number of the account the API key belongs to.
+
+        Fetched once per API key and remembered afterwards.
         """
-        return int(self.__settings("id"))
+        if(self.__account_id is None):
+            self.__account_id = int(self.__settings("id"))
+        return self.__account_id
 
     @property
     def api_key(self):
@@ -110,19 +424,119 @@ class api9kw:
         if(type(key) is not str):
             raise TypeError("Incorrect type: API key must be a string.")
         if(re.fullmatch(r"[a-zA-Z\d]*", key) and len(key) >= 5 and len(key) <= 50):
+            if(key != self.__api_key):
+                self.__account_id = None
+                self.invalidate_settings()
             self.__api_key = key
             return None
         else:
             raise ValueError(
                 "Invalid API key: minimum length is 5, maximum length is 50. Only a-z, A-Z and 0-9 allowed.")
 
+    @property
+    def answer_cache(self):
+        """AnswerCache: The cache of answers to already-solved images 
+        used by :meth:`solve_image_captcha`, or None when not in use.
+        """
+        return self.__answer_cache
+
+    @answer_cache.setter
+    def answer_cache(self, cache: AnswerCache):
+        self.__answer_cache = cache
+
     @property
     def balance(self):
         """int: The account's balance.
+
+        Always asks the service. Reading this also syncs the 
+        :attr:`ledger`, if one is in use.
         """
         params = {"action": "usercaptchaguthaben",
                   "apikey": self.__api_key, "json": 1}
-        return self.__apiGet(params)["credits"]
+        balance = self.__apiGet(params)["credits"]
+        if(self.__ledger is not None):
+            self.__ledger.sync(balance)
+        return balance
+
+    @property
+    def base_url(self):
+        """str: Where the service is, as configured in the 
+        :attr:`transport`.
+        """
+        return self.__transport.base_url
+
+    @property
+    def estimated_balance(self):
+        """int: The account's balance as estimated by the 
+        :attr:`ledger`.
+
+        Only asks the service when the ledger needs syncing, or when 
+        no ledger is in use.
+        """
+        if(self.__ledger is None or self.__ledger.needs_sync()):
+            return self.balance
+        return self.__ledger.balance
+
+    @property
+    def feedback_dispatcher(self):
+        """FeedbackDispatcher: The background sender of feedback used 
+        with ``background_feedback``, started on first use. Its 
+        ``pending`` attribute is the number of reports not yet sent.
+        """
+        if(self.__feedback_dispatcher is None):
+            from .feedback import FeedbackDispatcher
+            self.__feedback_dispatcher = FeedbackDispatcher(self)
+        return self.__feedback_dispatcher
+
+    @property
+    def hooks(self):
+        """list: Instrumentation hooks, called with the name of an event 
+        and a dictionary of its fields for every request, retry, image 
+        read, poll and answer; see :mod:`captcha9kw.metrics`. Append a 
+        :class:`MetricsRecorder` to collect metrics. Nothing is measured 
+        while the list is empty.
+        """
+        return self.__hooks
+
+    @property
+    def journal(self):
+        """Journal: The on-disk record of the captchas in flight, or 
+        None when not in use.
+        """
+        return self.__journal
+
+    @journal.setter
+    def journal(self, journal: Journal):
+        self.__journal = journal
+
+    @property
+    def latency_stats(self):
+        """LatencyStats: Observed solve times per kind of captcha, used 
+        to schedule answer polls.
+        """
+        return self.__latency_stats
+
+    @property
+    def ledger(self):
+        """CreditLedger: The local estimate of the account's balance, 
+        or None when not in use.
+        """
+        return self.__ledger
+
+    @ledger.setter
+    def ledger(self, ledger: CreditLedger):
+        self.__ledger = ledger
+
+    @property
+    def load_controller(self):
+        """LoadController: Picks ``prio`` and ``maxtimeout`` of 
+        submissions, or None when not in use.
+        """
+        return self.__load_controller
+
+    @load_controller.setter
+    def load_controller(self, controller: LoadController):
+        self.__load_controller = controller
 
     @property
     def name(self):
@@ -143,6 +557,44 @@ class api9kw:
             raise ValueError("Name too long. Maximum length is 30 characters.")
         self.__name = name
 
+    @property
+    def optimizer(self):
+        """ImageOptimizer: Shrinks images before they are uploaded, or 
+        None when not in use.
+        """
+        return self.__optimizer
+
+    @optimizer.setter
+    def optimizer(self, optimizer: ImageOptimizer):
+        self.__optimizer = optimizer
+
+    @property
+    def poller(self):
+        """AnswerPoller: The shared background poller used by 
+        :meth:`get_answer_future`, started on first use.
+        """
+        if(self.__poller is None):
+            from .poller import AnswerPoller
+            self.__poller = AnswerPoller(self, workers=self.__poll_workers)
+        return self.__poller
+
+    @property
+    def rate_limiter(self):
+        """RateLimiter: Limits the rate of requests, or None when not 
+        in use.
+        """
+        return self.__rate_limiter
+
+    @rate_limiter.setter
+    def rate_limiter(self, limiter: RateLimiter):
+        self.__rate_limiter = limiter
+
+    @property
+    def transport(self):
+        """Transport: The transport requests are sent through.
+        """
+        return self.__transport
+
     @property
     def referrals(self):
         """list: The account's list of referrals.
@@ -228,13 +680,14 @@ class api9kw:
     def service_status(self):
         """dict: Information about the service's status.
         """
-        results = requests.get(
-            "https://www.9kw.eu/grafik/servercheck.json", timeout=(5, 3))
+        results = self.__transport.get(self.__transport.status_url)
         if(results.status_code == 200):
             return results.json()
         else:
+            reason = getattr(results, "reason", None) or getattr(
+                results, "reason_phrase", "")
             raise RuntimeError(
-                f"Connection error: {results.status_code}, '{results.reason}'.")
+                f"Connection error: {results.status_code}, '{reason}'.")
 
     @property
     def source(self):
@@ -256,75 +709,212 @@ class api9kw:
                 "Name too long. The maximum length is 30 characters.")
         self.__name = name
 
-    def __apiGet(self, params, session=None):
+    def __apiGet(self, params, parse=_parse_response):
         if(not self.__api_key):
             raise ValueError("API key has not been set.")
-        for key in params:
-            if(type(key) is bool):
-                params[key] = int(params[key])
-        if(not session):
-            if(self.__session):
-                session = self.__session
-            else:
-                session = requests
-        results = session.get("https://www.9kw.eu/index.cgi",
-                              params=params, timeout=(5, 3))
-        if(results.status_code == 200):
-            try:
-                contents = results.json()
-            except:
-                errCode = results.content.decode('utf-8').split(" ", 1)[0]
-                raise RuntimeError(
-                    f"Server error: '{errors[errCode]}'")
-            if(contents["status"]["success"]):
-                return contents
-            else:
-                raise RuntimeError(f"Server error: '{contents['error']}'")
-        else:
-            raise RuntimeError(
-                f"Connection error: {results.status_code}, '{results.reason}'.")
+        _prepare_params(params)
+        transport = self.__transport
+        return self.__retry(params, lambda: transport.get(
+            transport.api_url, params=params), "GET", parse)
 
-    def __apiPost(self, params, files, session=None):
+    def __apiPost(self, params, files=None, body: MultipartBody = None):
         if(not self.__api_key):
             raise ValueError("API key has not been set.")
-        for key in params:
-            if(type(key) is bool):
-                params[key] = int(params[key])
-        if(not session):
-            if(self.__session):
-                session = self.__session
-            else:
-                session = requests
-        results = session.post("https://www.9kw.eu/index.cgi",
-                               params=params, files=files, timeout=(5, 3))
-        if(results.status_code == 200):
+        _prepare_params(params)
+        transport = self.__transport
+        if(body is not None):
+            def send():
+                body.rewind()
+                return transport.post(transport.api_url, params=params, data=body, headers={
+                    "Content-Type": body.content_type, "Content-Length": str(len(body))})
+            sent = len(body)
+        else:
+            def send():
+                return transport.post(transport.api_url, params=params, files=files)
+            sent = _files_size(files)
+        return self.__retry(params, send, "POST", sent=sent)
+
+    def __retry(self, params, send, method: str, parse=_parse_response, sent: int = 0):
+        idempotent = params.get("action") in IDEMPOTENT_ACTIONS
+        attempt = 0
+        while True:
             try:
-                contents = results.json()
-            except:
-                errCode = results.content.decode('utf-8').split(" ", 1)[0]
-                raise RuntimeError(
-                    f"Server error: '{errors[errCode]}'")
-            if(contents["status"]["success"]):
-                return contents
-            else:
-                raise RuntimeError(f"Server error: '{contents['error']}'")
+                self.__limit(params)
+                if(not self.__hooks):
+                    return self.__parse(send(), params, parse)
+                return self.__measure(params, send, method, parse, sent)
+            except (RetryableAPIError,) + self.__transport.transient_errors as e:
+                code = getattr(e, "code", None)
+                if(attempt >= self.__retries or not (idempotent or code in REJECTED_ERRORS)):
+                    if(isinstance(e, APIError)):
+                        raise
+                    raise RetryableAPIError(
+                        f"Connection error: {e}", None) from e
+            except APIError as e:
+                if(attempt and params.get("action") == "usercaptchacorrectback" and e.code in DONE_ERRORS):
+                    return {"status": {"success": True}}
+                raise
+            attempt += 1
+            if(self.__hooks):
+                emit(self.__hooks, "retry", action=params.get("action"),
+                     attempt=attempt, code=code)
+            import random
+            time.sleep(random.uniform(
+                0, min(self.__max_backoff, self.__backoff * 2 ** attempt)))
+
+    def __measure(self, params, send, method: str, parse, sent: int):
+        start = time.perf_counter()
+        results, code = None, None
+        try:
+            results = send()
+            return self.__parse(results, params, parse)
+        except Exception as e:
+            code = getattr(e, "code", None) or type(e).__name__
+            raise
+        finally:
+            emit(self.__hooks, "request", action=params.get("action"), method=method,
+                 seconds=time.perf_counter() - start, bytes_sent=sent,
+                 bytes_received=len(getattr(results, "content", None) or b""), code=code)
+
+    def __limit(self, params):
+        if(self.__rate_limiter is not None):
+            self.__rate_limiter.acquire(params.get("action"))
+
+    def __parse(self, results, params, parse=_parse_response):
+        try:
+            contents = parse(results)
+        except APIError as e:
+            if(self.__ledger is not None and e.code in BALANCE_ERRORS):
+                self.__ledger.suspect_drift()
+            if(self.__rate_limiter is not None and e.code in RATE_ERRORS):
+                self.__rate_limiter.throttle(params.get("action"))
+            raise
+        if(self.__rate_limiter is not None):
+            self.__rate_limiter.relax(params.get("action"))
+        return contents
+
+    def __charge(self, credits: int):
+        if(self.__ledger is not None):
+            self.__ledger.charge(credits)
+
+    def __open_image(self, data) -> ImageSource:
+        return open_image(data, self.__transport, self.__max_image_size)
+
+    def __submitted(self, id: int, kind: CaptchaKind):
+        self.__submissions[id] = (kind, time.monotonic())
+        while(len(self.__submissions) > self.__max_submissions):
+            self.__submissions.popitem(last=False)
+
+    def __solved(self, id: int, last_miss: float = None):
+        submission = self.__submissions.pop(id, None)
+        if(submission is None):
+            if(self.__hooks):
+                emit(self.__hooks, "answer", id=id, kind=None, seconds=None)
+            return
+        elapsed = time.monotonic() - submission[1]
+        if(last_miss is not None):
+            elapsed = (last_miss + elapsed) / 2
+        self.__latency_stats.record(submission[0], elapsed)
+        if(self.__hooks):
+            emit(self.__hooks, "answer", id=id,
+                 kind=submission[0], seconds=elapsed)
+
+    def __background(self, background: bool = None) -> bool:
+        return self.__background_feedback if background is None else background
+
+    def __record(self, id: int, future: Future):
+        if(future.cancelled()):
+            if(not self.__closing):
+                self.__journal.closed(id, "cancelled")
+            return
+        error = future.exception()
+        if(error is None):
+            self.__journal.answered(id, future.result())
+        elif(isinstance(error, CaptchaError)):
+            self.__journal.closed(id, "timeout")
+
+    def __sleep(self, id: int, seconds: float, deadline: float = None, token: CancelToken = None):
+        if(deadline is not None):
+            seconds = min(seconds, deadline - time.monotonic())
+        seconds = max(0, seconds)
+        if(token is not None):
+            cancelled = token.wait(seconds)
         else:
-            raise RuntimeError(
-                f"Connection error: {results.status_code}, '{results.reason}'.")
+            cancelled = False
+            time.sleep(seconds)
+        expired = deadline is not None and time.monotonic() >= deadline
+        if(not (cancelled or expired)):
+            return
+        try:
+            self.captcha_cancel_submitted(id)
+        except Exception:
+            pass
+        if(cancelled):
+            raise CaptchaError("Cancelled waiting for answer to captcha.")
+        raise CaptchaError("Deadline passed waiting for answer to captcha.")
 
     def __settings(self, key=None, value=None):
-        if(key is None):
-            params = {"action": "userconfig",
-                      "apikey": self.__api_key, "json": 1}
-            return self.__apiGet(params)
-        else:
-            if(value is None):
-                params = {"action": "userconfig",
-                          "apikey": self.__api_key, "json": 1}
-                return self.__apiGet(params)[key]
-            params = {"action": f"userconfig{key}",
-                      "apikey": self.__api_key, "json": 1, key: value}
+        if(value is None):
+            with self.__settings_lock:
+                snapshot = self.__settings_snapshot
+                if(self.__settings_ttl is None or snapshot is None or time.monotonic() - self.__settings_time > self.__settings_ttl):
+                    snapshot = self.refresh_settings()
+            if(key is None):
+                return dict(snapshot)
+            return snapshot[key]
+        params = {"action": f"userconfig{key}",
+                  "apikey": self.__api_key, "json": 1, key: value}
+        try:
             self.__apiGet(params)
+        except Exception:
+            self.invalidate_settings()
+            raise
+        with self.__settings_lock:
+            if(self.__settings_snapshot is not None):
+                self.__settings_snapshot[key] = value
+
+    def answer_captcha(self, id: int, answer: str, confirm: int = 0):
+        """Send the answer to a captcha fetched for solving with 
+        :meth:`fetch_captcha`.
+
+        Parameters
+        ----------
+        id : int
+            ID of the captcha.
+        answer : str
+            The answer.
+        confirm : int, default 0
+            Whether the captcha was handed out for confirming another 
+            account's answer, in which case ``answer`` is ``yes`` or 
+            ``no``.
+        """
+        params = {"action": "usercaptchacorrect", "json": 1, "id": id,
+                  "captcha": answer, "confirm": confirm, "apikey": self.__api_key, "source": self.__name}
+        self.__apiGet(params)
+
+    def answer_status(self, id: int, archive: int = 0) -> dict:
+        """Query the service once for the state of a captcha's answer.
+
+        Parameters
+        ----------
+        id : int
+            ID of the submitted captcha.
+        archive : int, default 0
+            Whether to access an archived captcha.
+
+        Returns
+        -------
+        dict
+            The raw results, including ``answer`` and, while the 
+            captcha is unsolved, ``try_again`` and ``timeout``.
+        """
+        params = {"action": "usercaptchacorrectdata", "json": 1,
+                  "id": id, "archiv": archive, "apikey": self.__api_key, "source": self.__name}
+        results = self.__apiGet(params)
+        if(self.__hooks):
+            emit(self.__hooks, "poll", id=id,
+                 answered=bool(results.get("answer")))
+        return results
 
     def captcha_cancel_submitted(self, id: int):
         """Cancel the already-submitted captcha.
@@ -337,6 +927,8 @@ class api9kw:
         params = {"action": "usercaptchacorrectback", "json": 1,
                   "id": id, "apikey": self.__api_key, "correct": 3, "source": self.__name}
         self.__apiGet(params)
+        if(self.__journal is not None):
+            self.__journal.closed(id, "cancelled")
 
     def captcha_details(self, id: int, archive: int = 0) -> dict:
         """Query for details on a submitted captcha.
@@ -357,7 +949,7 @@ class api9kw:
                   "apikey": self.__api_key, "id": id, "archiv": archive}
         return self.__apiGet(params)
 
-    def captcha_feedback_correct(self, id: int, archive: int = 0):
+    def captcha_feedback_correct(self, id: int, archive: int = 0, background: bool = None):
         """Mark the answer for the captcha as correct.
 
         Note
@@ -371,14 +963,26 @@ class api9kw:
             ID of the captcha.
         archive : int, default 0
             Access an archived captcha.
+        background : bool, default None
+            Queue the report for the :attr:`feedback_dispatcher` 
+            instead of waiting for it. Defaults to 
+            ``background_feedback`` of the instance.
         """
+        if(self.__background(background)):
+            self.feedback_dispatcher.put(id, True, archive)
+            return
         params = {"action": "usercaptchacorrectback", "json": 1,
                   "id": id, "archiv": archive, "apikey": self.__api_key, "correct": 1, "source": self.__name}
         self.__apiGet(params)
+        if(self.__journal is not None):
+            self.__journal.feedback(id, True)
 
-    def captcha_feedback_incorrect(self, id: int, archive: int = 0):
+    def captcha_feedback_incorrect(self, id: int, archive: int = 0, background: bool = None):
         """Mark the answer for the captcha as incorrect.
 
+        The answer is also dropped from the :attr:`answer_cache`, if 
+        one is in use.
+
         Note
         ----
             It's good manners to report as to whether the answer was 
@@ -390,10 +994,21 @@ class api9kw:
             ID of the captcha.
         archive : int, default 0
             Access an archived captcha.
+        background : bool, default None
+            Queue the report for the :attr:`feedback_dispatcher` 
+            instead of waiting for it. Defaults to 
+            ``background_feedback`` of the instance.
         """
+        if(self.__answer_cache is not None):
+            self.__answer_cache.invalidate_id(id)
+        if(self.__background(background)):
+            self.feedback_dispatcher.put(id, False, archive)
+            return
         params = {"action": "usercaptchacorrectback", "json": 1,
                   "id": id, "archiv": archive, "apikey": self.__api_key, "correct": 2, "source": self.__name}
         self.__apiGet(params)
+        if(self.__journal is not None):
+            self.__journal.feedback(id, False)
 
     def captchas_failed(self, archive: int = 0, page: int = 0, onlyapikey: int = 0) -> dict:
         """Query the list of failed or incorrect captchas associated 
@@ -459,7 +1074,7 @@ class api9kw:
                     params[x] = locals()[x]
         return self.__apiGet(params)
 
-    def captchas_submitted(self, source: str = None, correctsource: str = None, archiv: int = 0, filter: str = None, page: int = 0, onlyapikey: int = 0) -> dict:
+    def captchas_submitted(self, source: str = None, correctsource: str = None, archive: int = 0, filter: str = None, page: int = 0, onlyapikey: int = 0) -> dict:
         """Query the captchas submitted by the account to the service.
 
         Parameters
@@ -498,6 +1113,33 @@ class api9kw:
                     params[x] = locals()[x]
         return self.__apiGet(params)
 
+    def choose_submission(self, prio: int = None, maxtimeout: int = None, confirm: int = 0) -> Tuple[int, int]:
+        """Fill in the priority and maximum timeout of a submission, 
+        from the :attr:`load_controller` if one is in use.
+
+        Parameters
+        ----------
+        prio : int, default None
+            The priority asked for. Chosen if None, 0 without a 
+            controller.
+        maxtimeout : int, default None
+            The maximum timeout asked for. Chosen if None, 600 without 
+            a controller.
+        confirm : int, default 0
+            Whether the captcha is to be confirmed, see 
+            :meth:`LoadController.choose`.
+
+        Returns
+        -------
+        tuple
+            ``prio`` and ``maxtimeout``.
+        """
+        if(self.__load_controller is not None and (prio is None or maxtimeout is None)):
+            chosen = self.__load_controller.choose(confirm=confirm)
+            prio = chosen[0] if prio is None else prio
+            maxtimeout = chosen[1] if maxtimeout is None else maxtimeout
+        return (0 if prio is None else prio), (600 if maxtimeout is None else maxtimeout)
+
     def create_account(self, credits: int, referrer: Union[int, str] = None) -> Tuple[str, str]:
         """Create a new account while also transferring some credits 
         to it.
@@ -538,9 +1180,48 @@ class api9kw:
         """
         params = {"action": "usergutscheincreate",
                   "json": 1, "apikey": self.__api_key, "source": self.__name, "guthaben": credits}
-        return self.__apiGet(params)["code"]
+        code = self.__apiGet(params)["code"]
+        self.__charge(credits)
+        return code
+
+    def fetch_captcha(self, text: int = 1, mouse: int = 0, confirm: int = 0, interactive: int = 0) -> dict:
+        """Fetch a captcha to solve.
+
+        The captcha is reserved for the account until answered with 
+        :meth:`answer_captcha`, skipped with :meth:`skip_captcha` or 
+        timed out. See :class:`captcha9kw.worker.SolverWorker` for a 
+        loop on top of this.
+
+        Parameters
+        ----------
+        text : int, default 1
+            Accept captchas answered with text.
+        mouse : int, default 0
+            Accept captchas answered with clicks.
+        confirm : int, default 0
+            Accept confirming other accounts' answers.
+        interactive : int, default 0
+            Accept interactive captchas.
+
+        Returns
+        -------
+        dict
+            The captcha's details, including ``captchaid``, or None if 
+            there's no captcha to solve right now.
+        """
+        params = {"action": "usercaptchanew", "json": 1, "text": text, "mouse": mouse,
+                  "confirm": confirm, "interactive": interactive, "apikey": self.__api_key, "source": self.__name}
+        try:
+            results = self.__apiGet(params)
+        except APIError as e:
+            if(e.code == "0008" or "NO CAPTCHA" in (e.body or "")):
+                return None
+            raise
+        if(not results.get("captchaid")):
+            return None
+        return results
 
-    def get_answer(self, id: int, archive: int = 0, wait: int = 0) -> str:
+    def get_answer(self, id: int, archive: int = 0, wait: int = 0, deadline: float = None, token: CancelToken = None) -> str:
         """Check for and receive the answer to a captcha.
 
         Note
@@ -559,7 +1240,17 @@ class api9kw:
             Whether to access an archived captcha.
         wait: int, default 0
             Whether to wait until the captcha is resolved or an error 
-            is received.
+            is received. The first poll is made around the time 
+            captchas of the same kind have usually been solved in, see 
+            :attr:`latency_stats`, and later polls back off.
+        deadline : float, default None
+            When to give up waiting, as a ``time.monotonic()`` 
+            timestamp, e.g. the deadline of the request the captcha is 
+            solved for. The captcha is then withdrawn with 
+            :meth:`captcha_cancel_submitted`.
+        token : CancelToken, default None
+            Give up waiting as soon as the token is cancelled, and 
+            withdraw the captcha like at the ``deadline``.
 
         Returns
         -------
@@ -571,45 +1262,321 @@ class api9kw:
         ------
         CaptchaError
             Raised when a successfully submitted, active captcha times 
-            out or encounters an other error.
+            out or encounters an other error, or when the ``deadline`` 
+            passes or the ``token`` is cancelled first.
         """
-        params = {"action": "usercaptchacorrectdata", "json": 1,
-                  "id": id, "archiv": archive, "apikey": self.__api_key, "source": self.__name}
-        with requests.Session() as session:
-            if(wait):
-                time.sleep(5)
-                while True:
-                    results = self.__apiGet(params, session)
+        if(wait):
+            kind, submitted = self.__submissions.get(
+                id, (captcha_kind(), time.monotonic()))
+            last_miss = None
+            try:
+                for offset in self.__latency_stats.poll_offsets(kind, time.monotonic() - submitted):
+                    self.__sleep(id, submitted + offset -
+                                 time.monotonic(), deadline, token)
+                    results = self.answer_status(id, archive)
                     if("answer" in results and results["answer"]):
-                        return results["answer"]
-                    if("try_again" in results and not results["try_again"]):
-                        raise CaptchaError(
-                            "Timeout waiting for answer to captcha.")
-                    if("timeout" in results and results["timeout"]):
+                        self.__solved(id, last_miss)
+                        break
+                    if(("try_again" in results and not results["try_again"]) or ("timeout" in results and results["timeout"])):
+                        if(self.__journal is not None):
+                            self.__journal.closed(id, "timeout")
                         raise CaptchaError(
                             "Timeout waiting for answer to captcha.")
-                    time.sleep(2)
+                    last_miss = time.monotonic() - submitted
+            finally:
+                self.__submissions.pop(id, None)
+        else:
+            self.__sleep(id, 0, deadline, token)
+            results = self.answer_status(id, archive)
+            if("answer" not in results):
+                return ""
+            if(results["answer"]):
+                self.__solved(id)
+        if(results["answer"] and self.__journal is not None):
+            self.__journal.answered(id, results["answer"])
+        return results["answer"]
+
+    def get_answer_future(self, id: int, archive: int = 0, timeout: float = 600, deadline: float = None, token: CancelToken = None) -> Future:
+        """Wait for the answer to a captcha in the background.
+
+        The captcha is handed to the shared :attr:`poller`, which polls 
+        all outstanding captchas from a single scheduler, timing the 
+        polls after :attr:`latency_stats`.
+
+        Parameters
+        ----------
+        id : int
+            ID of the submitted captcha.
+        archive : int, default 0
+            Whether to access an archived captcha.
+        timeout : float, default 600
+            Seconds after which to give up waiting, usually the 
+            ``maxtimeout`` the captcha was submitted with.
+        deadline : float, default None
+            When to give up waiting and withdraw the captcha, see 
+            :meth:`get_answer`.
+        token : CancelToken, default None
+            Give up waiting and withdraw the captcha when the token is 
+            cancelled, see :meth:`get_answer`.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to the answer, or raises :class:`CaptchaError` 
+            when the captcha times out, encounters an other error or 
+            the ``deadline`` passes. Cancelled when the ``token`` is.
+        """
+        kind, submitted = self.__submissions.pop(id, (None, None))
+        future = self.poller.watch(
+            id, archive, timeout, kind=kind, submitted=submitted, deadline=deadline, token=token)
+        if(self.__journal is not None):
+            future.add_done_callback(
+                lambda future: self.__record(id, future))
+        return future
+
+    def invalidate_settings(self):
+        """Drop the cached settings snapshot, so the next read fetches 
+        the settings anew.
+        """
+        with self.__settings_lock:
+            self.__settings_snapshot = None
+
+    def iter_captchas_failed(self, prefetch: int = 2, workers: int = 2, **filters) -> Iterator[dict]:
+        """Iterate over all failed or incorrect captchas associated 
+        with the account, page by page.
+
+        The next pages are fetched in the background while the 
+        current one is consumed, see 
+        :func:`captcha9kw.history.iter_pages`.
+
+        Parameters
+        ----------
+        prefetch : int, default 2
+            Number of pages to fetch ahead.
+        workers : int, default 2
+            Maximum number of pages fetched at once.
+        **filters
+            Any arguments of :meth:`captchas_failed` except ``page``.
+
+        Yields
+        ------
+        dict
+            One record at a time.
+        """
+        from .history import iter_pages
+        return iter_pages(lambda page: self.captchas_failed(page=page, **filters), prefetch=prefetch, workers=workers)
+
+    def iter_captchas_solved(self, prefetch: int = 2, workers: int = 2, **filters) -> Iterator[dict]:
+        """Iterate over all captchas solved by the account, page by 
+        page.
+
+        Works like :meth:`iter_captchas_failed`, taking the arguments 
+        of :meth:`captchas_solved` except ``page`` as filters.
+        """
+        from .history import iter_pages
+        return iter_pages(lambda page: self.captchas_solved(page=page, **filters), prefetch=prefetch, workers=workers)
+
+    def iter_captchas_submitted(self, prefetch: int = 2, workers: int = 2, **filters) -> Iterator[dict]:
+        """Iterate over all captchas submitted by the account, page by 
+        page.
+
+        Works like :meth:`iter_captchas_failed`, taking the arguments 
+        of :meth:`captchas_submitted` except ``page`` as filters.
+        """
+        from .history import iter_pages
+        return iter_pages(lambda page: self.captchas_submitted(page=page, **filters), prefetch=prefetch, workers=workers)
+
+    def refresh_settings(self) -> dict:
+        """Fetch the account-related settings from the service, 
+        replacing any cached snapshot.
+
+        Returns
+        -------
+        dict
+            All the account-related settings.
+        """
+        params = {"action": "userconfig",
+                  "apikey": self.__api_key, "json": 1}
+        snapshot = self.__apiGet(params)
+        with self.__settings_lock:
+            self.__settings_snapshot = snapshot
+            self.__settings_time = time.monotonic()
+            if("id" in snapshot):
+                self.__account_id = int(snapshot["id"])
+        return snapshot
+
+    def resume(self) -> Tuple[dict, list]:
+        """Pick up the captchas a previous process left in the 
+        :attr:`journal`.
+
+        Call once at startup, before submitting anything. Captchas 
+        still within their ``maxtimeout`` are polled again by the 
+        :attr:`poller`, timed from their original submission; those 
+        answered before the restart get a resolved future, so the 
+        answer can still be used and feedback given. Captchas past 
+        their ``maxtimeout``, and answers kept past the journal's 
+        ``retention``, are dropped from the journal and reported.
+
+        Returns
+        -------
+        tuple
+            A dictionary mapping captcha IDs to futures as returned by 
+            :meth:`get_answer_future`, and a list of the IDs of the 
+            expired captchas.
+
+        Raises
+        ------
+        ValueError
+            Raised when no journal is in use.
+        """
+        if(self.__journal is None):
+            raise ValueError("No journal in use.")
+        futures, expired = {}, self.__journal.expired()
+        for id in expired:
+            self.__journal.closed(id, "expired")
+        now, clock = time.time(), time.monotonic()
+        for id, entry in self.__journal.entries.items():
+            if("answer" in entry):
+                future = Future()
+                future.set_result(entry["answer"])
             else:
-                results = self.__apiGet(params, session)
-                if("answer" in results):
-                    return results["answer"]
-                else:
-                    return ""
+                submitted = clock - (now - entry["submitted"])
+                kind = captcha_kind(
+                    entry["interactive"], entry["prio"], entry["confirm"])
+                self.__submissions[id] = (kind, submitted)
+                future = self.get_answer_future(
+                    id, timeout=entry["maxtimeout"])
+            future.captcha_id = id
+            futures[id] = future
+        return futures, expired
+
+    def show_captcha(self, id: int) -> bytes:
+        """Download the image of a captcha fetched for solving with 
+        :meth:`fetch_captcha`.
+
+        Parameters
+        ----------
+        id : int
+            ID of the captcha.
+
+        Returns
+        -------
+        bytes
+            The image.
+        """
+        params = {"action": "usercaptchashow", "id": id,
+                  "apikey": self.__api_key, "source": self.__name}
+        return self.__apiGet(params, _parse_content)
+
+    def skip_captcha(self, id: int):
+        """Hand a captcha fetched for solving with :meth:`fetch_captcha` 
+        back unanswered, so another account can solve it.
+
+        Parameters
+        ----------
+        id : int
+            ID of the captcha.
+        """
+        params = {"action": "usercaptchacorrect", "json": 1, "id": id, "captcha": "",
+                  "skip": 1, "apikey": self.__api_key, "source": self.__name}
+        self.__apiGet(params)
+
+    def solve_image_captcha(self, data: Union[str, bytes, io.IOBase], maxtimeout: int = None, prio: int = None, deadline: float = None, token: CancelToken = None, **kwargs) -> Future:
+        """Submit an image-based captcha and wait for its answer in 
+        the background.
+
+        Takes the same arguments as :meth:`submit_image_captcha`, plus 
+        ``deadline`` and ``token`` of :meth:`get_answer_future`. 
+        With an :attr:`answer_cache` in use, an image that has been 
+        answered before is not submitted again; its cached answer is 
+        returned instead.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            See :meth:`get_answer_future`. Its ``captcha_id`` attribute 
+            is the ID of the submission, or None for a cached answer, 
+            and its ``cache_key`` attribute the key of the image in 
+            the cache, if one is in use.
+        """
+        prio, maxtimeout = self.choose_submission(
+            prio, maxtimeout, kwargs.get("confirm", 0))
+        cache = self.__answer_cache
+        if(cache is None):
+            id = self.submit_image_captcha(
+                data, maxtimeout=maxtimeout, prio=prio, **kwargs)
+            future = self.get_answer_future(
+                id, timeout=maxtimeout, deadline=deadline, token=token)
+            future.captcha_id, future.cache_key = id, None
+            return future
+        image = self.__open_image(data)
+        try:
+            key = image.sha256()
+            answer = cache.get(key)
+            if(answer is not None):
+                future = Future()
+                future.set_result(answer)
+                future.captcha_id, future.cache_key = None, key
+                return future
+            id = self.submit_image_captcha(
+                image, maxtimeout=maxtimeout, prio=prio, **kwargs)
+        finally:
+            if(image is not data):
+                image.close()
+        future = self.get_answer_future(
+            id, timeout=maxtimeout, deadline=deadline, token=token)
+        future.captcha_id, future.cache_key = id, key
+
+        def store(future):
+            if(not future.cancelled() and future.exception() is None):
+                cache.put(key, future.result(), id)
+        future.add_done_callback(store)
+        return future
+
+    def solve_interactive_captcha(self, sitekey: str, maxtimeout: int = None, prio: int = None, deadline: float = None, token: CancelToken = None, **kwargs) -> Future:
+        """Submit an interactive captcha and wait for its answer in 
+        the background.
+
+        Takes the same arguments as :meth:`submit_interactive_captcha`, 
+        plus ``deadline`` and ``token`` of :meth:`get_answer_future`.
 
-    def submit_image_captcha(self, data: Union[str, io.BufferedReader], maxtimeout: int = 600, prio: int = 0, confirm: int = 0, selfsolve: int = 0, nomd5: int = 0, ocr: int = 0, debug: int = 0) -> int:
+        Returns
+        -------
+        concurrent.futures.Future
+            See :meth:`get_answer_future`. Its ``captcha_id`` attribute 
+            is the ID of the submission.
+        """
+        prio, maxtimeout = self.choose_submission(
+            prio, maxtimeout, kwargs.get("confirm", 0))
+        id = self.submit_interactive_captcha(
+            sitekey, maxtimeout=maxtimeout, prio=prio, **kwargs)
+        future = self.get_answer_future(
+            id, timeout=maxtimeout, deadline=deadline, token=token)
+        future.captcha_id = id
+        return future
+
+    def submit_image_captcha(self, data: Union[str, bytes, io.IOBase], maxtimeout: int = None, prio: int = None, confirm: int = 0, selfsolve: int = 0, nomd5: int = 0, ocr: int = 0, debug: int = 0) -> int:
         """Submit an image-based captcha.
 
         Parameters
         ----------
-        data : str or io.BufferedReader
+        data : str, bytes-like or file object
             The image data to be submitted. Can be a fully-qualified 
             URL (ie. must include ``https://`` or similar protocol 
-            identifier), a filename or an open, seekable file.
-        maxtimeout : int, default 600
-            Maximum timeout in range of 60 to 3999 seconds.
-        prio : int, default 0
+            identifier), a filename, base64-encoded data, any 
+            bytes-like object or any open binary file. The type is 
+            detected from the first few bytes only and the upload is 
+            streamed from the file or download, see 
+            :func:`captcha9kw.image.open_image`. With an 
+            :attr:`optimizer` in use, the image is shrunk first.
+        maxtimeout : int, default None
+            Maximum timeout in range of 60 to 3999 seconds. Picked by 
+            the :attr:`load_controller` if one is in use, 600 
+            otherwise.
+        prio : int, default None
             Priority for the submitted captcha from 1 to 20. Also 
-            increases credit cost by the same amount.
+            increases credit cost by the same amount. Picked by the 
+            :attr:`load_controller` if one is in use, 0 otherwise.
         confirm : int, default 0
             Have the answer double-checked by another account. 
             Increases credit cost by 6. Will be ignored, if maximum 
@@ -632,31 +1599,99 @@ class api9kw:
         int
             ID of the submission.
         """
-        results = None
-        if(type(data) is io.BufferedReader):
-            data.seek(0)
-            results = data.read()
-        elif(type(data) is str):
-            if(validators.url(data)):
-                results = requests.get(
-                    data, allow_redirects=True, timeout=(5, 3))
-                if(results.status_code != 200):
-                    raise RuntimeError(
-                        f"Error downloading image from given URL ('{data}')")
-                results = results.content
-            elif(pathlib.Path(data).is_file()):
-                with open(data, "rb") as file:
-                    results = file.read()
-            else:
-                results = base64.b64decode(data)
-        if(not filetype.guess(results) or not filetype.guess(results).mime.startswith("image/")):
-            raise ValueError("Submitted data is not an image.")
+        prio, maxtimeout = self.choose_submission(
+            prio, maxtimeout, confirm)
+        start = time.perf_counter()
+        image = self.__open_image(data)
+        if(self.__optimizer is not None):
+            try:
+                optimized = self.__optimizer.optimize(image.read())[0]
+            finally:
+                if(image is not data):
+                    image.close()
+            image = open_image(optimized)
+        if(self.__hooks):
+            emit(self.__hooks, "image", seconds=time.perf_counter() - start,
+                 bytes=image.size, optimized=self.__optimizer is not None)
         params = {"action": "usercaptchaupload", "base64": 0, "json": 1,
                   "maxtimeout": maxtimeout, "prio": prio, "selfsolve": selfsolve, "confirm": confirm, "apikey": self.__api_key, "nomd5": nomd5, "source": self.__name, "ocr": ocr, "debug": debug}
-        files = {"file-upload-01": results}
-        return int(self.__apiPost(params, files)["captchaid"])
+        try:
+            body = image.multipart("file-upload-01")
+            id = int(self.__apiPost(params, body=body)["captchaid"])
+        finally:
+            if(image is not data):
+                image.close()
+        self.__submitted(id, captcha_kind(0, prio, confirm))
+        if(self.__journal is not None):
+            self.__journal.submitted(id, maxtimeout, 0, prio, confirm)
+        if(self.__ledger is not None):
+            self.__charge(self.__ledger.estimate_cost(
+                0, prio, confirm, maxtimeout))
+        return id
+
+    def submit_image_captchas(self, items: Iterable, concurrency: int = 4, ordered: bool = False, **options) -> Iterator[Tuple[object, Union[int, Exception]]]:
+        """Submit a batch of image-based captchas concurrently.
+
+        Each item is downloaded, checked and uploaded by one of up to 
+        ``concurrency`` workers. A failing item doesn't abort the 
+        batch; its error is yielded in place of an ID instead. 
+        Closing the generator early, e.g. by breaking out of a loop 
+        over it, cancels the items not being uploaded yet.
 
-    def submit_interactive_captcha(self, sitekey: str, pageurl: str = None, captchatype: str = None, cookies: str = None, useragent: str = None, maxtimeout: int = 600, prio: int = 0, selfsolve: int = 0, confirm: int = 0, debug: int = 0):
+        Parameters
+        ----------
+        items : iterable
+            The images, each either anything :meth:`submit_image_captcha` 
+            accepts, or a tuple of that and a dictionary of options 
+            for this item only.
+        concurrency : int, default 4
+            Maximum number of items being processed at once.
+        ordered : bool, default False
+            Yield results in input order instead of completion order.
+        **options
+            Options for all items, as for :meth:`submit_image_captcha`.
+
+        Yields
+        ------
+        tuple
+            The item as given and either the ID of the submission or 
+            the exception it raised.
+        """
+        def submit(item):
+            data, extra = item, {}
+            if(type(item) is tuple and len(item) == 2 and isinstance(item[1], dict)):
+                data, extra = item
+            return self.submit_image_captcha(data, **dict(options, **extra))
+
+        items = iter(items)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="captcha9kw-submit") as executor:
+            def fill():
+                for item in items:
+                    pending.append((item, executor.submit(submit, item)))
+                    if(len(pending) >= concurrency * 2):
+                        break
+
+            try:
+                fill()
+                while pending:
+                    if(ordered):
+                        item, future = pending.popleft()
+                        wait([future])
+                    else:
+                        wait([f for _, f in pending],
+                             return_when=FIRST_COMPLETED)
+                        item, future = next(
+                            (i, f) for i, f in pending if f.done())
+                        pending.remove((item, future))
+                    error = future.exception()
+                    fill()
+                    yield (item, future.result() if error is None else error)
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def submit_interactive_captcha(self, sitekey: str, pageurl: str = None, captchatype: str = None, cookies: str = None, useragent: str = None, maxtimeout: int = None, prio: int = None, selfsolve: int = 0, confirm: int = 0, debug: int = 0):
         """Submit an interactive captcha, like e.g. reCaptcha V2.
 
         Parameters
@@ -676,11 +1711,14 @@ class api9kw:
         useragent: str, default None
             If solving the captcha requires a specific user-agent, set 
             that here.
-        maxtimeout : int, default 600
-            Maximum timeout in range of 60 to 3999 seconds.
-        prio : int, default 0
+        maxtimeout : int, default None
+            Maximum timeout in range of 60 to 3999 seconds. Picked by 
+            the :attr:`load_controller` if one is in use, 600 
+            otherwise.
+        prio : int, default None
             Priority for the submitted captcha from 1 to 20. Also 
-            increases credit cost by the same amount.
+            increases credit cost by the same amount. Picked by the 
+            :attr:`load_controller` if one is in use, 0 otherwise.
         selfsolve : int, default 0
             The captcha will only be solveable by the account the API 
             key belongs to.
@@ -697,6 +1735,8 @@ class api9kw:
         int
             ID of the submission.
         """
+        prio, maxtimeout = self.choose_submission(
+            prio, maxtimeout, confirm)
         params = {"action": "usercaptchaupload", "json": 1, "maxtimeout": maxtimeout,
                   "prio": prio, "selfsolve": selfsolve, "confirm": confirm, "apikey": self.__api_key, "interactive": 1, "source": self.__name}
         files = {"file-upload-01": sitekey}
@@ -705,7 +1745,14 @@ class api9kw:
         for x in ["cookies", "useragent", "pageurl", "debug"]:
             if(locals()[x] is not None):
                 params[x] = locals()[x]
-        return int(self.__apiPost(params, files)["captchaid"])
+        id = int(self.__apiPost(params, files)["captchaid"])
+        self.__submitted(id, captcha_kind(1, prio, confirm))
+        if(self.__journal is not None):
+            self.__journal.submitted(id, maxtimeout, 1, prio, confirm)
+        if(self.__ledger is not None):
+            self.__charge(self.__ledger.estimate_cost(
+                1, prio, confirm, maxtimeout))
+        return id
 
     def transfer_credits(self, credits: int, userid: int, transferart: int = 1) -> int:
         """Transfer credits to another account.
@@ -730,4 +1777,6 @@ class api9kw:
         """
         params = {"action": "usertransfer",
                   "json": 1, "apikey": self.__api_key, "source": self.__name, "guthaben": credits, "userid": userid, "transferart": transferart}
-        return int(self.__apiGet(params)["transferid"])
+        transferid = int(self.__apiGet(params)["transferid"])
+        self.__charge(credits)
+        return transferid
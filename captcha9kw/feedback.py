@@ -0,0 +1,175 @@
+"""Sending feedback on answers in the background.
+"""
+import atexit
+import queue
+import threading
+import time
+from collections import namedtuple
+
+_Report = namedtuple("_Report", ["id", "correct", "archive"])
+
+
+class FeedbackDispatcher:
+    """Queue feedback on answers and send it from background workers,
+    so reporting an answer as correct or incorrect costs the caller an
+    enqueue instead of a round-trip.
+
+    The reports go through the client's pooled transport and are
+    retried like any other feedback, see ``retries`` of
+    :class:`api9kw`. Whatever is still queued is sent on :meth:`close`
+    and when the interpreter exits, though at exit for no longer than
+    ``shutdown_timeout`` seconds, so an unreachable service can't hold
+    the process up; reports left over then are dropped.
+
+    Normally there's no need to create one of these directly, see
+    ``background_feedback`` of :class:`api9kw`.
+
+    Parameters
+    ----------
+    api : api9kw
+        The client the feedback is sent with.
+    workers : int, default 1
+        Number of reports in flight at any one time.
+    max_pending : int, default 10000
+        Maximum number of queued reports; further ones block the
+        caller until there's room again.
+    shutdown_timeout : float, default 5
+        Seconds to spend sending what's still queued when the
+        interpreter exits.
+    """
+
+    def __init__(self, api, workers: int = 1, max_pending: int = 10000, shutdown_timeout: float = 5):
+        self.shutdown_timeout = shutdown_timeout
+        self.__api = api
+        self.__queue = queue.Queue(max_pending)
+        self.__lock = threading.Lock()
+        self.__stats = {"sent": 0, "failed": 0, "dropped": 0}
+        self.__closed = False
+        self.__threads = []
+        for number in range(workers):
+            thread = threading.Thread(
+                target=self.__run, name=f"captcha9kw-feedback-{number}", daemon=True)
+            thread.start()
+            self.__threads.append(thread)
+        atexit.register(self.__shutdown)
+
+    @property
+    def pending(self) -> int:
+        """int: Number of reports queued or being sent.
+        """
+        return self.__queue.unfinished_tasks
+
+    @property
+    def stats(self) -> dict:
+        """dict: Number of reports ``sent``, of those that ``failed``
+        even after retrying and of those ``dropped`` unsent on
+        :meth:`close`.
+        """
+        with self.__lock:
+            return dict(self.__stats)
+
+    def put(self, id: int, correct: bool, archive: int = 0):
+        """Queue a report.
+
+        Parameters
+        ----------
+        id : int
+            ID of the captcha.
+        correct : bool
+            Whether the answer was correct.
+        archive : int, default 0
+            Access an archived captcha.
+        """
+        if(self.__closed):
+            raise RuntimeError("The feedback dispatcher has been closed.")
+        self.__queue.put(_Report(id, correct, archive))
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every queued report has been sent.
+
+        Parameters
+        ----------
+        timeout : float, default None
+            Seconds to wait at most. No limit by default.
+
+        Returns
+        -------
+        bool
+            Whether the queue was emptied in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        condition = self.__queue.all_tasks_done
+        with condition:
+            while(self.__queue.unfinished_tasks):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if(remaining is not None and remaining <= 0):
+                    return False
+                condition.wait(remaining)
+        return True
+
+    def close(self, timeout: float = None, drop: bool = False) -> bool:
+        """Send what's still queued and stop the workers.
+
+        Parameters
+        ----------
+        timeout : float, default None
+            Seconds to wait for the queue to empty at most. No limit
+            by default.
+        drop : bool, default False
+            Drop the reports not yet being sent once ``timeout`` has
+            passed, instead of sending them in the background.
+
+        Returns
+        -------
+        bool
+            Whether the queue was emptied in time.
+        """
+        atexit.unregister(self.__shutdown)
+        if(self.__closed):
+            return self.pending == 0
+        self.__closed = True
+        flushed = self.flush(timeout)
+        if(not flushed and drop):
+            self.__drop()
+        for _ in self.__threads:
+            try:
+                self.__queue.put_nowait(None)
+            except queue.Full:
+                break
+        return flushed
+
+    def __shutdown(self):
+        self.close(self.shutdown_timeout, drop=True)
+
+    def __drop(self):
+        while True:
+            try:
+                self.__queue.get_nowait()
+            except queue.Empty:
+                return
+            self.__count("dropped")
+            self.__queue.task_done()
+
+    def __run(self):
+        while True:
+            report = self.__queue.get()
+            if(report is None):
+                self.__queue.task_done()
+                return
+            try:
+                if(report.correct):
+                    self.__api.captcha_feedback_correct(
+                        report.id, report.archive, background=False)
+                else:
+                    self.__api.captcha_feedback_incorrect(
+                        report.id, report.archive, background=False)
+            except Exception:
+                self.__count("failed")
+            else:
+                self.__count("sent")
+            finally:
+                self.__queue.task_done()
+
+    def __count(self, key: str):
+        with self.__lock:
+            self.__stats[key] += 1
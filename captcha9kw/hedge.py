@@ -0,0 +1,240 @@
+"""Hedged submissions, trading credits for tail latency.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .image import open_image
+from .latency import CaptchaKind, captcha_kind
+from .ledger import CreditLedger
+
+
+class _Hedged:
+    """Book-keeping for one hedged captcha.
+    """
+
+    def __init__(self, future: Future, payload: bytes, options: dict, delay: float, cost: int):
+        self.future = future
+        self.payload = payload
+        self.options = options
+        self.delay = delay
+        self.cost = cost
+        self.ids = []
+        self.watches = {}
+        self.failed = 0
+        self.hedges = 0
+        self.timer = None
+        self.hedging = False
+        self.finished = False
+        self.lock = threading.RLock()
+
+
+class HedgedSolver:
+    """Solve image-based captchas with hedging: if no answer has
+    arrived by a high quantile of the usual solve time, the same image
+    is submitted again with ``nomd5=1``, so the service takes it as a
+    new captcha. The first answer to come back wins and the other
+    submissions are withdrawn with
+    :meth:`api9kw.captcha_cancel_submitted`.
+
+    Every hedge is paid for, so keep this for the captchas whose tail
+    latency matters more than their cost, and tune ``quantile`` and
+    ``max_hedges`` by :attr:`stats`.
+
+    Parameters
+    ----------
+    api : api9kw
+        The client to submit with.
+    quantile : float, default 0.9
+        Quantile of the solve times of the same kind of captcha, see
+        :attr:`api9kw.latency_stats`, after which to hedge.
+    max_hedges : int, default 1
+        Number of extra submissions per captcha at most. Each further
+        one comes the same delay after the last.
+    default_delay : float, default 30
+        Seconds after which to hedge while too few solve times have
+        been seen.
+    """
+
+    def __init__(self, api, quantile: float = 0.9, max_hedges: int = 1, default_delay: float = 30):
+        self.quantile = quantile
+        self.max_hedges = max_hedges
+        self.default_delay = default_delay
+        self.__api = api
+        self.__costs = api.ledger or CreditLedger()
+        self.__executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="captcha9kw-hedge")
+        self.__lock = threading.Lock()
+        self.__stats = {"solved": 0, "failed": 0, "hedged": 0, "hedges": 0,
+                        "hedge_wins": 0, "cancelled": 0, "overhead_credits": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def stats(self) -> dict:
+        """dict: Number of captchas ``solved`` and ``failed``, of those
+        ``hedged`` at least once, of extra submissions made as
+        ``hedges``, of answers won by a hedge as ``hedge_wins`` and of
+        submissions withdrawn as ``cancelled``, plus the estimated
+        cost of the hedges in ``overhead_credits``.
+        """
+        with self.__lock:
+            return dict(self.__stats)
+
+    def close(self):
+        """Stop withdrawing losing submissions once those underway are
+        done.
+        """
+        self.__executor.shutdown(wait=True)
+
+    def hedge_delay(self, kind: CaptchaKind) -> float:
+        """Seconds after submission at which to hedge a kind of
+        captcha.
+        """
+        stats = self.__api.latency_stats
+        if(stats.snapshot().get(kind, {}).get("count", 0) < stats.min_samples):
+            return self.default_delay
+        return stats.quantile(kind, self.quantile)
+
+    def solve_image_captcha(self, data, maxtimeout: int = None, prio: int = None, **kwargs) -> Future:
+        """Submit an image-based captcha, hedging it as needed, and
+        wait for its answer in the background.
+
+        Takes the same arguments as :meth:`api9kw.submit_image_captcha`.
+        The image is read once and every submission is made from that.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to the first answer, or raises the error of the
+            last submission to fail. Its ``captcha_id`` attribute is
+            the ID of the first submission until one is answered,
+            then the ID of the winner. Cancelling it withdraws all
+            submissions.
+        """
+        prio, maxtimeout = self.__api.choose_submission(
+            prio, maxtimeout, kwargs.get("confirm", 0))
+        with open_image(data, self.__api.transport) as image:
+            payload = image.read()
+        kwargs.pop("nomd5", None)
+        options = dict(kwargs, prio=prio, maxtimeout=maxtimeout)
+        confirm = kwargs.get("confirm", 0)
+        state = _Hedged(Future(), payload, options,
+                        self.hedge_delay(captcha_kind(0, prio, confirm)),
+                        self.__costs.estimate_cost(0, prio, confirm, maxtimeout))
+        id = self.__api.submit_image_captcha(payload, **options)
+        state.future.captcha_id = id
+        state.future.add_done_callback(
+            lambda future: self.__cancelled(state) if future.cancelled() else None)
+        with state.lock:
+            self.__watch(state, id)
+            self.__schedule(state)
+        return state.future
+
+    def __watch(self, state: _Hedged, id: int):
+        watch = self.__api.get_answer_future(
+            id, timeout=state.options["maxtimeout"])
+        state.ids.append(id)
+        state.watches[id] = watch
+        watch.add_done_callback(lambda watch: self.__settle(state, id, watch))
+
+    def __schedule(self, state: _Hedged):
+        if(state.hedges >= self.max_hedges or state.finished or state.future.done()):
+            return
+        state.hedging = True
+        state.timer = threading.Timer(state.delay, self.__hedge, (state,))
+        state.timer.daemon = True
+        state.timer.start()
+
+    def __hedge(self, state: _Hedged):
+        with state.lock:
+            if(state.finished or state.future.done()):
+                return
+            state.hedges += 1
+        try:
+            id = self.__api.submit_image_captcha(
+                state.payload, nomd5=1, **state.options)
+        except Exception as e:
+            with state.lock:
+                state.hedging = False
+                self.__schedule(state)
+                if(state.hedging or state.failed < len(state.ids)):
+                    return
+            self.__finish(state, error=e)
+            return
+        self.__count(hedges=1, overhead_credits=state.cost,
+                     hedged=int(len(state.ids) == 1))
+        with state.lock:
+            state.hedging = False
+            if(not (state.finished or state.future.done())):
+                self.__watch(state, id)
+                self.__schedule(state)
+                return
+        self.__withdraw([id])
+
+    def __settle(self, state: _Hedged, id: int, watch: Future):
+        if(watch.cancelled()):
+            return
+        error = watch.exception()
+        with state.lock:
+            if(state.finished or state.future.done()):
+                return
+            if(error is not None):
+                state.failed += 1
+                if(state.hedging or state.failed < len(state.ids)):
+                    return
+        if(error is None):
+            self.__finish(state, id, watch.result())
+        else:
+            self.__finish(state, error=error)
+
+    def __finish(self, state: _Hedged, id: int = None, answer: str = None, error: Exception = None):
+        with state.lock:
+            if(state.finished or state.future.done()):
+                return
+            state.finished = True
+            if(state.timer is not None):
+                state.timer.cancel()
+            losers = [other for other in state.ids if other != id and not state.watches[other].done()]
+        if(id is not None):
+            state.future.captcha_id = id
+        try:
+            if(error is None):
+                state.future.set_result(answer)
+            else:
+                state.future.set_exception(error)
+        except Exception:
+            return
+        if(error is None):
+            self.__count(solved=1, hedge_wins=int(id != state.ids[0]))
+        else:
+            self.__count(failed=1)
+        for loser in losers:
+            state.watches[loser].cancel()
+        self.__withdraw(losers)
+
+    def __cancelled(self, state: _Hedged):
+        with state.lock:
+            if(state.timer is not None):
+                state.timer.cancel()
+            ids = [id for id in state.ids if not state.watches[id].done()]
+        for id in ids:
+            state.watches[id].cancel()
+        self.__withdraw(ids)
+
+    def __withdraw(self, ids: list):
+        for id in ids:
+            self.__count(cancelled=1)
+            try:
+                self.__executor.submit(
+                    self.__api.captcha_cancel_submitted, id)
+            except RuntimeError:
+                pass
+
+    def __count(self, **amounts):
+        with self.__lock:
+            for key, amount in amounts.items():
+                self.__stats[key] += amount
@@ -0,0 +1,85 @@
+"""Walking the paginated history endpoints record by record.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+
+from .captcha9kw import APIError
+
+
+def page_records(results: dict) -> list:
+    """Pick the list of records out of one page of history results.
+
+    The records are the first list of dictionaries in the results, or
+    the values of the first dictionary of dictionaries.
+
+    Parameters
+    ----------
+    results : dict
+        One page as returned by e.g. :meth:`api9kw.captchas_solved`.
+
+    Returns
+    -------
+    list
+        The records on the page, empty if there are none.
+    """
+    for key, value in results.items():
+        if(key == "status"):
+            continue
+        if(isinstance(value, list) and all(isinstance(x, dict) for x in value)):
+            return value
+        if(isinstance(value, dict) and value and all(isinstance(x, dict) for x in value.values())):
+            return list(value.values())
+    return []
+
+
+def iter_pages(fetch: Callable[[int], dict], start: int = 0, prefetch: int = 2, workers: int = 2) -> Iterator[dict]:
+    """Yield the records of a paginated endpoint one by one, fetching
+    the following pages in the background while the current one is
+    consumed.
+
+    Iteration stops at the first empty page, at a page shorter than
+    the ones before it, or when the service reports there's no data.
+
+    Parameters
+    ----------
+    fetch : callable
+        Called with a page number, returns that page's results.
+    start : int, default 0
+        The first page to fetch.
+    prefetch : int, default 2
+        Number of pages to fetch ahead of the one being consumed.
+    workers : int, default 2
+        Maximum number of pages fetched at once.
+
+    Yields
+    ------
+    dict
+        The records, in the order the service returns them.
+    """
+    def fetch_records(page):
+        try:
+            return page_records(fetch(page))
+        except APIError as e:
+            if(e.code == "0006"):
+                return []
+            raise
+
+    pending = deque()
+    page = start
+    full = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="captcha9kw-history") as executor:
+        try:
+            while True:
+                while(len(pending) <= prefetch):
+                    pending.append(executor.submit(fetch_records, page))
+                    page += 1
+                records = pending.popleft().result()
+                if(not records or len(records) < full):
+                    yield from records
+                    return
+                full = max(full, len(records))
+                yield from records
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,272 @@
+"""Streaming ingestion of image data for upload.
+"""
+import hashlib
+import io
+import os
+
+SNIFF_SIZE = 262
+"""Number of leading bytes needed to detect the type of an image."""
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+
+
+class _BufferReader(io.RawIOBase):
+    """A seekable, read-only file over a buffer, without copying it.
+    """
+
+    def __init__(self, buffer):
+        self.__view = memoryview(buffer).cast("B")
+        self.__position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.__position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if(whence == io.SEEK_CUR):
+            offset += self.__position
+        elif(whence == io.SEEK_END):
+            offset += len(self.__view)
+        self.__position = max(0, offset)
+        return self.__position
+
+    def readinto(self, buffer):
+        chunk = self.__view[self.__position:self.__position + len(buffer)]
+        memoryview(buffer).cast("B")[:len(chunk)] = chunk
+        self.__position += len(chunk)
+        return len(chunk)
+
+
+class ImageSource:
+    """An image ready to be uploaded, backed by a seekable file.
+
+    Only the first :data:`SNIFF_SIZE` bytes are read to check the
+    type; the rest is streamed when uploading. Use :func:`open_image`
+    to create one.
+
+    Attributes
+    ----------
+    file : file object
+        Seekable binary file positioned anywhere; the image starts at
+        ``offset``.
+    offset : int
+        Position of the first byte of the image in ``file``.
+    size : int
+        Size of the image in bytes.
+    mime : str
+        The detected MIME type, e.g. ``image/png``.
+    extension : str
+        The usual file extension of the type, e.g. ``png``.
+    """
+
+    def __init__(self, file, offset: int, size: int, owned: bool = False):
+        self.file = file
+        self.offset = offset
+        self.size = size
+        self.__owned = owned
+        file.seek(offset)
+        import filetype
+        kind = filetype.guess(bytearray(file.read(SNIFF_SIZE)))
+        file.seek(offset)
+        if(not kind or not kind.mime.startswith("image/")):
+            self.close()
+            raise ValueError("Submitted data is not an image.")
+        self.mime = kind.mime
+        self.extension = kind.extension
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def chunks(self, size: int = CHUNK_SIZE):
+        """Yield the image in chunks of at most ``size`` bytes.
+        """
+        self.file.seek(self.offset)
+        remaining = self.size
+        while remaining > 0:
+            chunk = self.file.read(min(size, remaining))
+            if(not chunk):
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    def read(self) -> bytes:
+        """The whole image as bytes.
+        """
+        return b"".join(self.chunks())
+
+    def sha256(self) -> str:
+        """Hex digest of the SHA-256 of the image, computed in chunks.
+        """
+        digest = hashlib.sha256()
+        for chunk in self.chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def multipart(self, field: str) -> "MultipartBody":
+        """A streaming ``multipart/form-data`` body with the image as
+        the only field.
+        """
+        return MultipartBody(self, field)
+
+    def close(self):
+        """Close the underlying file, if it was opened by
+        :func:`open_image`.
+        """
+        if(self.__owned):
+            self.file.close()
+
+
+class MultipartBody:
+    """A ``multipart/form-data`` request body that streams an image
+    from its file instead of building the body in memory.
+
+    It's both a readable file and an iterable with a known length, so
+    HTTP clients send it with a ``Content-Length`` header.
+    """
+
+    def __init__(self, image: ImageSource, field: str):
+        boundary = os.urandom(16).hex()
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self.__head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; "
+                       f"filename=\"{field}.{image.extension}\"\r\nContent-Type: {image.mime}\r\n\r\n").encode()
+        self.__tail = f"\r\n--{boundary}--\r\n".encode()
+        self.__image = image
+        self.__parts = None
+        self.__chunk = b""
+        self.__offset = 0
+
+    def __len__(self):
+        return len(self.__head) + self.__image.size + len(self.__tail)
+
+    def __iter__(self):
+        yield self.__head
+        yield from self.__image.chunks()
+        yield self.__tail
+
+    def rewind(self):
+        """Start reading the body from the beginning again.
+        """
+        self.__parts = None
+        self.__chunk = b""
+        self.__offset = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if(self.__parts is None):
+            self.__parts = iter(self)
+        pieces = []
+        while size != 0:
+            if(self.__offset >= len(self.__chunk)):
+                self.__chunk, self.__offset = next(self.__parts, None), 0
+                if(self.__chunk is None):
+                    self.__chunk = b""
+                    break
+                continue
+            end = len(self.__chunk) if size < 0 else min(
+                len(self.__chunk), self.__offset + size)
+            pieces.append(self.__chunk[self.__offset:end])
+            if(size > 0):
+                size -= end - self.__offset
+            self.__offset = end
+        return b"".join(pieces)
+
+
+def _check_size(size: int, max_size: int):
+    if(max_size is not None and size > max_size):
+        raise ValueError(
+            f"Image too large: {size} bytes, maximum is {max_size} bytes.")
+
+
+def _spool(chunks, max_size: int):
+    import tempfile
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            _check_size(size, max_size)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    return ImageSource(spool, 0, size, owned=True)
+
+
+def open_image(data, transport=None, max_size: int = None) -> ImageSource:
+    """Prepare image data for upload without reading more of it into
+    memory than necessary.
+
+    Parameters
+    ----------
+    data : str, bytes-like or file object
+        A fully-qualified URL, a filename, base64-encoded data, any
+        bytes-like object (``bytes``, ``bytearray``, ``memoryview``,
+        ``mmap`` etc.) or any readable binary file object. Seekable
+        files are read in place from the start; other streams and
+        downloads are spooled to a temporary file, which stays in
+        memory while small.
+    transport : Transport, default None
+        Transport used to download URLs.
+    max_size : int, default None
+        Maximum size of the image in bytes, checked before reading all
+        of it. No limit by default.
+
+    Returns
+    -------
+    ImageSource
+        The image, to be closed after use.
+
+    Raises
+    ------
+    ValueError
+        Raised when the data is not an image or is too large.
+    """
+    if(isinstance(data, ImageSource)):
+        _check_size(data.size, max_size)
+        return data
+    if(isinstance(data, str)):
+        import validators
+        if(validators.url(data)):
+            with transport.download(data) as (status_code, headers, chunks):
+                if(status_code != 200):
+                    raise RuntimeError(
+                        f"Error downloading image from given URL ('{data}')")
+                length = headers.get("Content-Length")
+                if(length and length.isdigit()):
+                    _check_size(int(length), max_size)
+                return _spool(chunks, max_size)
+        import base64
+        import pathlib
+        path = pathlib.Path(data)
+        if(path.is_file()):
+            _check_size(path.stat().st_size, max_size)
+            file = open(path, "rb")
+            try:
+                return ImageSource(file, 0, path.stat().st_size, owned=True)
+            except BaseException:
+                file.close()
+                raise
+        data = base64.b64decode(data)
+    try:
+        view = memoryview(data)
+    except TypeError:
+        view = None
+    if(view is not None):
+        _check_size(view.nbytes, max_size)
+        return ImageSource(_BufferReader(view), 0, view.nbytes)
+    if(not hasattr(data, "read")):
+        raise TypeError(
+            "Image data must be a string, a bytes-like object or a file.")
+    if(getattr(data, "seekable", lambda: False)()):
+        size = data.seek(0, os.SEEK_END)
+        _check_size(size, max_size)
+        return ImageSource(data, 0, size)
+    return _spool(iter(lambda: data.read(CHUNK_SIZE), b""), max_size)
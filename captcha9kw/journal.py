@@ -0,0 +1,203 @@
+"""An on-disk journal of the captchas in flight.
+"""
+import json
+import os
+import threading
+import time
+from typing import List
+
+
+class Journal:
+    """Record submissions, answers and feedback in an append-only file,
+    so captchas submitted by a process that dies before their answers
+    arrive can be picked up again instead of being paid for twice.
+
+    Every change is one line of JSON, flushed before the call returns.
+    A captcha is live from its submission until feedback is given on
+    its answer, it times out or is cancelled, or its answer has gone
+    without feedback for ``retention`` seconds. Once ``compact_every``
+    lines have been written, the file is rewritten with the live
+    captchas alone. A line torn by a crash mid-write is skipped when
+    the journal is read back.
+
+    See :meth:`api9kw.resume` for picking up where a previous process
+    left off.
+
+    Parameters
+    ----------
+    path : str
+        The journal's file, created if missing.
+    compact_every : int, default 1000
+        Number of lines written after which to compact the file. It
+        is also compacted when opened.
+    sync : bool, default False
+        Also ``fsync`` every line, so the journal survives power loss
+        and not just the process dying, at the cost of a disk write
+        per call.
+    retention : float, default None
+        Seconds an answered captcha is kept waiting for feedback.
+        Defaults to the ``maxtimeout`` it was submitted with.
+    """
+
+    def __init__(self, path: str, compact_every: int = 1000, sync: bool = False, retention: float = None):
+        self.path = path
+        self.compact_every = compact_every
+        self.sync = sync
+        self.retention = retention
+        self.__entries = {}
+        self.__written = 0
+        self.__lock = threading.Lock()
+        torn = False
+        if(os.path.exists(path)):
+            with open(path, encoding="utf-8", errors="replace") as file:
+                for line in file:
+                    try:
+                        self.__apply(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        torn = True
+        self.__file = open(path, "a", encoding="utf-8")
+        if(torn or os.path.getsize(path) > 0):
+            self.compact()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries)
+
+    @property
+    def entries(self) -> dict:
+        """dict: Maps the IDs of the live captchas to their records:
+        ``submitted`` as a ``time.time()`` timestamp, ``maxtimeout``,
+        ``interactive``, ``prio``, ``confirm`` and, once answered,
+        ``answer`` and ``answered``, another ``time.time()``
+        timestamp.
+        """
+        with self.__lock:
+            return {id: dict(entry) for id, entry in self.__entries.items()}
+
+    def unresolved(self) -> List[int]:
+        """IDs of the live captchas still waiting for an answer.
+        """
+        with self.__lock:
+            return [id for id, entry in self.__entries.items() if "answer" not in entry]
+
+    def expired(self, now: float = None) -> List[int]:
+        """IDs of the captchas still waiting for an answer past their
+        ``maxtimeout``, and of the answered ones kept past their
+        ``retention``.
+
+        Parameters
+        ----------
+        now : float, default None
+            The ``time.time()`` timestamp to compare with. Defaults to
+            now.
+        """
+        now = time.time() if now is None else now
+        with self.__lock:
+            return [id for id, entry in self.__entries.items() if self.__expires(entry) <= now]
+
+    def submitted(self, id: int, maxtimeout: int = 600, interactive: int = 0, prio: int = 0, confirm: int = 0):
+        """Record a submission.
+        """
+        self.__write({"event": "submit", "id": int(id), "submitted": time.time(), "maxtimeout": maxtimeout,
+                      "interactive": int(bool(interactive)), "prio": int(prio or 0), "confirm": int(bool(confirm))})
+
+    def answered(self, id: int, answer: str):
+        """Record the answer to a captcha.
+        """
+        self.__write({"event": "answer", "id": int(id),
+                     "answer": answer, "answered": time.time()})
+
+    def feedback(self, id: int, correct: bool):
+        """Record that feedback was given on a captcha's answer, which
+        ends its record.
+        """
+        self.__write({"event": "feedback", "id": int(id),
+                     "correct": int(bool(correct))})
+
+    def closed(self, id: int, reason: str = None):
+        """End the record of a captcha that won't be answered, e.g.
+        because it timed out or was cancelled.
+        """
+        self.__write({"event": "close", "id": int(id), "reason": reason})
+
+    def compact(self):
+        """Rewrite the file with the live captchas alone, dropping the
+        answered ones kept past their ``retention``.
+
+        The new file is written beside the old one and moved over it,
+        so a crash leaves one or the other intact.
+        """
+        with self.__lock:
+            self.__compact()
+
+    def close(self):
+        """Close the file.
+        """
+        with self.__lock:
+            if(not self.__file.closed):
+                self.__file.close()
+
+    def __apply(self, record: dict):
+        id, event = int(record["id"]), record["event"]
+        if(event == "submit"):
+            self.__entries[id] = {key: record[key] for key in (
+                "submitted", "maxtimeout", "interactive", "prio", "confirm")}
+        elif(event == "answer"):
+            if(id in self.__entries):
+                self.__entries[id]["answer"] = record["answer"]
+                self.__entries[id]["answered"] = record.get(
+                    "answered", time.time())
+        elif(event in ("feedback", "close")):
+            self.__entries.pop(id, None)
+        else:
+            raise ValueError(f"Unknown journal event '{event}'.")
+
+    def __expires(self, entry: dict) -> float:
+        if("answer" not in entry):
+            return entry["submitted"] + entry["maxtimeout"]
+        retention = entry["maxtimeout"] if self.retention is None else self.retention
+        return entry["answered"] + retention
+
+    def __write(self, record: dict):
+        with self.__lock:
+            if(self.__file.closed):
+                raise ValueError("The journal has been closed.")
+            self.__apply(record)
+            self.__file.write(json.dumps(record) + "\n")
+            self.__file.flush()
+            if(self.sync):
+                os.fsync(self.__file.fileno())
+            self.__written += 1
+            if(self.__written >= self.compact_every):
+                self.__compact()
+
+    def __compact(self):
+        now = time.time()
+        for id, entry in list(self.__entries.items()):
+            if("answer" in entry and self.__expires(entry) <= now):
+                del self.__entries[id]
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            for id, entry in self.__entries.items():
+                record = {key: value for key, value in entry.items()
+                          if key not in ("answer", "answered")}
+                file.write(json.dumps(
+                    dict(record, event="submit", id=id)) + "\n")
+                if("answer" in entry):
+                    file.write(json.dumps({"event": "answer", "id": id, "answer": entry["answer"],
+                                           "answered": entry["answered"]}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        closed = self.__file.closed
+        if(not closed):
+            self.__file.close()
+        os.replace(temporary, self.path)
+        self.__written = 0
+        if(not closed):
+            self.__file = open(self.path, "a", encoding="utf-8")
@@ -0,0 +1,154 @@
+"""Running solve-latency statistics used to schedule answer polls.
+"""
+import threading
+from collections import deque, namedtuple
+from typing import Iterator
+
+CaptchaKind = namedtuple("CaptchaKind", ["interactive", "prio", "confirm"])
+CaptchaKind.__doc__ = """The kind of a submitted captcha, as far as solve
+latency is concerned.
+
+Attributes
+----------
+interactive : bool
+    Whether the captcha is interactive rather than image-based.
+prio : int
+    The priority the captcha was submitted with.
+confirm : bool
+    Whether the answer is double-checked by another account.
+"""
+
+
+def captcha_kind(interactive: int = 0, prio: int = 0, confirm: int = 0) -> CaptchaKind:
+    """Build a :class:`CaptchaKind` from submission parameters.
+    """
+    return CaptchaKind(bool(interactive), int(prio or 0), bool(confirm))
+
+
+class LatencyStats:
+    """Keep a running distribution of solve times per kind of captcha
+    and derive a polling schedule from it.
+
+    The first poll lands near the expected solve time of that kind of
+    captcha and later polls back off geometrically. Until enough
+    samples have been seen for a kind, a fixed schedule is used.
+
+    Parameters
+    ----------
+    window : int, default 256
+        Number of most recent samples kept per kind.
+    min_samples : int, default 5
+        Samples needed before the learned schedule is used.
+    first_quantile : float, default 0.5
+        Quantile of the observed solve times at which to poll first.
+    default_delay : float, default 5
+        Seconds before the first poll when there isn't enough data.
+    interval : float, default 2
+        Seconds between the first and second poll when there isn't
+        enough data.
+    min_interval : float, default 0.5
+        Shortest allowed interval between polls.
+    max_interval : float, default 15
+        Longest allowed interval between polls.
+    backoff : float, default 1.5
+        Factor by which the interval grows after every poll.
+    """
+
+    def __init__(self, window: int = 256, min_samples: int = 5, first_quantile: float = 0.5, default_delay: float = 5, interval: float = 2, min_interval: float = 0.5, max_interval: float = 15, backoff: float = 1.5):
+        self.window = window
+        self.min_samples = min_samples
+        self.first_quantile = first_quantile
+        self.default_delay = default_delay
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.__samples = {}
+        self.__lock = threading.Lock()
+
+    def record(self, kind: CaptchaKind, seconds: float):
+        """Record the observed solve time of a captcha.
+
+        Parameters
+        ----------
+        kind : CaptchaKind
+            The kind of the captcha.
+        seconds : float
+            Seconds from submission to the answer becoming available.
+        """
+        with self.__lock:
+            if(kind not in self.__samples):
+                self.__samples[kind] = deque(maxlen=self.window)
+            self.__samples[kind].append(float(seconds))
+
+    def quantile(self, kind: CaptchaKind, q: float) -> float:
+        """The ``q``-quantile of the solve times of a kind of captcha,
+        or None if there are no samples.
+        """
+        with self.__lock:
+            samples = sorted(self.__samples.get(kind, ()))
+        return _quantile(samples, q)
+
+    def poll_offsets(self, kind: CaptchaKind, elapsed: float = 0) -> Iterator[float]:
+        """Yield the times, in seconds after submission, at which to
+        poll for the answer to a captcha.
+
+        The generator is infinite; the caller decides when to give up.
+
+        Parameters
+        ----------
+        kind : CaptchaKind
+            The kind of the captcha.
+        elapsed : float, default 0
+            Seconds since the submission when waiting starts. Polls
+            already due are replaced by a single one at ``elapsed``,
+            instead of being made back to back.
+        """
+        with self.__lock:
+            samples = sorted(self.__samples.get(kind, ()))
+        if(len(samples) >= self.min_samples):
+            offset = _quantile(samples, self.first_quantile)
+            spread = _quantile(samples, 0.9) - offset
+            interval = min(max(spread / 4, self.min_interval),
+                           self.max_interval)
+        else:
+            offset = self.default_delay
+            interval = self.interval
+        if(offset < elapsed):
+            while(offset < elapsed + self.min_interval):
+                offset += interval
+                interval = min(interval * self.backoff, self.max_interval)
+            yield elapsed
+        while True:
+            yield offset
+            offset += interval
+            interval = min(interval * self.backoff, self.max_interval)
+
+    def snapshot(self) -> dict:
+        """The learned statistics per kind of captcha.
+
+        Returns
+        -------
+        dict
+            Maps each :class:`CaptchaKind` to a dictionary with the
+            sample ``count``, ``mean``, ``p50``, ``p90`` and ``p99`` in
+            seconds.
+        """
+        with self.__lock:
+            items = [(kind, sorted(samples))
+                     for kind, samples in self.__samples.items()]
+        return {kind: {"count": len(samples),
+                       "mean": sum(samples) / len(samples),
+                       "p50": _quantile(samples, 0.5),
+                       "p90": _quantile(samples, 0.9),
+                       "p99": _quantile(samples, 0.99)}
+                for kind, samples in items if samples}
+
+
+def _quantile(samples: list, q: float) -> float:
+    if(not samples):
+        return None
+    position = (len(samples) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(samples) - 1)
+    return samples[low] + (samples[high] - samples[low]) * (position - low)
@@ -0,0 +1,153 @@
+"""A client-side estimate of the account's balance.
+"""
+import threading
+import time
+from typing import Callable
+
+
+class CreditLedger:
+    """Track an estimate of the account's balance locally, so checking
+    it before a batch doesn't cost a round-trip.
+
+    The estimate starts from a real balance and is lowered by the
+    estimated cost of every submission, transfer and coupon made
+    through the client. It is synced with the real balance again only
+    every ``sync_interval`` seconds, after ``sync_every`` charges or
+    when drift is suspected, e.g. after the service has refused a
+    submission for insufficient balance.
+
+    Parameters
+    ----------
+    image_cost : int, default 10
+        Base cost of an image-based captcha in credits.
+    interactive_cost : int, default 30
+        Base cost of an interactive captcha in credits.
+    confirm_cost : int, default 6
+        Extra cost of having the answer double-checked.
+    sync_interval : float, default 300
+        Seconds after which the estimate is considered stale.
+    sync_every : int, default None
+        Number of charges after which the estimate is considered
+        stale. No limit by default.
+    threshold : int, default None
+        Call ``on_low_balance`` when the estimate drops below this.
+    on_low_balance : callable, default None
+        Called with the estimated balance when it drops below
+        ``threshold``. Fires once per crossing and never makes a
+        network call.
+    """
+
+    def __init__(self, image_cost: int = 10, interactive_cost: int = 30, confirm_cost: int = 6, sync_interval: float = 300, sync_every: int = None, threshold: int = None, on_low_balance: Callable[[int], None] = None):
+        self.image_cost = image_cost
+        self.interactive_cost = interactive_cost
+        self.confirm_cost = confirm_cost
+        self.sync_interval = sync_interval
+        self.sync_every = sync_every
+        self.threshold = threshold
+        self.on_low_balance = on_low_balance
+        self.__balance = None
+        self.__synced = None
+        self.__charges = 0
+        self.__spent = 0
+        self.__drift = 0
+        self.__suspect = False
+        self.__low = False
+        self.__lock = threading.Lock()
+
+    @property
+    def balance(self) -> int:
+        """int: The estimated balance, or None before the first sync.
+        """
+        return self.__balance
+
+    @property
+    def drift(self) -> int:
+        """int: How far off the estimate was at the last sync;
+        positive when the real balance was lower.
+        """
+        return self.__drift
+
+    @property
+    def spent(self) -> int:
+        """int: Credits estimated to have been spent since the last
+        sync.
+        """
+        return self.__spent
+
+    def estimate_cost(self, interactive: int = 0, prio: int = 0, confirm: int = 0, maxtimeout: int = 600) -> int:
+        """Estimate the cost of submitting a captcha.
+
+        Parameters are the same as for the submission itself.
+
+        Returns
+        -------
+        int
+            The estimated cost in credits.
+        """
+        cost = self.interactive_cost if interactive else self.image_cost
+        cost += int(prio or 0)
+        if(confirm and maxtimeout >= 150):
+            cost += self.confirm_cost
+        return cost
+
+    def charge(self, credits: int):
+        """Lower the estimated balance.
+
+        Parameters
+        ----------
+        credits : int
+            The number of credits spent.
+        """
+        with self.__lock:
+            if(self.__balance is None):
+                return
+            self.__balance -= credits
+            self.__spent += credits
+            self.__charges += 1
+            balance = self.__balance
+            fire = (self.threshold is not None and balance <
+                    self.threshold and not self.__low)
+            if(fire):
+                self.__low = True
+        if(fire and self.on_low_balance):
+            self.on_low_balance(balance)
+
+    def sync(self, balance: int):
+        """Reset the estimate to the real balance.
+
+        Parameters
+        ----------
+        balance : int
+            The balance as reported by the service.
+        """
+        balance = int(balance)
+        with self.__lock:
+            if(self.__balance is not None):
+                self.__drift = self.__balance - balance
+            self.__balance = balance
+            self.__synced = time.monotonic()
+            self.__charges = 0
+            self.__spent = 0
+            self.__suspect = False
+            fire = (self.threshold is not None and balance <
+                    self.threshold and not self.__low)
+            self.__low = self.threshold is not None and balance < self.threshold
+        if(fire and self.on_low_balance):
+            self.on_low_balance(balance)
+
+    def suspect_drift(self):
+        """Mark the estimate as unreliable, so it gets synced on next
+        use.
+        """
+        with self.__lock:
+            self.__suspect = True
+
+    def needs_sync(self) -> bool:
+        """Whether the estimate should be synced with the real balance.
+        """
+        with self.__lock:
+            if(self.__balance is None or self.__suspect):
+                return True
+            if(time.monotonic() - self.__synced >= self.sync_interval):
+                return True
+            return self.sync_every is not None and self.__charges >= self.sync_every
@@ -0,0 +1,190 @@
+"""Choosing submission parameters from the service's current load.
+"""
+import math
+import threading
+import time
+from typing import Tuple
+
+
+class LoadController:
+    """Sample the service's status in the background and pick ``prio``
+    and ``maxtimeout`` for submissions from it.
+
+    The status is fetched from ``servercheck.json`` every ``interval``
+    seconds and cached in between, so deciding costs no round-trip. A
+    priority is only paid for when the expected solve time, i.e. the
+    recent average scaled by the queue length per worker, exceeds the
+    latency target, and grows with the excess.
+
+    Low-priority work can be held back with :meth:`wait_for_capacity`
+    while the queue is saturated.
+
+    Parameters
+    ----------
+    api : api9kw
+        The client used to fetch :attr:`api9kw.service_status`.
+    latency_target : float, default 60
+        Desired seconds from submission to answer.
+    interval : float, default 30
+        Seconds between samples.
+    max_prio : int, default 20
+        Highest priority to pick.
+    saturation : float, default 3
+        Queued captchas per worker above which the service counts as
+        saturated, see :meth:`wait_for_capacity`.
+    start : bool, default True
+        Start sampling right away.
+    """
+
+    KEYS = {"queue": "queue", "workers": "worker", "average": "avg1h"}
+    """Keys of the queue size, the number of workers and the recent
+    average solve time in seconds in ``servercheck.json``."""
+
+    def __init__(self, api, latency_target: float = 60, interval: float = 30, max_prio: int = 20, saturation: float = 3, start: bool = True):
+        self.latency_target = latency_target
+        self.interval = interval
+        self.max_prio = max_prio
+        self.saturation = saturation
+        self.__api = api
+        self.__status = None
+        self.__stop = threading.Event()
+        self.__changed = threading.Condition()
+        self.__thread = None
+        if(start):
+            self.start()
+
+    @property
+    def status(self) -> dict:
+        """dict: The most recent sample of the service's status, or
+        None before the first one.
+        """
+        return self.__status
+
+    @property
+    def load(self) -> float:
+        """float: Queued captchas per worker, or None when unknown.
+        """
+        status = self.__status
+        if(not status):
+            return None
+        queue = _number(status.get(self.KEYS["queue"]))
+        workers = _number(status.get(self.KEYS["workers"]))
+        if(queue is None or not workers):
+            return None
+        return queue / workers
+
+    @property
+    def expected_latency(self) -> float:
+        """float: Expected seconds from submission to answer at the
+        current load, or None when unknown.
+        """
+        status = self.__status
+        if(not status):
+            return None
+        average = _number(status.get(self.KEYS["average"]))
+        if(average is None):
+            return None
+        return average * (1 + (self.load or 0))
+
+    @property
+    def saturated(self) -> bool:
+        """bool: Whether the queue is longer than the service keeps up
+        with.
+        """
+        load = self.load
+        return load is not None and load > self.saturation
+
+    def start(self):
+        """Start sampling in the background.
+        """
+        if(self.__thread is None):
+            self.__stop.clear()
+            self.__thread = threading.Thread(
+                target=self.__run, name="captcha9kw-load", daemon=True)
+            self.__thread.start()
+
+    def close(self):
+        """Stop sampling.
+        """
+        self.__stop.set()
+        with self.__changed:
+            self.__changed.notify_all()
+        self.__thread = None
+
+    def sample(self) -> dict:
+        """Fetch the service's status now.
+        """
+        status = self.__api.service_status
+        with self.__changed:
+            self.__status = status
+            self.__changed.notify_all()
+        return status
+
+    def choose(self, latency_target: float = None, maxtimeout: int = 600, confirm: int = 0) -> Tuple[int, int]:
+        """Pick the priority and maximum timeout for a submission.
+
+        Parameters
+        ----------
+        latency_target : float, default None
+            Desired seconds from submission to answer. Defaults to the
+            controller's ``latency_target``.
+        maxtimeout : int, default 600
+            Maximum timeout to pick while the expected solve time is
+            unknown, e.g. before the first sample.
+        confirm : int, default 0
+            Whether the captcha is to be confirmed, which needs a
+            maximum timeout of at least 150 seconds.
+
+        Returns
+        -------
+        tuple
+            ``prio`` and ``maxtimeout``.
+        """
+        target = latency_target or self.latency_target
+        expected = self.expected_latency
+        if(expected is None or expected <= target):
+            prio = 0
+        else:
+            prio = math.ceil(self.max_prio * min(1, (expected - target) / target))
+        if(expected is not None):
+            maxtimeout = int(min(3999, max(60, 2 * max(target, expected))))
+        if(confirm):
+            maxtimeout = max(150, maxtimeout)
+        return prio, maxtimeout
+
+    def wait_for_capacity(self, timeout: float = None) -> bool:
+        """Hold back low-priority work while the service is saturated.
+
+        Parameters
+        ----------
+        timeout : float, default None
+            Seconds to wait at most. As long as it takes by default.
+
+        Returns
+        -------
+        bool
+            Whether the service has capacity.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.__changed:
+            while self.saturated and not self.__stop.is_set():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if(remaining is not None and remaining <= 0):
+                    return False
+                self.__changed.wait(remaining)
+        return not self.saturated
+
+    def __run(self):
+        while not self.__stop.is_set():
+            try:
+                self.sample()
+            except Exception:
+                pass
+            self.__stop.wait(self.interval)
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,202 @@
+"""Instrumentation hooks and a metrics recorder for them.
+
+A hook is any callable taking the name of an event and a dictionary of
+its fields. The events emitted are:
+
+``request``
+    One attempt at an API request: ``action``, ``method``, ``seconds``,
+    ``bytes_sent``, ``bytes_received`` and the error ``code``, None if
+    the request succeeded.
+``retry``
+    A failed request about to be repeated: ``action``, ``attempt`` and
+    the error ``code``, None for connection errors and timeouts.
+``image``
+    An image read and prepared for upload: ``seconds``, ``bytes`` and
+    ``optimized``.
+``poll``
+    One check for an answer: ``id`` and ``answered``.
+``answer``
+    An answer received: ``id``, ``kind`` and ``seconds`` since the
+    submission, None if the submission wasn't seen.
+"""
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Sequence
+
+Hook = Callable[[str, dict], None]
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   15, 30, 60, 120, 300, 600)
+"""Upper bounds in seconds of the default histogram buckets."""
+
+POLL_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34)
+"""Upper bounds of the buckets of polls per captcha."""
+
+
+def emit(hooks: Iterable[Hook], event: str, **fields):
+    """Pass an event to every hook.
+
+    Exceptions raised by hooks are swallowed, so instrumentation can
+    never break the calls it observes.
+    """
+    for hook in hooks:
+        try:
+            hook(event, fields)
+        except Exception:
+            pass
+
+
+class Histogram:
+    """A cumulative histogram over fixed buckets, as used by
+    Prometheus.
+
+    Parameters
+    ----------
+    buckets : sequence of float
+        The buckets' upper bounds in increasing order.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Add a sample.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """Pairs of upper bound and number of samples up to it, ending
+        with ``+Inf``.
+        """
+        results, total = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            results.append((bound, total))
+        return results
+
+
+class MetricsRecorder:
+    """A hook aggregating the events into counters and histograms.
+
+    Register it with :attr:`api9kw.hooks` and read the results with
+    :meth:`snapshot` or, in the Prometheus text format, with
+    :meth:`prometheus`.
+
+    Parameters
+    ----------
+    buckets : sequence of float, default DEFAULT_BUCKETS
+        Bucket bounds of the latency histograms in seconds.
+    max_pending : int, default 10000
+        Number of unanswered captchas whose polls are counted at most.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, max_pending: int = 10000):
+        self.buckets = tuple(buckets)
+        self.max_pending = max_pending
+        self.__lock = threading.Lock()
+        self.__histograms = {}
+        self.__counters = {}
+        self.__polls = OrderedDict()
+
+    def __call__(self, event: str, fields: dict):
+        with self.__lock:
+            if(event == "request"):
+                labels = (("action", fields["action"]),)
+                self.__observe("request_seconds", labels, fields["seconds"])
+                self.__count("sent_bytes_total", labels, fields["bytes_sent"])
+                self.__count("received_bytes_total", labels,
+                             fields["bytes_received"])
+                if(fields["code"] is not None):
+                    self.__count("errors_total", labels +
+                                 (("code", fields["code"]),))
+            elif(event == "retry"):
+                self.__count("retries_total", (("action", fields["action"]),
+                                               ("code", fields["code"] or "")))
+            elif(event == "image"):
+                self.__observe("image_seconds", (), fields["seconds"])
+                self.__count("image_bytes_total", (), fields["bytes"])
+            elif(event == "poll"):
+                self.__count("polls_total", ())
+                id = fields["id"]
+                self.__polls[id] = self.__polls.pop(id, 0) + 1
+                while(len(self.__polls) > self.max_pending):
+                    self.__polls.popitem(last=False)
+            elif(event == "answer"):
+                polls = self.__polls.pop(fields["id"], None)
+                if(polls is not None):
+                    self.__observe("polls_per_captcha", (),
+                                   polls, POLL_BUCKETS)
+                if(fields["seconds"] is not None):
+                    kind = fields["kind"]
+                    labels = (("kind", "interactive" if kind and kind.interactive else "image"),)
+                    self.__observe("answer_seconds", labels, fields["seconds"])
+
+    def snapshot(self) -> dict:
+        """All metrics recorded so far.
+
+        Returns
+        -------
+        dict
+            Maps each metric name to a dictionary from label tuples to
+            a counter value, or to a dictionary of ``count``, ``sum``
+            and cumulative ``buckets`` for histograms.
+        """
+        with self.__lock:
+            results = {name: dict(series)
+                       for name, series in self.__counters.items()}
+            for name, series in self.__histograms.items():
+                results[name] = {labels: {"count": h.count, "sum": h.sum, "buckets": h.cumulative()}
+                                 for labels, h in series.items()}
+        return results
+
+    def prometheus(self, prefix: str = "captcha9kw_") -> str:
+        """All metrics recorded so far in the Prometheus text
+        exposition format.
+        """
+        lines = []
+        with self.__lock:
+            for name, series in sorted(self.__counters.items()):
+                lines.append(f"# TYPE {prefix}{name} counter")
+                for labels, value in series.items():
+                    lines.append(
+                        f"{prefix}{name}{_labels(labels)} {_number(value)}")
+            for name, series in sorted(self.__histograms.items()):
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                for labels, histogram in series.items():
+                    for bound, count in histogram.cumulative():
+                        le = "+Inf" if bound == float("inf") else _number(bound)
+                        lines.append(
+                            f"{prefix}{name}_bucket{_labels(labels + (('le', le),))} {count}")
+                    lines.append(
+                        f"{prefix}{name}_sum{_labels(labels)} {_number(histogram.sum)}")
+                    lines.append(
+                        f"{prefix}{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def __count(self, name: str, labels: tuple, value: float = 1):
+        series = self.__counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0) + value
+
+    def __observe(self, name: str, labels: tuple, value: float, buckets: Sequence[float] = None):
+        series = self.__histograms.setdefault(name, {})
+        if(labels not in series):
+            series[labels] = Histogram(buckets or self.buckets)
+        series[labels].observe(value)
+
+
+def _labels(labels: tuple) -> str:
+    if(not labels):
+        return ""
+    pairs = ",".join('{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                     for key, value in labels)
+    return "{" + pairs + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
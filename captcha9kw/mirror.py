@@ -0,0 +1,250 @@
+"""A local SQLite mirror of the account's captcha history.
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, Sequence
+
+from .latency import _quantile
+
+ENDPOINTS = {
+    "submitted": "iter_captchas_submitted",
+    "solved": "iter_captchas_solved",
+    "failed": "iter_captchas_failed",
+}
+"""The mirrored history endpoints and the :class:`api9kw` methods
+walking them."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    endpoint TEXT NOT NULL,
+    captcha_id INTEGER NOT NULL,
+    timestamp REAL,
+    source TEXT,
+    result TEXT,
+    solve_time REAL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (endpoint, captcha_id)
+);
+CREATE INDEX IF NOT EXISTS records_captcha_id ON records (captcha_id);
+CREATE INDEX IF NOT EXISTS records_timestamp ON records (timestamp);
+CREATE INDEX IF NOT EXISTS records_source ON records (source);
+CREATE INDEX IF NOT EXISTS records_result ON records (result);
+CREATE TABLE IF NOT EXISTS details (
+    captcha_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    endpoint TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL,
+    synced REAL NOT NULL
+);
+"""
+
+
+class HistoryMirror:
+    """Mirror the history endpoints into a local SQLite database, so
+    reporting and analytics don't touch the network.
+
+    Every :meth:`sync` walks each endpoint from the newest record and
+    stops at the newest captcha ID stored by the previous sync.
+
+    The service's record fields are mapped to indexed columns through
+    :attr:`FIELDS`; the full record is always kept as JSON in the
+    ``data`` column.
+
+    Parameters
+    ----------
+    api : api9kw
+        The client to fetch the history with.
+    path : str
+        File of the SQLite database.
+    prefetch : int, default 2
+        Number of pages to fetch ahead while syncing.
+    """
+
+    FIELDS = {
+        "captcha_id": ("id", "captchaid", "captcha_id"),
+        "timestamp": ("time", "timestamp", "date", "created"),
+        "source": ("source", "oldsource"),
+        "result": ("result", "ok", "status", "correct"),
+        "solve_time": ("solvetime", "solve_time", "duration", "needed"),
+    }
+    """Candidate record keys for each column, first match wins."""
+
+    def __init__(self, api, path: str, prefetch: int = 2):
+        self.__api = api
+        self.__prefetch = prefetch
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.executescript(_SCHEMA)
+        self.__lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the database.
+        """
+        with self.__lock:
+            self.__db.close()
+
+    def checkpoint(self, endpoint: str) -> int:
+        """The newest captcha ID stored for an endpoint, or None.
+        """
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT last_id FROM checkpoints WHERE endpoint = ?", (endpoint,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, endpoints: Iterable[str] = ENDPOINTS, details: bool = False, **filters) -> dict:
+        """Fetch the records added since the last sync.
+
+        Parameters
+        ----------
+        endpoints : iterable of str, default all
+            Which of ``submitted``, ``solved`` and ``failed`` to sync.
+        details : bool, default False
+            Also fetch :meth:`api9kw.captcha_details` for every new
+            captcha.
+        **filters
+            Passed on to the history queries, e.g. ``archive=1``.
+
+        Returns
+        -------
+        dict
+            Number of new records per endpoint.
+        """
+        counts = {}
+        for endpoint in endpoints:
+            last = self.checkpoint(endpoint)
+            newest = last
+            rows = []
+            records = getattr(self.__api, ENDPOINTS[endpoint])(
+                prefetch=self.__prefetch, **filters)
+            try:
+                for record in records:
+                    row = self.__row(endpoint, record)
+                    if(row[1] is None):
+                        continue
+                    if(last is not None and row[1] <= last):
+                        break
+                    newest = row[1] if newest is None else max(newest, row[1])
+                    rows.append(row)
+            finally:
+                records.close()
+            with self.__lock, self.__db:
+                self.__db.executemany(
+                    "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                if(newest is not None):
+                    self.__db.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)",
+                                      (endpoint, newest, time.time()))
+            counts[endpoint] = len(rows)
+            if(details):
+                for row in rows:
+                    self.sync_details(row[1])
+        return counts
+
+    def sync_details(self, id: int):
+        """Fetch and store the details of one captcha.
+        """
+        results = self.__api.captcha_details(id)
+        with self.__lock, self.__db:
+            self.__db.execute("INSERT OR REPLACE INTO details VALUES (?, ?, ?)",
+                              (id, json.dumps(results), time.time()))
+
+    def query(self, sql: str, parameters: Sequence = ()) -> list:
+        """Run any SQL query against the mirror and return all rows.
+        """
+        with self.__lock:
+            return self.__db.execute(sql, parameters).fetchall()
+
+    def details(self, id: int) -> dict:
+        """The stored details of a captcha, or None.
+        """
+        rows = self.query(
+            "SELECT data FROM details WHERE captcha_id = ?", (id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def solve_time_percentiles(self, percentiles: Sequence[float] = (0.5, 0.9, 0.99), source: str = None, endpoint: str = "submitted") -> dict:
+        """Percentiles of the solve times of mirrored captchas.
+
+        Parameters
+        ----------
+        percentiles : sequence of float, default (0.5, 0.9, 0.99)
+            The percentiles to compute, between 0 and 1.
+        source : str, default None
+            Only captchas submitted by this software.
+        endpoint : str, default "submitted"
+            Which endpoint's records to use.
+
+        Returns
+        -------
+        dict
+            Maps each percentile to a solve time, or to None if there
+            are no solve times.
+        """
+        sql = "SELECT solve_time FROM records WHERE endpoint = ? AND solve_time IS NOT NULL"
+        parameters = [endpoint]
+        if(source is not None):
+            sql += " AND source = ?"
+            parameters.append(source)
+        times = [row[0] for row in self.query(
+            sql + " ORDER BY solve_time", parameters)]
+        return {p: _quantile(times, p) for p in percentiles}
+
+    def failure_rate_by_source(self) -> dict:
+        """Share of submitted captchas that failed, per source.
+
+        Returns
+        -------
+        dict
+            Maps each source to a rate between 0 and 1.
+        """
+        rows = self.query("""
+            SELECT source,
+                   SUM(endpoint = 'failed'),
+                   SUM(endpoint = 'submitted')
+            FROM records GROUP BY source""")
+        return {source: failed / submitted for source, failed, submitted in rows if submitted}
+
+    def __row(self, endpoint: str, record: dict) -> tuple:
+        values = {}
+        for column, keys in self.FIELDS.items():
+            values[column] = next(
+                (record[key] for key in keys if record.get(key) not in [None, ""]), None)
+        return (endpoint, _to_int(values["captcha_id"]), _to_time(values["timestamp"]),
+                values["source"], None if values["result"] is None else str(
+                    values["result"]),
+                _to_float(values["solve_time"]), json.dumps(record))
+
+
+def _to_int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_time(value) -> float:
+    number = _to_float(value)
+    if(number is not None or value is None):
+        return number
+    for format in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%d.%m.%Y %H:%M:%S", "%Y-%m-%d"]:
+        try:
+            return datetime.strptime(str(value), format).timestamp()
+        except ValueError:
+            pass
+    return None
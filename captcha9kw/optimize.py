@@ -0,0 +1,164 @@
+"""Shrinking images before they are uploaded.
+"""
+import io
+import threading
+from collections import namedtuple
+from typing import Callable, Tuple
+
+Image = None
+"""The ``PIL.Image`` module, imported by the first :class:`ImageOptimizer`."""
+
+OptimizationReport = namedtuple("OptimizationReport", [
+                                "original_size", "optimized_size", "original_dimensions", "optimized_dimensions", "format"])
+OptimizationReport.__doc__ = """What :meth:`ImageOptimizer.optimize` did to an
+image.
+
+Attributes
+----------
+original_size : int
+    Size of the image in bytes before optimization.
+optimized_size : int
+    Size of the image in bytes after optimization.
+original_dimensions : tuple of int
+    Width and height before optimization.
+optimized_dimensions : tuple of int
+    Width and height after optimization.
+format : str
+    Format of the optimized image, e.g. ``PNG``.
+"""
+
+
+class ImageOptimizer:
+    """Crop, downscale and re-encode images to fit a byte and pixel
+    budget before uploading them.
+
+    Smaller uploads are faster and avoid the service's error 0010,
+    "Image size not allowed". Requires the optional ``Pillow``
+    dependency, i.e. ``pip install captcha9kw[optimize]``.
+
+    Parameters
+    ----------
+    max_bytes : int, default None
+        Largest allowed size of the encoded image. For lossy formats
+        the quality is lowered first, then the image is downscaled
+        until it fits.
+    max_pixels : int, default None
+        Largest allowed width times height.
+    crop : tuple of int, default None
+        Box of ``(left, upper, right, lower)`` to crop the image to.
+    format : str, default "PNG"
+        Format to re-encode to: ``PNG`` (lossless, optimized),
+        ``JPEG`` or ``WEBP``.
+    quality : int, default 85
+        Starting quality for lossy formats.
+    min_quality : int, default 40
+        Lowest quality to go down to before downscaling instead.
+    on_report : callable, default None
+        Called with an :class:`OptimizationReport` for every image.
+    """
+
+    def __init__(self, max_bytes: int = None, max_pixels: int = None, crop: Tuple[int, int, int, int] = None, format: str = "PNG", quality: int = 85, min_quality: int = 40, on_report: Callable[[OptimizationReport], None] = None):
+        global Image
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ImportError(
+                "ImageOptimizer requires Pillow: pip install captcha9kw[optimize]")
+        format = format.upper()
+        if(format not in ["PNG", "JPEG", "WEBP"]):
+            raise ValueError("Format must be one of PNG, JPEG or WEBP.")
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.crop = crop
+        self.format = format
+        self.quality = quality
+        self.min_quality = min_quality
+        self.on_report = on_report
+        self.__lock = threading.Lock()
+        self.__totals = {"images": 0, "original_bytes": 0,
+                         "optimized_bytes": 0}
+
+    @property
+    def totals(self) -> dict:
+        """dict: Number of ``images`` optimized and their total
+        ``original_bytes`` and ``optimized_bytes``.
+        """
+        with self.__lock:
+            return dict(self.__totals)
+
+    def optimize(self, data: bytes) -> Tuple[bytes, OptimizationReport]:
+        """Optimize an image.
+
+        The original is kept, if re-encoding doesn't make it smaller
+        and it already fits the budget.
+
+        Parameters
+        ----------
+        data : bytes
+            The encoded image.
+
+        Returns
+        -------
+        tuple
+            The optimized image as bytes and an
+            :class:`OptimizationReport`.
+        """
+        with Image.open(io.BytesIO(data)) as original:
+            original.load()
+            dimensions = original.size
+            image = original
+            if(self.crop is not None):
+                image = image.crop(self.crop)
+            if(self.max_pixels and image.width * image.height > self.max_pixels):
+                image = self.__scale(
+                    image, (self.max_pixels / (image.width * image.height)) ** 0.5)
+            if(self.format == "JPEG" and image.mode not in ["RGB", "L"]):
+                image = image.convert("RGB")
+            results = self.__fit(image)
+            changed = image is not original
+            if(not changed and len(results) >= len(data) and not self.__too_big(data)):
+                results, size = data, dimensions
+                format = original.format
+            else:
+                with Image.open(io.BytesIO(results)) as optimized:
+                    size = optimized.size
+                format = self.format
+        report = OptimizationReport(
+            len(data), len(results), dimensions, size, format)
+        with self.__lock:
+            self.__totals["images"] += 1
+            self.__totals["original_bytes"] += report.original_size
+            self.__totals["optimized_bytes"] += report.optimized_size
+        if(self.on_report):
+            self.on_report(report)
+        return results, report
+
+    def __too_big(self, data: bytes) -> bool:
+        return self.max_bytes is not None and len(data) > self.max_bytes
+
+    def __encode(self, image, quality: int) -> bytes:
+        output = io.BytesIO()
+        if(self.format == "PNG"):
+            image.save(output, "PNG", optimize=True)
+        else:
+            image.save(output, self.format, quality=quality)
+        return output.getvalue()
+
+    def __fit(self, image) -> bytes:
+        quality = self.quality
+        results = self.__encode(image, quality)
+        while(self.__too_big(results)):
+            if(self.format != "PNG" and quality > self.min_quality):
+                quality = max(quality - 10, self.min_quality)
+            elif(image.width > 16 and image.height > 16):
+                image = self.__scale(image, 0.8)
+            else:
+                break
+            results = self.__encode(image, quality)
+        return results
+
+    @staticmethod
+    def __scale(image, factor: float):
+        size = (max(1, int(image.width * factor)),
+                max(1, int(image.height * factor)))
+        return image.resize(size, Image.LANCZOS)
@@ -0,0 +1,264 @@
+"""A shared background poller for captcha answers.
+"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .cancel import CancelToken
+from .captcha9kw import CaptchaError, RetryableAPIError
+from .latency import CaptchaKind, LatencyStats, captcha_kind
+from .metrics import emit
+
+
+class _Watch:
+    """Book-keeping for a single outstanding captcha.
+    """
+    __slots__ = ("id", "archive", "future", "deadline", "expires", "polls", "kind",
+                 "submitted", "known", "offsets", "last_miss", "token", "on_cancel")
+
+    def __init__(self, id: int, archive: int, future: Future, deadline: float, kind: CaptchaKind, submitted: float, known: bool, offsets, expires: float = None, token: CancelToken = None):
+        self.id = id
+        self.archive = archive
+        self.future = future
+        self.deadline = deadline
+        self.expires = expires
+        self.token = token
+        self.on_cancel = None
+        self.polls = 0
+        self.kind = kind
+        self.submitted = submitted
+        self.known = known
+        self.offsets = offsets
+        self.last_miss = None
+
+
+class AnswerPoller:
+    """Poll for the answers to any number of captchas from one
+    scheduler thread and a bounded set of workers.
+
+    Every watched captcha gets a :class:`concurrent.futures.Future`
+    that resolves to the answer, so waiting on hundreds of captchas
+    does not require hundreds of blocked threads. All polls go through
+    the pooled session of the :class:`api9kw` instance given.
+
+    Normally there's no need to create one of these directly, see
+    :meth:`api9kw.get_answer_future`.
+
+    Polls are timed after the solve times observed for each kind of
+    captcha, which the poller also keeps feeding with new samples.
+
+    Parameters
+    ----------
+    api : api9kw
+        The client used for polling.
+    workers : int, default 4
+        Maximum number of polls in flight at any one time.
+    stats : LatencyStats, default None
+        Statistics to schedule polls with. Defaults to the client's
+        :attr:`api9kw.latency_stats`.
+    """
+
+    def __init__(self, api, workers: int = 4, stats: LatencyStats = None):
+        self.__api = api
+        self.__stats = stats or api.latency_stats
+        self.__errors = api.transport.errors
+        self.__queue = []
+        self.__counter = itertools.count()
+        self.__watches = {}
+        self.__condition = threading.Condition()
+        self.__closed = False
+        self.__executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="captcha9kw-poll")
+        self.__thread = threading.Thread(
+            target=self.__run, name="captcha9kw-poller", daemon=True)
+        self.__thread.start()
+
+    @property
+    def pending(self) -> int:
+        """int: Number of captchas still waiting for an answer.
+        """
+        with self.__condition:
+            return len(self.__watches)
+
+    def watch(self, id: int, archive: int = 0, timeout: float = 600, kind: CaptchaKind = None, submitted: float = None, deadline: float = None, token: CancelToken = None) -> Future:
+        """Start polling for the answer to a captcha.
+
+        Parameters
+        ----------
+        id : int
+            ID of the submitted captcha.
+        archive : int, default 0
+            Whether to access an archived captcha.
+        timeout : float, default 600
+            Seconds from submission after which to give up, usually
+            the ``maxtimeout`` the captcha was submitted with.
+        kind : CaptchaKind, default None
+            The kind of the captcha, used to time the polls. Defaults
+            to a plain image captcha.
+        submitted : float, default None
+            When the captcha was submitted, as a ``time.monotonic()``
+            timestamp. Defaults to now. Solve times are only recorded
+            for captchas with a known submission time.
+        deadline : float, default None
+            When to stop polling and withdraw the captcha, as a
+            ``time.monotonic()`` timestamp.
+        token : CancelToken, default None
+            Stop polling and withdraw the captcha as soon as the token
+            is cancelled.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to the answer, or raises :class:`CaptchaError`
+            when the captcha times out or the ``deadline`` passes.
+            Cancelled when the ``token`` is.
+        """
+        future = Future()
+        known = submitted is not None
+        if(not known):
+            submitted = time.monotonic()
+        if(kind is None):
+            kind = captcha_kind()
+        offsets = self.__stats.poll_offsets(
+            kind, time.monotonic() - submitted)
+        with self.__condition:
+            if(self.__closed):
+                raise RuntimeError("The poller has been closed.")
+            watch = _Watch(id, archive, future, submitted + timeout,
+                           kind, submitted, known, offsets, deadline, token)
+            self.__watches[id] = watch
+            self.__schedule(watch, submitted + next(offsets))
+        if(token is not None):
+            watch.on_cancel = lambda: self.__give_up(watch)
+            token.add_callback(watch.on_cancel)
+        return future
+
+    def close(self, cancel: bool = True):
+        """Stop the poller.
+
+        Parameters
+        ----------
+        cancel : bool, default True
+            Cancel the futures of captchas still waiting for an answer.
+        """
+        with self.__condition:
+            self.__closed = True
+            watches = list(self.__watches.values())
+            self.__watches.clear()
+            self.__queue.clear()
+            self.__condition.notify_all()
+        if(cancel):
+            for watch in watches:
+                watch.future.cancel()
+        self.__executor.shutdown(wait=False)
+
+    def __schedule(self, watch: _Watch, when: float):
+        if(watch.expires is not None):
+            when = min(when, watch.expires)
+        heapq.heappush(self.__queue, (when, next(self.__counter), watch))
+        self.__condition.notify()
+
+    def __forget(self, watch: _Watch):
+        with self.__condition:
+            if(self.__watches.get(watch.id) is watch):
+                del self.__watches[watch.id]
+        if(watch.on_cancel is not None):
+            watch.token.remove_callback(watch.on_cancel)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__closed:
+                    now = time.monotonic()
+                    if(self.__queue and self.__queue[0][0] <= now):
+                        break
+                    timeout = self.__queue[0][0] - now if self.__queue else None
+                    self.__condition.wait(timeout)
+                if(self.__closed):
+                    return
+                watch = heapq.heappop(self.__queue)[2]
+            if(watch.future.done()):
+                self.__forget(watch)
+                continue
+            if(watch.expires is not None and watch.expires <= time.monotonic()):
+                self.__give_up(watch, CaptchaError(
+                    "Deadline passed waiting for answer to captcha."))
+                continue
+            self.__executor.submit(self.__poll, watch)
+
+    def __poll(self, watch: _Watch):
+        try:
+            watch.polls += 1
+            results = self.__api.answer_status(watch.id, watch.archive)
+            if(results.get("answer")):
+                elapsed = None
+                if(watch.known):
+                    elapsed = time.monotonic() - watch.submitted
+                    if(watch.last_miss is not None):
+                        elapsed = (watch.last_miss + elapsed) / 2
+                    self.__stats.record(watch.kind, elapsed)
+                hooks = getattr(self.__api, "hooks", None)
+                if(hooks):
+                    emit(hooks, "answer", id=watch.id,
+                         kind=watch.kind, seconds=elapsed)
+                self.__resolve(watch, result=results["answer"])
+                return
+            if(("try_again" in results and not results["try_again"]) or results.get("timeout")):
+                self.__resolve(watch, error=CaptchaError(
+                    "Timeout waiting for answer to captcha."))
+                return
+        except (RetryableAPIError,) + self.__errors:
+            pass
+        except Exception as e:
+            self.__resolve(watch, error=e)
+            return
+        now = time.monotonic()
+        watch.last_miss = now - watch.submitted
+        if(now >= watch.deadline):
+            self.__resolve(watch, error=CaptchaError(
+                "Timeout waiting for answer to captcha."))
+            return
+        when = watch.submitted + next(watch.offsets)
+        while(when < now):
+            when = watch.submitted + next(watch.offsets)
+        with self.__condition:
+            if(not self.__closed):
+                self.__schedule(watch, min(max(when, now), watch.deadline))
+
+    def __give_up(self, watch: _Watch, error: Exception = None):
+        """Stop polling and withdraw the captcha; the future is 
+        cancelled, or fails with ``error`` if given.
+        """
+        self.__forget(watch)
+        if(watch.future.done()):
+            return
+        if(error is None):
+            if(not watch.future.cancel()):
+                return
+        elif(not self.__resolve(watch, error=error)):
+            return
+        try:
+            self.__executor.submit(self.__withdraw, watch.id)
+        except RuntimeError:
+            pass
+
+    def __withdraw(self, id: int):
+        try:
+            self.__api.captcha_cancel_submitted(id)
+        except Exception:
+            pass
+
+    def __resolve(self, watch: _Watch, result=None, error: Exception = None) -> bool:
+        self.__forget(watch)
+        if(watch.future.done()):
+            return False
+        try:
+            if(error is not None):
+                watch.future.set_exception(error)
+            else:
+                watch.future.set_result(result)
+        except Exception:
+            return False
+        return True
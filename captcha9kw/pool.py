@@ -0,0 +1,343 @@
+"""Spreading submissions over several accounts.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Iterable, Union
+
+from .cancel import CancelToken
+from .captcha9kw import (FATAL_ERRORS, RATE_ERRORS, APIError, CaptchaError,
+                         FatalAPIError, RetryableAPIError, api9kw)
+from .image import open_image
+from .ledger import CreditLedger
+from .ratelimit import RateLimiter
+
+STRATEGIES = ("least_outstanding", "round_robin")
+
+
+class KeyPool:
+    """Route submissions over several API keys, each with a client of
+    its own, and route every follow-up call to the key that owns the
+    captcha.
+
+    Keys the service rejects for good, with errors 0001-0004, 0011 or
+    0024, are taken out of rotation; keys hitting a rate limit, error
+    0015 or 0056, sit out ``cooldown`` seconds. A submission failing
+    for either reason is tried again with the next key. Keys with a
+    :class:`CreditLedger` have it synced with their balance on first
+    use, and are passed over while their estimated balance is below
+    ``min_balance``.
+
+    Parameters
+    ----------
+    keys : iterable of str or api9kw
+        The API keys, or clients set up with them.
+    strategy : str, default "least_outstanding"
+        ``least_outstanding`` picks the key with the fewest captchas
+        awaiting an answer relative to its weight, ``round_robin``
+        takes turns in proportion to the weights.
+    weights : dict, default None
+        Maps keys to their share of the submissions. 1 by default.
+    cooldown : float, default 60
+        Seconds a rate-limited key sits out.
+    rate_limits : dict, default None
+        Arguments of a :class:`RateLimiter` to give each key.
+    max_owned : int, default 100000
+        Number of captcha IDs whose owners are remembered.
+    min_balance : int, default 10
+        Estimated balance below which a key is passed over.
+    **options
+        Passed on to every :class:`api9kw` created. Each also gets its
+        own :class:`CreditLedger`, unless one is given.
+    """
+
+    def __init__(self, keys: Iterable[Union[str, api9kw]], strategy: str = "least_outstanding", weights: dict = None, cooldown: float = 60, rate_limits: dict = None, max_owned: int = 100000, min_balance: int = 10, **options):
+        if(strategy not in STRATEGIES):
+            raise ValueError(
+                "Strategy must be one of " + ", ".join(STRATEGIES) + ".")
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.max_owned = max_owned
+        self.min_balance = min_balance
+        self.__clients = OrderedDict()
+        self.__own = set()
+        for key in keys:
+            if(isinstance(key, api9kw)):
+                self.__clients[key.api_key] = key
+                continue
+            extra = dict(options)
+            extra.setdefault("ledger", CreditLedger())
+            if(rate_limits is not None):
+                extra["rate_limiter"] = RateLimiter(**rate_limits)
+            self.__clients[key] = api9kw(key, **extra)
+            self.__own.add(key)
+        if(not self.__clients):
+            raise ValueError("The pool needs at least one API key.")
+        weights = weights or {}
+        self.__weights = {key: weights.get(key, 1) for key in self.__clients}
+        self.__outstanding = dict.fromkeys(self.__clients, 0)
+        self.__current = dict.fromkeys(self.__clients, 0)
+        self.__disabled = {}
+        self.__cooling = {}
+        self.__owners = OrderedDict()
+        self.__open = set()
+        self.__lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the clients created by the pool.
+        """
+        for key in self.__own:
+            self.__clients[key].close()
+
+    @property
+    def active_keys(self) -> list:
+        """list: The keys in rotation right now.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            return [key for key in self.__clients if key not in self.__disabled and self.__cooling.get(key, 0) <= now]
+
+    @property
+    def balances(self) -> dict:
+        """dict: The estimated balance of each key, see
+        :attr:`api9kw.estimated_balance`. None for keys without a
+        ledger or not used yet.
+        """
+        results = {}
+        for key, client in self.__clients.items():
+            ledger = client.ledger
+            results[key] = ledger.balance if ledger is not None else None
+        return results
+
+    @property
+    def clients(self) -> dict:
+        """dict: The :class:`api9kw` of each key.
+        """
+        return dict(self.__clients)
+
+    @property
+    def disabled(self) -> dict:
+        """dict: The keys out of rotation and the error code that took
+        them out.
+        """
+        with self.__lock:
+            return dict(self.__disabled)
+
+    @property
+    def outstanding(self) -> dict:
+        """dict: The number of captchas awaiting an answer per key.
+        """
+        with self.__lock:
+            return dict(self.__outstanding)
+
+    def client_for(self, id: int) -> api9kw:
+        """The client of the key that submitted a captcha.
+
+        Raises
+        ------
+        KeyError
+            Raised when the captcha wasn't submitted through the pool.
+        """
+        with self.__lock:
+            key = self.__owners.get(id)
+        if(key is None):
+            raise KeyError(f"Captcha {id} wasn't submitted through this pool.")
+        return self.__clients[key]
+
+    def disable(self, key: str, code: str = None):
+        """Take a key out of rotation.
+        """
+        with self.__lock:
+            self.__disabled[key] = code
+
+    def enable(self, key: str):
+        """Put a key back into rotation.
+        """
+        with self.__lock:
+            self.__disabled.pop(key, None)
+            self.__cooling.pop(key, None)
+
+    def submit_image_captcha(self, data, **kwargs) -> int:
+        """Submit an image-based captcha with the healthiest key, see
+        :meth:`api9kw.submit_image_captcha`.
+        """
+        with self.__image(data) as image:
+            return self.__submit(lambda client: client.submit_image_captcha(image, **kwargs))
+
+    def submit_interactive_captcha(self, sitekey: str, **kwargs) -> int:
+        """Submit an interactive captcha with the healthiest key, see
+        :meth:`api9kw.submit_interactive_captcha`.
+        """
+        return self.__submit(lambda client: client.submit_interactive_captcha(sitekey, **kwargs))
+
+    def solve_image_captcha(self, data, **kwargs) -> Future:
+        """Submit an image-based captcha with the healthiest key and
+        wait for its answer in the background, see
+        :meth:`api9kw.solve_image_captcha`.
+        """
+        with self.__image(data) as image:
+            return self.__submit(lambda client: client.solve_image_captcha(image, **kwargs))
+
+    def solve_interactive_captcha(self, sitekey: str, **kwargs) -> Future:
+        """Submit an interactive captcha with the healthiest key and
+        wait for its answer in the background, see
+        :meth:`api9kw.solve_interactive_captcha`.
+        """
+        return self.__submit(lambda client: client.solve_interactive_captcha(sitekey, **kwargs))
+
+    def answer_status(self, id: int, archive: int = 0) -> dict:
+        """See :meth:`api9kw.answer_status`.
+        """
+        return self.__follow_up(id, lambda client: client.answer_status(id, archive))
+
+    def captcha_cancel_submitted(self, id: int):
+        """See :meth:`api9kw.captcha_cancel_submitted`.
+        """
+        self.__follow_up(
+            id, lambda client: client.captcha_cancel_submitted(id))
+        self.__finish(id)
+
+    def captcha_details(self, id: int, archive: int = 0) -> dict:
+        """See :meth:`api9kw.captcha_details`.
+        """
+        return self.__follow_up(id, lambda client: client.captcha_details(id, archive))
+
+    def captcha_feedback_correct(self, id: int, archive: int = 0):
+        """See :meth:`api9kw.captcha_feedback_correct`.
+        """
+        self.__follow_up(
+            id, lambda client: client.captcha_feedback_correct(id, archive))
+
+    def captcha_feedback_incorrect(self, id: int, archive: int = 0):
+        """See :meth:`api9kw.captcha_feedback_incorrect`.
+        """
+        self.__follow_up(
+            id, lambda client: client.captcha_feedback_incorrect(id, archive))
+
+    def get_answer(self, id: int, archive: int = 0, wait: int = 0, deadline: float = None, token: CancelToken = None) -> str:
+        """See :meth:`api9kw.get_answer`.
+        """
+        try:
+            answer = self.__follow_up(
+                id, lambda client: client.get_answer(id, archive, wait, deadline, token))
+        except CaptchaError:
+            self.__finish(id)
+            raise
+        if(answer):
+            self.__finish(id)
+        return answer
+
+    def get_answer_future(self, id: int, archive: int = 0, timeout: float = 600, deadline: float = None, token: CancelToken = None) -> Future:
+        """See :meth:`api9kw.get_answer_future`.
+        """
+        future = self.__follow_up(
+            id, lambda client: client.get_answer_future(id, archive, timeout, deadline, token))
+        future.add_done_callback(lambda future: self.__finish(id))
+        return future
+
+    def __image(self, data):
+        client = next(iter(self.__clients.values()))
+        return open_image(data, client.transport)
+
+    def __choose(self, tried: set) -> str:
+        now = time.monotonic()
+        with self.__lock:
+            usable = [key for key in self.__clients if key not in self.__disabled
+                      and self.__cooling.get(key, 0) <= now]
+            candidates = [key for key in usable if key not in tried and self.__funded(key)]
+            if(not candidates):
+                if(any(not self.__funded(key) for key in usable)):
+                    raise FatalAPIError(
+                        "No API key in the pool has enough credits.", "0011")
+                if(len(self.__disabled) < len(self.__clients)):
+                    raise RetryableAPIError(
+                        "Every API key in the pool is rate limited.", "0056")
+                raise FatalAPIError(
+                    "No usable API key left in the pool.", next(iter(self.__disabled.values()), None))
+            if(self.strategy == "round_robin"):
+                for key in candidates:
+                    self.__current[key] += self.__weights[key]
+                key = max(candidates, key=lambda key: self.__current[key])
+                self.__current[key] -= sum(self.__weights[key]
+                                           for key in candidates)
+            else:
+                key = min(candidates, key=lambda key: self.__outstanding[key] /
+                          self.__weights[key])
+            self.__outstanding[key] += 1
+        return key
+
+    def __submit(self, submit: Callable[[api9kw], Union[int, Future]]):
+        tried = set()
+        while True:
+            key = self.__choose(tried)
+            client = self.__clients[key]
+            try:
+                ledger = client.ledger
+                if(ledger is not None and ledger.balance is None):
+                    client.balance
+                    if(not self.__funded(key)):
+                        self.__release(key)
+                        tried.add(key)
+                        continue
+                results = submit(client)
+            except APIError as e:
+                self.__release(key)
+                if(e.code in FATAL_ERRORS):
+                    self.disable(key, e.code)
+                elif(e.code in RATE_ERRORS):
+                    with self.__lock:
+                        self.__cooling[key] = time.monotonic() + self.cooldown
+                else:
+                    raise
+                tried.add(key)
+                continue
+            except BaseException:
+                self.__release(key)
+                raise
+            id = results.captcha_id if isinstance(
+                results, Future) else results
+            if(id is None):
+                self.__release(key)
+                return results
+            with self.__lock:
+                self.__owners[id] = key
+                self.__open.add(id)
+                while(len(self.__owners) > self.max_owned):
+                    old, owner = self.__owners.popitem(last=False)
+                    if(old in self.__open):
+                        self.__open.discard(old)
+                        self.__outstanding[owner] -= 1
+            if(isinstance(results, Future)):
+                results.add_done_callback(lambda future: self.__finish(id))
+            return results
+
+    def __funded(self, key: str) -> bool:
+        ledger = self.__clients[key].ledger
+        return ledger is None or ledger.balance is None or ledger.balance >= self.min_balance
+
+    def __follow_up(self, id: int, call: Callable[[api9kw], object]):
+        client = self.client_for(id)
+        try:
+            return call(client)
+        except FatalAPIError as e:
+            if(e.code in FATAL_ERRORS):
+                self.disable(client.api_key, e.code)
+            raise
+
+    def __release(self, key: str):
+        with self.__lock:
+            self.__outstanding[key] -= 1
+
+    def __finish(self, id: int):
+        with self.__lock:
+            if(id not in self.__open):
+                return
+            self.__open.discard(id)
+            self.__outstanding[self.__owners[id]] -= 1
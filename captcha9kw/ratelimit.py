@@ -0,0 +1,161 @@
+"""Client-side rate limiting of requests to the service.
+"""
+import threading
+import time
+
+ACTIONS = {
+    "usercaptchaupload": "upload",
+    "usercaptchacorrectdata": "poll",
+    "usercaptchacorrectback": "feedback",
+}
+"""Maps API actions to the rate-limited categories; anything else falls
+under ``default``."""
+
+
+class TokenBucket:
+    """A thread-safe token bucket whose rate adapts to the service.
+
+    The rate is halved by :meth:`throttle` whenever the service says
+    requests are coming too fast, and creeps back up towards the
+    configured rate by :meth:`relax` once it hasn't complained for a
+    while, i.e. additive increase, multiplicative decrease.
+
+    Parameters
+    ----------
+    rate : float
+        Requests per second allowed at most.
+    burst : float, default None
+        Largest number of requests allowed at once. Defaults to
+        ``rate``, but at least 1.
+    min_rate : float, default None
+        Lowest rate to throttle down to. Defaults to a tenth of
+        ``rate``.
+    recovery : float, default 0.05
+        Share of ``rate`` regained per successful request.
+    cooldown : float, default 5
+        Seconds after throttling before the rate starts recovering.
+    """
+
+    def __init__(self, rate: float, burst: float = None, min_rate: float = None, recovery: float = 0.05, cooldown: float = 5):
+        self.max_rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self.min_rate = float(
+            min_rate if min_rate is not None else rate / 10)
+        self.recovery = recovery
+        self.cooldown = cooldown
+        self.__rate = self.max_rate
+        self.__tokens = self.burst
+        self.__updated = time.monotonic()
+        self.__throttled = None
+        self.__lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """float: The current rate in requests per second.
+        """
+        return self.__rate
+
+    def acquire(self, timeout: float = None) -> bool:
+        """Take a token, waiting for one if necessary.
+
+        Parameters
+        ----------
+        timeout : float, default None
+            Seconds to wait at most. Waits as long as it takes by
+            default.
+
+        Returns
+        -------
+        bool
+            Whether a token was taken.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(
+                    self.burst, self.__tokens + (now - self.__updated) * self.__rate)
+                self.__updated = now
+                if(self.__tokens >= 1):
+                    self.__tokens -= 1
+                    return True
+                wait = (1 - self.__tokens) / self.__rate
+            if(deadline is not None):
+                if(now + wait > deadline):
+                    return False
+            time.sleep(wait)
+
+    def throttle(self, factor: float = 0.5):
+        """Lower the rate after the service refused a request.
+        """
+        with self.__lock:
+            self.__rate = max(self.min_rate, self.__rate * factor)
+            self.__tokens = min(self.__tokens, 0)
+            self.__throttled = time.monotonic()
+
+    def relax(self):
+        """Raise the rate a bit after a successful request.
+        """
+        with self.__lock:
+            if(self.__rate >= self.max_rate):
+                return
+            if(self.__throttled is not None and time.monotonic() - self.__throttled < self.cooldown):
+                return
+            self.__rate = min(self.max_rate, self.__rate +
+                              self.max_rate * self.recovery)
+
+
+class RateLimiter:
+    """Rate limits per category of request: ``upload``, ``poll``,
+    ``feedback`` and ``default`` for everything else.
+
+    Pass ``None`` as the rate of a category to leave it unlimited.
+
+    Parameters
+    ----------
+    upload : float, default 2
+        Submissions per second.
+    poll : float, default 10
+        Answer polls per second.
+    feedback : float, default 5
+        Feedback reports and cancellations per second.
+    default : float, default 5
+        Other requests per second.
+    **options
+        Passed on to every :class:`TokenBucket`.
+    """
+
+    def __init__(self, upload: float = 2, poll: float = 10, feedback: float = 5, default: float = 5, **options):
+        rates = {"upload": upload, "poll": poll,
+                 "feedback": feedback, "default": default}
+        self.buckets = {category: TokenBucket(rate, **options)
+                        for category, rate in rates.items() if rate is not None}
+        """dict: The :class:`TokenBucket` of each limited category."""
+
+    @staticmethod
+    def category(action: str) -> str:
+        """The category an API action falls under.
+        """
+        return ACTIONS.get(action, "default")
+
+    def acquire(self, action: str):
+        """Wait until a request for an API action is allowed.
+        """
+        bucket = self.buckets.get(self.category(action))
+        if(bucket is not None):
+            bucket.acquire()
+
+    def throttle(self, action: str):
+        """Slow down requests in the category of an API action.
+        """
+        bucket = self.buckets.get(self.category(action))
+        if(bucket is not None):
+            bucket.throttle()
+
+    def relax(self, action: str):
+        """Let requests in the category of an API action speed up
+        again.
+        """
+        bucket = self.buckets.get(self.category(action))
+        if(bucket is not None):
+            bucket.relax()
@@ -0,0 +1,275 @@
+"""The HTTP transports :class:`api9kw` talks to the service through.
+"""
+import json
+from contextlib import contextmanager
+from typing import Callable, Iterator, Tuple
+
+BASE_URL = "https://www.9kw.eu/"
+API_PATH = "index.cgi"
+STATUS_PATH = "grafik/servercheck.json"
+CHUNK_SIZE = 64 * 1024
+
+
+class Transport:
+    """The interface of a transport.
+
+    A transport sends requests to the service and returns responses
+    with at least ``status_code``, ``content``, ``json()`` and
+    ``reason`` or ``reason_phrase``, like those of ``requests`` and
+    ``httpx``. It also holds the configuration of the connection: the
+    base URL of the service and the timeouts.
+
+    Parameters
+    ----------
+    base_url : str, default "https://www.9kw.eu/"
+        Where the service is.
+    timeout : tuple of float, default (5, 3)
+        Connect and read timeouts in seconds.
+    """
+
+    errors = ()
+    """tuple: Exception types raised when a request fails."""
+    transient_errors = ()
+    """tuple: Exception types worth repeating a request for, like
+    timeouts and dropped connections."""
+
+    def __init__(self, base_url: str = BASE_URL, timeout: Tuple[float, float] = (5, 3)):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.timeout = tuple(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def api_url(self) -> str:
+        """str: URL of the API.
+        """
+        return self.base_url + API_PATH
+
+    @property
+    def status_url(self) -> str:
+        """str: URL of the service's status.
+        """
+        return self.base_url + STATUS_PATH
+
+    def get(self, url: str, params: dict = None):
+        """Send a GET request.
+        """
+        raise NotImplementedError
+
+    def post(self, url: str, params: dict = None, files: dict = None, data=None, headers: dict = None):
+        """Send a POST request with either form ``files`` or a ``data``
+        body, which may be an iterable of chunks with a length.
+        """
+        raise NotImplementedError
+
+    def download(self, url: str):
+        """Stream a file, following redirects.
+
+        Returns
+        -------
+        context manager
+            Gives the status code, the response headers and an
+            iterator over the chunks of the body.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Close the connections, if owned by this transport.
+        """
+        pass
+
+
+class RequestsTransport(Transport):
+    """A transport through a pooled, keep-alive ``requests.Session``,
+    speaking HTTP/1.1.
+
+    Parameters
+    ----------
+    session : requests.Session, default None
+        An existing session to use. If not given, one is created and
+        owned by this transport.
+    base_url : str, default "https://www.9kw.eu/"
+    timeout : tuple of float, default (5, 3)
+        See :class:`Transport`.
+    pool_size : int, default 10
+        Maximum number of connections kept open to the service, when
+        the session is created by this transport.
+    keep_alive : bool, default True
+        Whether connections are reused between requests.
+    """
+
+    def __init__(self, session=None, base_url: str = BASE_URL, timeout: Tuple[float, float] = (5, 3), pool_size: int = 10, keep_alive: bool = True):
+        import requests
+        import requests.adapters
+        super().__init__(base_url, timeout)
+        self.errors = (requests.RequestException,)
+        self.transient_errors = (requests.ConnectionError, requests.Timeout)
+        self.__own_session = session is None
+        if(session is None):
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        if(not keep_alive):
+            session.headers["Connection"] = "close"
+        self.session = session
+
+    def get(self, url: str, params: dict = None):
+        return self.session.get(url, params=params, timeout=self.timeout)
+
+    def post(self, url: str, params: dict = None, files: dict = None, data=None, headers: dict = None):
+        if(data is not None):
+            return self.session.post(url, params=params, data=data, headers=headers, timeout=self.timeout)
+        return self.session.post(url, params=params, files=files, timeout=self.timeout)
+
+    @contextmanager
+    def download(self, url: str):
+        response = self.session.get(
+            url, allow_redirects=True, timeout=self.timeout, stream=True)
+        with response:
+            yield response.status_code, response.headers, response.iter_content(CHUNK_SIZE)
+
+    def close(self):
+        if(self.__own_session):
+            self.session.close()
+
+
+class HttpxTransport(Transport):
+    """A transport through an ``httpx.Client``, multiplexing
+    concurrent polls and uploads over a few HTTP/2 connections.
+
+    Requires the optional ``httpx`` and ``h2`` dependencies, i.e.
+    ``pip install captcha9kw[http2]``.
+
+    Parameters
+    ----------
+    client : httpx.Client, default None
+        An existing client to use. If not given, one is created and
+        owned by this transport.
+    base_url : str, default "https://www.9kw.eu/"
+    timeout : tuple of float, default (5, 3)
+        See :class:`Transport`.
+    max_connections : int, default 4
+        Maximum number of connections, when the client is created by
+        this transport.
+    http2 : bool, default True
+        Whether to negotiate HTTP/2 with the service.
+    """
+
+    def __init__(self, client=None, base_url: str = BASE_URL, timeout: Tuple[float, float] = (5, 3), max_connections: int = 4, http2: bool = True):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError(
+                "HttpxTransport requires httpx: pip install captcha9kw[http2]")
+        super().__init__(base_url, timeout)
+        self.errors = (httpx.HTTPError,)
+        self.transient_errors = (httpx.TransportError,)
+        self.__own_client = client is None
+        if(client is None):
+            limits = httpx.Limits(max_connections=max_connections,
+                                  max_keepalive_connections=max_connections)
+            client = httpx.Client(http2=http2, limits=limits, timeout=httpx.Timeout(
+                self.timeout[1], connect=self.timeout[0]))
+        self.client = client
+
+    def get(self, url: str, params: dict = None):
+        return self.client.get(url, params=params)
+
+    def post(self, url: str, params: dict = None, files: dict = None, data=None, headers: dict = None):
+        if(data is not None):
+            return self.client.post(url, params=params, content=data, headers=headers)
+        return self.client.post(url, params=params, files=files)
+
+    @contextmanager
+    def download(self, url: str):
+        with self.client.stream("GET", url, follow_redirects=True) as response:
+            yield response.status_code, response.headers, response.iter_bytes(CHUNK_SIZE)
+
+    def close(self):
+        if(self.__own_client):
+            self.client.close()
+
+
+class MemoryResponse:
+    """A response made up by a :class:`MemoryTransport` handler.
+
+    Parameters
+    ----------
+    body : dict or bytes
+        The body; a dictionary is sent as JSON with a successful
+        ``status`` added, like the service does.
+    status_code : int, default 200
+    reason : str, default "OK"
+    headers : dict, default None
+    """
+
+    def __init__(self, body, status_code: int = 200, reason: str = "OK", headers: dict = None):
+        if(isinstance(body, dict)):
+            body = json.dumps(dict({"status": {"success": True}}, **body)).encode()
+        self.content = body
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = dict(headers or {})
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class MemoryTransport(Transport):
+    """A transport answering every request in memory, for tests and
+    benchmarks without a network.
+
+    Parameters
+    ----------
+    handler : callable
+        Called with the method, the URL and the query parameters of
+        every request. Returns a :class:`MemoryResponse`, or a
+        dictionary or bytes to wrap in one.
+    base_url : str, default "https://www.9kw.eu/"
+    timeout : tuple of float, default (5, 3)
+        See :class:`Transport`.
+    """
+
+    errors = (ConnectionError, TimeoutError)
+    transient_errors = (ConnectionError, TimeoutError)
+
+    def __init__(self, handler: Callable[[str, str, dict], object], base_url: str = BASE_URL, timeout: Tuple[float, float] = (5, 3)):
+        super().__init__(base_url, timeout)
+        self.handler = handler
+        self.requests = []
+        """list: The method, URL, parameters and body size of every
+        request."""
+
+    def get(self, url: str, params: dict = None):
+        return self.__handle("GET", url, params, 0)
+
+    def post(self, url: str, params: dict = None, files: dict = None, data=None, headers: dict = None):
+        size = 0
+        if(data is not None):
+            size = sum(len(chunk) for chunk in _chunks(data))
+        return self.__handle("POST", url, params, size)
+
+    @contextmanager
+    def download(self, url: str):
+        response = self.__handle("GET", url, None, 0)
+        yield response.status_code, response.headers, iter([response.content])
+
+    def __handle(self, method: str, url: str, params: dict, size: int) -> MemoryResponse:
+        params = dict(params or {})
+        self.requests.append((method, url, params, size))
+        response = self.handler(method, url, params)
+        if(not isinstance(response, MemoryResponse)):
+            response = MemoryResponse(response)
+        return response
+
+
+def _chunks(data) -> Iterator[bytes]:
+    if(isinstance(data, (bytes, bytearray))):
+        return iter([data])
+    return iter(data)
@@ -0,0 +1,193 @@
+"""A loop for solving other accounts' captchas.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+
+from .captcha9kw import APIError, FatalAPIError, RetryableAPIError
+
+SolverTask = namedtuple("SolverTask", ["id", "details", "image"])
+SolverTask.__doc__ = """A captcha handed out for solving.
+
+Attributes
+----------
+id : int
+    ID of the captcha.
+details : dict
+    The details returned by :meth:`api9kw.fetch_captcha`.
+image : bytes
+    The downloaded image, or None for interactive captchas and when
+    not downloading.
+"""
+
+
+class SolverWorker:
+    """Fetch captchas to solve one after another, fetching and
+    downloading the next ones in the background while the current one
+    is being solved, so the solver never waits on the network between
+    tasks.
+
+    Iterate over the worker to get the tasks and answer each with
+    :meth:`api9kw.answer_captcha` or :meth:`api9kw.skip_captcha`, or
+    hand a solving function to :meth:`run`.
+
+    The service reserves every fetched captcha for a limited time, so
+    keep ``prefetch`` small.
+
+    Errors of single tasks, from fetching them to sending their
+    answers, are counted as ``failed`` and the loop carries on, after
+    ``idle_delay`` when the error may go away with time. Only a
+    :class:`FatalAPIError` stops it.
+
+    Parameters
+    ----------
+    api : api9kw
+        The client of the solving account.
+    prefetch : int, default 1
+        Number of tasks fetched ahead of the one being solved.
+    idle_delay : float, default 5
+        Seconds to wait before asking again when there's nothing to
+        solve, or after a :class:`RetryableAPIError` or connection
+        error.
+    download : bool, default True
+        Download the images of the tasks ahead of time.
+    **options
+        Passed on to :meth:`api9kw.fetch_captcha`, e.g. ``mouse=1``.
+    """
+
+    def __init__(self, api, prefetch: int = 1, idle_delay: float = 5, download: bool = True, **options):
+        self.prefetch = prefetch
+        self.idle_delay = idle_delay
+        self.download = download
+        self.__api = api
+        self.__options = options
+        self.__stop = threading.Event()
+        self.__lock = threading.Lock()
+        self.__stats = {"solved": 0, "skipped": 0, "failed": 0, "waited": 0.0}
+
+    @property
+    def stats(self) -> dict:
+        """dict: Number of tasks ``solved`` and ``skipped`` by
+        :meth:`run`, of tasks that ``failed`` to be fetched, solved or
+        answered, and the seconds the solver ``waited`` for the next
+        task.
+        """
+        with self.__lock:
+            return dict(self.__stats)
+
+    def stop(self):
+        """Stop after the current task. Tasks fetched ahead are
+        skipped.
+        """
+        self.__stop.set()
+
+    def __iter__(self) -> Iterator[SolverTask]:
+        self.__stop.clear()
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.prefetch + 1, thread_name_prefix="captcha9kw-worker") as executor:
+            try:
+                while not self.__stop.is_set():
+                    while(len(pending) <= self.prefetch):
+                        pending.append(executor.submit(self.__fetch))
+                    start = time.monotonic()
+                    try:
+                        task = pending.popleft().result()
+                    except Exception as e:
+                        self.__failed(e)
+                        continue
+                    finally:
+                        self.__count("waited", time.monotonic() - start)
+                    if(task is None):
+                        self.__stop.wait(self.idle_delay)
+                        continue
+                    yield task
+            finally:
+                for future in pending:
+                    if(not future.cancel()):
+                        self.__release(future)
+
+    def run(self, solve: Callable[[SolverTask], str], max_tasks: int = None) -> dict:
+        """Solve tasks until :meth:`stop` is called or ``max_tasks``
+        are done.
+
+        Parameters
+        ----------
+        solve : callable
+            Called with every :class:`SolverTask`, returns the answer,
+            or None to skip the task. Exceptions are counted as
+            ``failed`` and the task is skipped.
+        max_tasks : int, default None
+            Number of tasks after which to stop. No limit by default.
+
+        Returns
+        -------
+        dict
+            See :attr:`stats`.
+        """
+        done = 0
+        tasks = iter(self)
+        try:
+            for task in tasks:
+                failed = False
+                try:
+                    answer = solve(task)
+                except Exception:
+                    failed, answer = True, None
+                try:
+                    if(answer is None):
+                        self.__api.skip_captcha(task.id)
+                    else:
+                        self.__api.answer_captcha(
+                            task.id, answer, confirm=int(bool(task.details.get("confirm"))))
+                except Exception as e:
+                    self.__failed(e)
+                else:
+                    if(failed):
+                        self.__count("failed")
+                    else:
+                        self.__count(
+                            "skipped" if answer is None else "solved")
+                done += 1
+                if(max_tasks is not None and done >= max_tasks):
+                    break
+        finally:
+            tasks.close()
+        return self.stats
+
+    def __fetch(self) -> SolverTask:
+        details = self.__api.fetch_captcha(**self.__options)
+        if(details is None):
+            return None
+        id = int(details["captchaid"])
+        image = None
+        if(self.download and not details.get("interactive")):
+            try:
+                image = self.__api.show_captcha(id)
+            except Exception:
+                self.__api.skip_captcha(id)
+                raise
+        return SolverTask(id, details, image)
+
+    def __failed(self, error: Exception):
+        """Count a failed task, re-raising errors that end the loop and
+        backing off after those that may go away.
+        """
+        if(isinstance(error, FatalAPIError) or not isinstance(error, APIError)):
+            raise error
+        self.__count("failed")
+        if(isinstance(error, RetryableAPIError)):
+            self.__stop.wait(self.idle_delay)
+
+    def __release(self, future):
+        try:
+            task = future.result()
+            if(task is not None):
+                self.__api.skip_captcha(task.id)
+        except Exception:
+            pass
+
+    def __count(self, key: str, amount: float = 1):
+        with self.__lock:
+            self.__stats[key] += amount
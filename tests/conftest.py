@@ -0,0 +1,62 @@
+import base64
+
+import pytest
+
+from captcha9kw import api9kw, LatencyStats
+
+from .test_captcha9kw import FakeSession
+
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==")
+
+
+@pytest.fixture
+def png():
+    """A valid 1x1 PNG image.
+    """
+    return PNG
+
+
+@pytest.fixture
+def make_api():
+    """Make clients of a :class:`Fake9kw`, talking to it in memory and
+    closed after the test.
+
+    Takes the server, ``latency``, a dict of :class:`LatencyStats`
+    arguments, and any further arguments of :class:`api9kw`.
+    """
+    clients = []
+
+    def make(server, latency: dict = None, **options):
+        if(latency is not None):
+            options["latency_stats"] = LatencyStats(**latency)
+        api = api9kw("testkey123", transport=server.transport(), **options)
+        clients.append(api)
+        return api
+    yield make
+    for api in clients:
+        api.close()
+
+
+@pytest.fixture
+def make_session_api():
+    """Make clients answered by a handler through a
+    :class:`FakeSession`, found at ``api.transport.session``.
+    """
+    def make(handler, **options):
+        return api9kw("testkey123", session=FakeSession(handler), **options)
+    return make
+
+
+@pytest.fixture
+def make_async_api():
+    """Make async clients answered by a handler through an
+    ``httpx.MockTransport``.
+    """
+    httpx = pytest.importorskip("httpx")
+    from captcha9kw import asyncapi9kw
+
+    def make(handler, **options):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return asyncapi9kw("testkey123", client=client, **options)
+    return make
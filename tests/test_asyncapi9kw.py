@@ -0,0 +1,109 @@
+import asyncio
+import base64
+import io
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from captcha9kw import CancelToken, CaptchaError
+
+
+def ok(**data):
+    data["status"] = {"success": True}
+    return httpx.Response(200, content=json.dumps(data).encode())
+
+
+def test_balance_and_settings(make_async_api):
+    def handler(request):
+        action = request.url.params["action"]
+        if(action == "usercaptchaguthaben"):
+            return ok(credits=1234)
+        return ok(id="42", selfonly="1")
+
+    async def main():
+        api = make_async_api(handler)
+        assert await api.balance == 1234
+        assert await api.account_id == 42
+        assert await api.selfonly == 1
+
+    asyncio.run(main())
+
+
+def test_submit_and_get_answer(png, make_async_api):
+    def handler(request):
+        action = request.url.params["action"]
+        if(action == "usercaptchaupload"):
+            assert request.method == "POST"
+            assert png in request.content
+            return ok(captchaid="77")
+        return ok(answer="abc")
+
+    async def main():
+        api = make_async_api(handler)
+        id = await api.submit_image_captcha(base64.b64encode(png).decode())
+        assert id == 77
+        assert await api.get_answer(id) == "abc"
+
+    asyncio.run(main())
+
+
+def test_submit_bytes_and_files(png, make_async_api):
+    uploads = []
+
+    def handler(request):
+        uploads.append(png in request.content)
+        return ok(captchaid=str(len(uploads)))
+
+    async def main():
+        api = make_async_api(handler)
+        assert await api.submit_image_captcha(png) == 1
+        assert await api.submit_image_captcha(io.BytesIO(png)) == 2
+        assert await api.submit_image_captcha(memoryview(png)) == 3
+        with pytest.raises(ValueError):
+            await api.submit_image_captcha(b"not an image")
+
+    asyncio.run(main())
+    assert uploads == [True, True, True]
+
+
+def test_server_error(make_async_api):
+    def handler(request):
+        return httpx.Response(200, content=b"0002 API key not found")
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await make_async_api(handler).balance
+
+    asyncio.run(main())
+
+
+def test_interactive_submit(make_async_api):
+    def handler(request):
+        assert b"sitekey123" in request.content
+        assert request.url.params["interactive"] == "1"
+        return ok(captchaid="5")
+
+    async def main():
+        assert await make_async_api(handler).submit_interactive_captcha("sitekey123") == 5
+
+    asyncio.run(main())
+
+
+def test_get_answer_token(make_async_api):
+    actions = []
+
+    def handler(request):
+        actions.append(request.url.params["action"])
+        return ok(answer="", try_again=1)
+
+    async def main():
+        api = make_async_api(handler)
+        token = CancelToken()
+        asyncio.get_running_loop().call_later(0.1, token.cancel)
+        with pytest.raises(CaptchaError, match="Cancelled"):
+            await api.get_answer(5, wait=1, token=token)
+
+    asyncio.run(main())
+    assert actions[-1] == "usercaptchacorrectback"
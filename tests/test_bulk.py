@@ -0,0 +1,47 @@
+import base64
+import itertools
+import time
+
+from .test_captcha9kw import FakeResponse
+
+
+def numbering():
+    ids = itertools.count(1)
+
+    def handler(method, url, params):
+        if(params["prio"] == 13):
+            return FakeResponse(b"0017 Unknown problem.")
+        return FakeResponse({"captchaid": str(next(ids))})
+    return handler
+
+
+def test_bulk_keeps_going_after_errors(png, make_session_api):
+    api = make_session_api(numbering())
+    items = [png, base64.b64encode(b"not an image").decode(),
+             (png, {"prio": 13}), png]
+    results = list(api.submit_image_captchas(items, concurrency=2, ordered=True))
+    assert [item for item, _ in results] == items
+    assert isinstance(results[0][1], int)
+    assert isinstance(results[1][1], ValueError)
+    assert isinstance(results[2][1], RuntimeError)
+    assert isinstance(results[3][1], int)
+
+
+def test_bulk_completion_order_yields_everything(png, make_session_api):
+    api = make_session_api(numbering())
+    results = list(api.submit_image_captchas(
+        (png for _ in range(20)), concurrency=4))
+    assert sorted(id for _, id in results) == list(range(1, 21))
+
+
+def test_bulk_closing_early_cancels_the_rest(png, make_session_api):
+    def handler(method, url, params):
+        if(len(session.calls) > 1):
+            time.sleep(0.2)
+        return FakeResponse({"captchaid": str(len(session.calls))})
+    api = make_session_api(handler)
+    session = api.transport.session
+    results = api.submit_image_captchas((png for _ in range(20)), concurrency=1)
+    next(results)
+    results.close()
+    assert len(session.calls) <= 2
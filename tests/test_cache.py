@@ -0,0 +1,60 @@
+import time
+
+from captcha9kw import api9kw, AnswerCache
+from captcha9kw.latency import LatencyStats
+
+from .test_captcha9kw import FakeResponse, FakeSession
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def test_lru_and_ttl():
+    cache = AnswerCache(max_entries=2, ttl=60)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get("a") is None
+
+
+def test_disk_backend_survives_restart(tmp_path):
+    path = str(tmp_path / "answers.db")
+    cache = AnswerCache(path=path)
+    cache.put("a", "1", id=5)
+    cache.close()
+    cache = AnswerCache(path=path)
+    assert cache.get("a") == "1"
+    cache.invalidate_id(5)
+    cache.close()
+    assert AnswerCache(path=path).get("a") is None
+
+
+def test_solve_uses_cache_and_feedback_invalidates():
+    def handler(method, url, params):
+        if(params["action"] == "usercaptchaupload"):
+            return FakeResponse({"captchaid": "3"})
+        return FakeResponse({"answer": "abc"})
+
+    session = FakeSession(handler)
+    stats = LatencyStats(default_delay=0)
+    api = api9kw("testkey123", session=session,
+                 latency_stats=stats, answer_cache=AnswerCache())
+    first = api.solve_image_captcha(PNG)
+    assert first.result(timeout=5) == "abc"
+    # The answer is cached by a done-callback, which may run just after
+    # result() returns.
+    for _ in range(100):
+        if(api.answer_cache.get(first.cache_key)):
+            break
+        time.sleep(0.01)
+    calls = len(session.calls)
+    second = api.solve_image_captcha(PNG)
+    assert second.result() == "abc"
+    assert second.captcha_id is None
+    assert len(session.calls) == calls
+    api.captcha_feedback_incorrect(first.captcha_id)
+    assert api.answer_cache.get(first.cache_key) is None
+    api.close()
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from captcha9kw import CancelToken, CaptchaError
+
+from benchmarks.fake9kw import Fake9kw
+
+
+LATENCY = {"default_delay": 10, "interval": 10}
+
+
+def cancellations(api):
+    return [params["id"] for method, url, params, size in api.transport.requests
+            if params["action"] == "usercaptchacorrectback" and params["correct"] == 3]
+
+
+def test_token_callbacks():
+    token, called = CancelToken(), []
+    token.add_callback(lambda: called.append(1))
+    removed = lambda: called.append(2)
+    token.add_callback(removed)
+    token.remove_callback(removed)
+    assert not token.cancelled and not token.wait(0)
+    token.cancel()
+    token.cancel()
+    token.add_callback(lambda: called.append(3))
+    assert token.cancelled and token.wait(0)
+    assert called == [1, 3]
+
+
+def test_get_answer_deadline_withdraws(png, make_api):
+    with Fake9kw(solve_delay=60) as server:
+        api = make_api(server, LATENCY)
+        id = api.submit_image_captcha(png)
+        start = time.monotonic()
+        with pytest.raises(CaptchaError, match="Deadline"):
+            api.get_answer(id, wait=1, deadline=start + 0.1)
+        assert time.monotonic() - start < 1
+        assert server.requests["usercaptchacorrectdata"] == 0
+        assert cancellations(api) == [id]
+
+
+def test_get_answer_token_withdraws(png, make_api):
+    with Fake9kw(solve_delay=60) as server:
+        api = make_api(server, LATENCY)
+        id = api.submit_image_captcha(png)
+        token = CancelToken()
+        threading.Timer(0.1, token.cancel).start()
+        start = time.monotonic()
+        with pytest.raises(CaptchaError, match="Cancelled"):
+            api.get_answer(id, wait=1, token=token)
+        assert time.monotonic() - start < 1
+        assert cancellations(api) == [id]
+
+
+def test_future_deadline_and_token(png, make_api):
+    with Fake9kw(solve_delay=60) as server:
+        api = make_api(server, LATENCY)
+        token = CancelToken()
+        first = api.solve_image_captcha(png, token=token)
+        second = api.solve_image_captcha(
+            png, deadline=time.monotonic() + 0.1)
+        with pytest.raises(CaptchaError, match="Deadline"):
+            second.result(2)
+        token.cancel()
+        assert first.cancelled()
+        deadline = time.monotonic() + 2
+        while(len(cancellations(api)) < 2 and time.monotonic() < deadline):
+            time.sleep(0.01)
+        assert sorted(cancellations(api)) == sorted(
+            [first.captcha_id, second.captcha_id])
+        assert api.poller.pending == 0
+        api.close()
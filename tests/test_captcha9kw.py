@@ -1,5 +1,209 @@
-from captcha9kw import __version__
+import json
+
+import pytest
+
+from captcha9kw import __version__, api9kw, CaptchaError
 
 
 def test_version():
     assert __version__ == '0.1.0'
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200, reason="OK"):
+        if(isinstance(body, dict)):
+            body = dict(body, status={"success": True})
+            body = json.dumps(body).encode()
+        self.content = body
+        self.status_code = status_code
+        self.reason = reason
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeSession:
+    """Stands in for ``requests.Session``, answering through a handler.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.headers = {}
+        self.calls = []
+        self.closed = False
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        self.calls.append(("GET", url, dict(params or {}), timeout))
+        return self.handler("GET", url, params or {})
+
+    def post(self, url, params=None, files=None, timeout=None, **kwargs):
+        self.calls.append(("POST", url, dict(params or {}), timeout))
+        return self.handler("POST", url, params or {})
+
+    def close(self):
+        self.closed = True
+
+
+def test_calls_reuse_session_and_timeout():
+    session = FakeSession(lambda method, url, params: FakeResponse(
+        {"credits": 10, "answer": "ok"}))
+    api = api9kw("testkey123", session=session, timeout=(1, 2))
+    assert api.balance == 10
+    assert api.get_answer(1) == "ok"
+    assert len(session.calls) == 2
+    assert all(call[3] == (1, 2) for call in session.calls)
+
+
+def test_close_only_owned_session():
+    session = FakeSession(None)
+    with api9kw("testkey123", session=session):
+        pass
+    assert not session.closed
+    with api9kw("testkey123") as api:
+        pass
+
+
+def test_server_error_code():
+    session = FakeSession(lambda method, url, params: FakeResponse(
+        b"0002 API key not found"))
+    with pytest.raises(RuntimeError):
+        api9kw("testkey123", session=session).balance
+
+
+def test_get_answer_timeout(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    session = FakeSession(lambda method, url, params: FakeResponse(
+        {"answer": "", "try_again": 0}))
+    with pytest.raises(CaptchaError):
+        api9kw("testkey123", session=session).get_answer(1, wait=1)
+
+
+def test_get_answer_records_latency(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+
+    def handler(method, url, params):
+        if(params["action"] == "usercaptchaupload"):
+            return FakeResponse({"captchaid": "7"})
+        return FakeResponse({"answer": "abc"})
+
+    api = api9kw("testkey123", session=FakeSession(handler))
+    id = api.submit_interactive_captcha("sitekey", prio=3)
+    assert api.get_answer(id, wait=1) == "abc"
+    stats = api.latency_stats.snapshot()
+    assert [(kind.interactive, kind.prio, stats[kind]["count"])
+            for kind in stats] == [(True, 3, 1)]
+
+
+def test_settings_cache():
+    def handler(method, url, params):
+        return FakeResponse({"id": "42", "selfonly": "0", "selfsend": "1", "selfsolve": "0"})
+
+    session = FakeSession(handler)
+    api = api9kw("testkey123", session=session, settings_ttl=60)
+    assert (api.selfonly, api.selfsend, api.selfsolve) == (0, 1, 0)
+    assert api.account_id == 42
+    assert len(session.calls) == 1
+    api.selfonly = 1
+    assert api.selfonly == 1
+    assert len(session.calls) == 2
+    api.refresh_settings()
+    assert api.selfonly == 0
+    assert len(session.calls) == 3
+
+
+def test_settings_uncached_by_default():
+    session = FakeSession(lambda method, url, params: FakeResponse(
+        {"id": "42", "selfonly": "0"}))
+    api = api9kw("testkey123", session=session)
+    api.selfonly
+    api.selfonly
+    assert len(session.calls) == 2
+    # The account ID is remembered from any settings fetch.
+    assert api.account_id == 42
+    assert len(session.calls) == 2
+
+
+def test_typed_errors():
+    from captcha9kw import APIError, FatalAPIError
+
+    for body, kind, code in [(b"0002 API key not found", FatalAPIError, "0002"),
+                             (b"9999 Something new", APIError, "9999"),
+                             (b"<html>oops</html>", APIError, None)]:
+        session = FakeSession(
+            lambda method, url, params: FakeResponse(body))
+        with pytest.raises(kind) as info:
+            api9kw("testkey123", session=session).balance
+        assert info.value.code == code
+        assert info.value.body == body.decode()
+
+
+def test_retries_idempotent_calls_only():
+    from captcha9kw import RetryableAPIError
+
+    def flaky(method, url, params):
+        if(len(session.calls) < 3):
+            return FakeResponse(b"", status_code=503, reason="Unavailable")
+        return FakeResponse({"credits": 5, "captchaid": "1"})
+
+    session = FakeSession(flaky)
+    api = api9kw("testkey123", session=session, retries=2, backoff=0)
+    assert api.balance == 5
+    assert len(session.calls) == 3
+
+    session = FakeSession(flaky)
+    api = api9kw("testkey123", session=session, retries=2, backoff=0)
+    with pytest.raises(RetryableAPIError):
+        api.submit_interactive_captcha("sitekey")
+    assert len(session.calls) == 1
+
+
+def test_retried_feedback_already_done():
+    from captcha9kw import APIError
+
+    def handler(method, url, params):
+        if(len(session.calls) == 1):
+            return FakeResponse(b"", status_code=503, reason="Unavailable")
+        return FakeResponse(json.dumps({"status": {"success": False}, "error": "0012 Already done."}).encode())
+
+    session = FakeSession(handler)
+    api = api9kw("testkey123", session=session, retries=2, backoff=0)
+    api.captcha_feedback_correct(1)
+    assert len(session.calls) == 2
+    with pytest.raises(APIError) as info:
+        api.captcha_feedback_correct(1)
+    assert info.value.code == "0012"
+
+
+def test_retried_query_already_done_raises():
+    from captcha9kw import APIError
+
+    def handler(method, url, params):
+        if(len(session.calls) == 1):
+            return FakeResponse(b"", status_code=503, reason="Unavailable")
+        return FakeResponse(json.dumps({"status": {"success": False}, "error": "0012 Already done."}).encode())
+
+    session = FakeSession(handler)
+    api = api9kw("testkey123", session=session, retries=2, backoff=0)
+    with pytest.raises(APIError) as info:
+        api.balance
+    assert info.value.code == "0012"
+    assert len(session.calls) == 2
+
+
+def test_connection_errors_become_retryable():
+    import requests
+    from captcha9kw import RetryableAPIError
+
+    def handler(method, url, params):
+        raise requests.ConnectionError("reset")
+
+    session = FakeSession(handler)
+    api = api9kw("testkey123", session=session, retries=1, backoff=0)
+    with pytest.raises(RetryableAPIError) as info:
+        api.balance
+    assert info.value.code is None
+    assert isinstance(info.value.__cause__, requests.ConnectionError)
+    assert len(session.calls) == 2
+    with pytest.raises(RetryableAPIError):
+        api.submit_interactive_captcha("sitekey")
+    assert len(session.calls) == 3
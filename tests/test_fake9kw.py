@@ -0,0 +1,43 @@
+import pytest
+
+from captcha9kw import api9kw, APIError, LatencyStats
+
+from benchmarks.fake9kw import Fake9kw
+from benchmarks.run import regressions
+
+
+def client(server):
+    stats = LatencyStats(default_delay=0.05, interval=0.05, min_interval=0.01)
+    return api9kw("testkey123", base_url=server.base_url, latency_stats=stats, backoff=0.01)
+
+
+def test_round_trip(png):
+    with Fake9kw(solve_delay=0.1, credits=100) as server, client(server) as api:
+        assert api.base_url == server.base_url
+        assert api.service_status["worker"] == 10
+        future = api.solve_image_captcha(png, maxtimeout=60)
+        id = future.captcha_id
+        assert future.result(timeout=5) == f"answer-{id}"
+        api.captcha_feedback_correct(id)
+        assert api.balance == 90
+        assert server.requests["usercaptchacorrectdata"] >= 1
+
+
+def test_injected_errors_and_rate_limit(png):
+    with Fake9kw(error_rate=1, error_codes=["0002"]) as server, client(server) as api:
+        with pytest.raises(APIError) as e:
+            api.balance
+        assert e.value.code == "0002"
+    with Fake9kw(rate_limit=1) as server, client(server) as api:
+        api.submit_image_captcha(png)
+        with pytest.raises(APIError) as e:
+            api.submit_image_captcha(png)
+        assert e.value.code == "0015"
+
+
+def test_regressions():
+    baseline = {"submit_per_second": 100, "import_seconds": 0.1}
+    assert regressions({"submit_per_second": 90, "import_seconds": 0.11},
+                       baseline, 0.2) == []
+    assert regressions({"submit_per_second": 70, "import_seconds": 0.2},
+                       baseline, 0.2) == ["submit_per_second", "import_seconds"]
@@ -0,0 +1,65 @@
+import threading
+
+from captcha9kw import api9kw, FeedbackDispatcher
+
+from benchmarks.fake9kw import Fake9kw
+
+
+def test_background_feedback_is_queued_and_flushed():
+    release = threading.Event()
+    sent = []
+    with Fake9kw() as server:
+        transport = server.transport()
+        handler = transport.handler
+
+        def slow(method, url, params):
+            if(params.get("action") == "usercaptchacorrectback"):
+                release.wait(5)
+                sent.append((int(params["id"]), params["correct"]))
+            return handler(method, url, params)
+        transport.handler = slow
+        api = api9kw("testkey123", transport=transport,
+                     background_feedback=True)
+        ids = [int(server.respond("/index.cgi", {"action": "usercaptchaupload", "apikey": "x"})[1]["captchaid"])
+               for _ in range(3)]
+        api.captcha_feedback_correct(ids[0])
+        api.captcha_feedback_incorrect(ids[1])
+        api.captcha_feedback_correct(ids[2])
+        assert api.feedback_dispatcher.pending == 3
+        assert sent == []
+        release.set()
+        api.close()
+    assert sent == [(ids[0], 1), (ids[1], 2), (ids[2], 1)]
+
+
+def test_feedback_failures_are_counted():
+    with Fake9kw() as server:
+        api = api9kw("testkey123", transport=server.transport(), retries=0)
+        api.captcha_feedback_correct(999, background=True)
+        dispatcher = api.feedback_dispatcher
+        assert dispatcher.flush(5)
+        assert dispatcher.stats == {"sent": 0, "failed": 1, "dropped": 0}
+        assert dispatcher.pending == 0
+        api.close()
+
+
+def test_close_drops_what_is_left_after_timeout():
+    release = threading.Event()
+    with Fake9kw() as server:
+        transport = server.transport()
+        handler = transport.handler
+
+        def stuck(method, url, params):
+            if(params.get("action") == "usercaptchacorrectback"):
+                release.wait(5)
+            return handler(method, url, params)
+        transport.handler = stuck
+        api = api9kw("testkey123", transport=transport, retries=0)
+        dispatcher = FeedbackDispatcher(api, shutdown_timeout=0.05)
+        for id in range(3):
+            dispatcher.put(id, True)
+        assert not dispatcher.close(0.05, drop=True)
+        assert dispatcher.stats["dropped"] == 2
+        release.set()
+        assert dispatcher.flush(5)
+        api.close()
@@ -0,0 +1,52 @@
+import time
+
+from captcha9kw import HedgedSolver
+
+from benchmarks.fake9kw import Fake9kw
+
+
+LATENCY = {"default_delay": 0.01, "interval": 0.02, "min_interval": 0.01}
+
+
+def test_hedge_wins_and_loser_is_withdrawn(png, make_api):
+    with Fake9kw(solve_delay=0.2) as server:
+        api = make_api(server, LATENCY)
+        with HedgedSolver(api, default_delay=0.1) as solver:
+            future = solver.solve_image_captcha(png, maxtimeout=60)
+            first = future.captcha_id
+            server.captchas[first] = time.monotonic() + 60
+            assert future.result(5) != f"answer-{first}"
+            assert future.captcha_id != first
+        uploads = [params for method, url, params, size in api.transport.requests
+                   if params["action"] == "usercaptchaupload"]
+        assert [params["nomd5"] for params in uploads] == [0, 1]
+        assert server.requests["usercaptchacorrectback"] == 1
+        assert solver.stats == {"solved": 1, "failed": 0, "hedged": 1, "hedges": 1,
+                                "hedge_wins": 1, "cancelled": 1, "overhead_credits": 10}
+        api.close()
+
+
+def test_no_hedge_when_answered_in_time(png, make_api):
+    with Fake9kw(solve_delay=0.05) as server:
+        api = make_api(server, LATENCY)
+        with HedgedSolver(api, default_delay=1) as solver:
+            future = solver.solve_image_captcha(png, maxtimeout=60, prio=2)
+            assert future.result(5) == f"answer-{future.captcha_id}"
+        assert server.requests["usercaptchaupload"] == 1
+        assert solver.stats["hedges"] == 0 and solver.stats["solved"] == 1
+        api.close()
+
+
+def test_cancelling_withdraws_every_submission(png, make_api):
+    with Fake9kw(solve_delay=60) as server:
+        api = make_api(server, LATENCY)
+        with HedgedSolver(api, default_delay=0.05, max_hedges=2) as solver:
+            future = solver.solve_image_captcha(png, maxtimeout=60)
+            deadline = time.monotonic() + 5
+            while(solver.stats["hedges"] < 2 and time.monotonic() < deadline):
+                time.sleep(0.01)
+            future.cancel()
+        assert server.requests["usercaptchaupload"] == 3
+        assert server.requests["usercaptchacorrectback"] == 3
+        assert solver.stats["cancelled"] == 3
+        api.close()
@@ -0,0 +1,39 @@
+import threading
+
+from captcha9kw import api9kw
+from captcha9kw.history import iter_pages, page_records
+
+from .test_captcha9kw import FakeResponse, FakeSession
+
+
+def test_page_records():
+    assert page_records({"status": {}, "data": [{"id": 1}]}) == [{"id": 1}]
+    assert page_records({"status": {}, "list": {"1": {"id": 1}}}) == [{"id": 1}]
+    assert page_records({"status": {}, "count": 0}) == []
+
+
+def test_iter_pages_stops_and_prefetches():
+    fetched = []
+    lock = threading.Lock()
+
+    def fetch(page):
+        with lock:
+            fetched.append(page)
+        if(page < 3):
+            return {"data": [{"page": page, "n": n} for n in range(10)]}
+        return {"data": [{"page": page, "n": 0}]}
+
+    records = list(iter_pages(fetch, prefetch=2, workers=2))
+    assert len(records) == 31
+    assert [r["page"] for r in records[::10]] == [0, 1, 2, 3]
+    assert set(fetched) <= {0, 1, 2, 3, 4, 5}
+
+
+def test_iter_captchas_submitted_treats_no_data_as_end():
+    def handler(method, url, params):
+        if(params["page"] == 0):
+            return FakeResponse({"data": [{"id": 1}, {"id": 2}]})
+        return FakeResponse(b"0006 No data found")
+
+    api = api9kw("testkey123", session=FakeSession(handler))
+    assert [r["id"] for r in api.iter_captchas_submitted(archive=1)] == [1, 2]
@@ -0,0 +1,88 @@
+import base64
+import io
+import mmap
+
+import pytest
+import requests
+
+from captcha9kw.image import open_image
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+
+class Stream(io.RawIOBase):
+    """A readable but not seekable stream.
+    """
+
+    def __init__(self, data):
+        self.__data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.__data.readinto(buffer)
+
+
+@pytest.mark.parametrize("make", [
+    lambda path: PNG,
+    lambda path: bytearray(PNG),
+    lambda path: memoryview(PNG),
+    lambda path: io.BytesIO(PNG),
+    lambda path: Stream(PNG),
+    lambda path: str(path),
+    lambda path: open(path, "rb"),
+    lambda path: base64.b64encode(PNG).decode(),
+])
+def test_sources(tmp_path, make):
+    path = tmp_path / "image.png"
+    path.write_bytes(PNG)
+    with open_image(make(path)) as image:
+        assert image.mime == "image/png"
+        assert image.size == len(PNG)
+        assert image.read() == PNG
+
+
+def test_mmap(tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(PNG)
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            image = open_image(data)
+            assert image.read() == PNG
+            del image
+
+
+def test_rejects_non_images_and_oversized():
+    with pytest.raises(ValueError):
+        open_image(b"definitely not an image")
+    with pytest.raises(ValueError):
+        open_image(PNG, max_size=100)
+    with pytest.raises(ValueError):
+        open_image(Stream(PNG), max_size=100)
+
+
+def test_multipart_body_streams_with_length():
+    image = open_image(io.BytesIO(PNG))
+    body = image.multipart("file-upload-01")
+    request = requests.Request("POST", "https://example.invalid/", data=body, headers={
+                               "Content-Type": body.content_type}).prepare()
+    assert request.headers["Content-Length"] == str(len(body))
+    content = body.read(100) + body.read()
+    assert len(content) == len(body)
+    assert PNG in content
+    assert b'name="file-upload-01"; filename="file-upload-01.png"' in content
+
+
+def test_multipart_body_reads_in_pieces():
+    data = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 1024
+    body = open_image(data).multipart("file-upload-01")
+    whole = b"".join(body)
+    pieces = []
+    for size in (0, 1, 7, 1000, 70000, 10 ** 6):
+        pieces.append(body.read(size))
+    assert pieces[0] == b""
+    assert b"".join(pieces) == whole
+    assert body.read() == b""
+    body.rewind()
+    assert body.read() == whole
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+
+HEAVY = ["requests", "validators", "filetype", "PIL", "httpx", "sqlite3",
+         "importlib.metadata", "asyncio"]
+
+
+def run(code):
+    return subprocess.check_output([sys.executable, "-c", code], text=True).strip()
+
+
+def test_import_loads_no_dependencies():
+    code = f"""
+import sys
+import captcha9kw
+from captcha9kw import api9kw, AnswerPoller, MetricsRecorder
+print(",".join(m for m in {HEAVY!r} if m in sys.modules))
+"""
+    assert run(code) == ""
+
+
+def test_import_time():
+    code = """
+import time
+start = time.perf_counter()
+from captcha9kw import api9kw
+print(time.perf_counter() - start)
+"""
+    assert min(float(run(code)) for _ in range(3)) < 0.08
+
+
+def test_lazy_attributes():
+    code = """
+import captcha9kw
+print(captcha9kw.__version__, captcha9kw.api9kw.__name__, "api9kw" in dir(captcha9kw))
+"""
+    version, name, listed = run(code).split()
+    assert version and name == "api9kw" and listed == "True"
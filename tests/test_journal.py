@@ -0,0 +1,105 @@
+import json
+import time
+
+from captcha9kw import Journal, LatencyStats
+
+from benchmarks.fake9kw import Fake9kw
+
+
+def test_journal_replays_and_compacts(tmp_path):
+    path = str(tmp_path / "journal")
+    with Journal(path, compact_every=100) as journal:
+        journal.submitted(1, maxtimeout=600)
+        journal.submitted(2, maxtimeout=600, interactive=1, prio=3)
+        journal.submitted(3, maxtimeout=600)
+        journal.answered(1, "abc")
+        journal.feedback(1, True)
+        journal.answered(2, "def")
+        journal.closed(3, "cancelled")
+    with open(path, "a") as file:
+        file.write('{"event": "submit", "id": 4, "subm')
+    with Journal(path) as journal:
+        assert list(journal.entries) == [2]
+        assert journal.entries[2]["answer"] == "def"
+        assert journal.entries[2]["prio"] == 3
+        assert journal.unresolved() == []
+        journal.submitted(5, maxtimeout=60)
+        assert journal.expired(time.time() + 61) == [5]
+    with open(path) as file:
+        records = [json.loads(line) for line in file]
+    assert [(r["event"], r["id"]) for r in records] == [
+        ("submit", 2), ("answer", 2), ("submit", 5)]
+
+
+def test_journal_compacts_every(tmp_path):
+    path = str(tmp_path / "journal")
+    with Journal(path, compact_every=10) as journal:
+        for id in range(1, 20):
+            journal.submitted(id)
+            journal.closed(id)
+        with open(path) as file:
+            assert len(file.readlines()) < 10
+        assert len(journal) == 0
+
+
+def test_client_resumes_from_journal(tmp_path, png, make_api):
+    path = str(tmp_path / "journal")
+    stats = LatencyStats(default_delay=0.01, interval=0.01)
+    with Fake9kw(solve_delay=0.1) as server:
+        journal = Journal(path)
+        api = make_api(server, journal=journal, latency_stats=stats)
+        answered = api.submit_image_captcha(png)
+        assert api.get_answer(answered, wait=1) == f"answer-{answered}"
+        pending = api.submit_interactive_captcha("sitekey")
+        done = api.submit_image_captcha(png)
+        api.captcha_cancel_submitted(done)
+        journal.close()
+
+        with open(path, "a") as file:
+            file.write(json.dumps({"event": "submit", "id": 999, "submitted": time.time() - 120,
+                                   "maxtimeout": 60, "interactive": 0, "prio": 0, "confirm": 0}) + "\n")
+        journal = Journal(path)
+        api = make_api(server, journal=journal, latency_stats=stats)
+        futures, expired = api.resume()
+        assert expired == [999]
+        assert set(futures) == {answered, pending}
+        assert futures[answered].result(0) == f"answer-{answered}"
+        assert futures[pending].result(5) == f"answer-{pending}"
+        assert futures[pending].captcha_id == pending
+        api.captcha_feedback_correct(answered)
+        api.captcha_feedback_incorrect(pending)
+        assert journal.entries == {}
+        api.close()
+        journal.close()
+
+
+def test_journal_drops_stale_answers(tmp_path):
+    path = str(tmp_path / "journal")
+    with Journal(path, retention=60) as journal:
+        journal.submitted(1, maxtimeout=600)
+        journal.submitted(2, maxtimeout=600)
+        journal.answered(1, "abc")
+        journal.answered(2, "def")
+        assert journal.expired() == []
+        assert journal.expired(time.time() + 61) == [1, 2]
+    with open(path) as file:
+        lines = [json.loads(line) for line in file]
+    for record in lines:
+        if(record["id"] == 1 and record["event"] == "answer"):
+            record["answered"] -= 120
+    with open(path, "w") as file:
+        file.writelines(json.dumps(record) + "\n" for record in lines)
+    with Journal(path, retention=60) as journal:
+        assert list(journal.entries) == [2]
+
+
+def test_cancelled_future_closes_record(tmp_path, png, make_api):
+    path = str(tmp_path / "journal")
+    with Fake9kw(solve_delay=60) as server, Journal(path) as journal:
+        api = make_api(server, journal=journal)
+        cancelled = api.solve_image_captcha(png)
+        kept = api.solve_image_captcha(png)
+        cancelled.cancel()
+        api.close()
+        assert kept.cancelled()
+        assert list(journal.entries) == [kept.captcha_id]
@@ -0,0 +1,38 @@
+import itertools
+
+from captcha9kw.latency import LatencyStats, captcha_kind
+
+
+def test_default_schedule_backs_off():
+    stats = LatencyStats(default_delay=5, interval=2, backoff=2, max_interval=6)
+    offsets = list(itertools.islice(stats.poll_offsets(captcha_kind()), 5))
+    assert offsets == [5, 7, 11, 17, 23]
+
+
+def test_learned_schedule_starts_near_median():
+    stats = LatencyStats(min_samples=3)
+    kind = captcha_kind(interactive=1, prio=5)
+    for seconds in [20, 30, 40]:
+        stats.record(kind, seconds)
+    assert next(stats.poll_offsets(kind)) == 30
+    # Other kinds keep using the default schedule.
+    assert next(stats.poll_offsets(captcha_kind())) == stats.default_delay
+
+
+def test_snapshot():
+    stats = LatencyStats()
+    kind = captcha_kind(confirm=1)
+    for seconds in range(1, 11):
+        stats.record(kind, seconds)
+    snapshot = stats.snapshot()[kind]
+    assert snapshot["count"] == 10
+    assert snapshot["mean"] == 5.5
+    assert snapshot["p50"] == 5.5
+
+
+def test_late_start_polls_once_now():
+    stats = LatencyStats(default_delay=5, interval=2, backoff=2, max_interval=6)
+    offsets = list(itertools.islice(
+        stats.poll_offsets(captcha_kind(), elapsed=12), 3))
+    assert offsets == [12, 17, 23]
+    assert next(stats.poll_offsets(captcha_kind(), elapsed=3)) == 5
@@ -0,0 +1,58 @@
+from captcha9kw import api9kw, CreditLedger
+
+from .test_captcha9kw import FakeResponse, FakeSession
+
+
+def test_estimate_cost():
+    ledger = CreditLedger(image_cost=10, interactive_cost=30, confirm_cost=6)
+    assert ledger.estimate_cost() == 10
+    assert ledger.estimate_cost(interactive=1, prio=5) == 35
+    assert ledger.estimate_cost(confirm=1) == 16
+    assert ledger.estimate_cost(confirm=1, maxtimeout=100) == 10
+
+
+def test_low_balance_hook_fires_once():
+    fired = []
+    ledger = CreditLedger(threshold=100, on_low_balance=fired.append)
+    ledger.sync(120)
+    ledger.charge(10)
+    ledger.charge(15)
+    ledger.charge(15)
+    assert fired == [95]
+    ledger.sync(500)
+    assert ledger.drift == 80 - 500
+    assert not ledger.needs_sync()
+    ledger.suspect_drift()
+    assert ledger.needs_sync()
+
+
+def test_client_charges_ledger_without_network():
+    def handler(method, url, params):
+        if(params["action"] == "usercaptchaguthaben"):
+            return FakeResponse({"credits": 1000})
+        if(params["action"] == "usercaptchaupload"):
+            return FakeResponse({"captchaid": "1"})
+        return FakeResponse({"transferid": "9"})
+
+    session = FakeSession(handler)
+    api = api9kw("testkey123", session=session,
+                 ledger=CreditLedger(interactive_cost=30))
+    assert api.estimated_balance == 1000
+    api.submit_interactive_captcha("sitekey", prio=2)
+    api.transfer_credits(100, 5)
+    calls = len(session.calls)
+    assert api.estimated_balance == 1000 - 32 - 100
+    assert len(session.calls) == calls
+
+
+def test_balance_error_marks_drift():
+    session = FakeSession(lambda method, url, params: FakeResponse(
+        b"0011 Balance insufficient"))
+    ledger = CreditLedger()
+    ledger.sync(1000)
+    api = api9kw("testkey123", session=session, ledger=ledger)
+    try:
+        api.submit_interactive_captcha("sitekey")
+    except RuntimeError:
+        pass
+    assert ledger.needs_sync()
@@ -0,0 +1,106 @@
+import threading
+
+from captcha9kw import api9kw, LoadController
+
+from .test_captcha9kw import FakeResponse, FakeSession
+
+
+class FakeStatusApi:
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    @property
+    def service_status(self):
+        self.calls += 1
+        return dict(self.status)
+
+
+def test_choose_from_load():
+    api = FakeStatusApi({"queue": 10, "worker": 10, "avg1h": 20})
+    controller = LoadController(api, latency_target=60, start=False)
+    assert controller.choose() == (0, 600)
+    assert controller.choose(maxtimeout=300) == (0, 300)
+    controller.sample()
+    assert controller.load == 1
+    assert controller.expected_latency == 40
+    assert controller.choose() == (0, 120)
+    assert controller.choose(latency_target=20) == (20, 80)
+    assert controller.choose(latency_target=20, confirm=1) == (20, 150)
+    api.status["queue"] = 50
+    controller.sample()
+    prio, maxtimeout = controller.choose()
+    assert 0 < prio <= 20
+    assert maxtimeout == 240
+
+
+def test_samples_are_cached():
+    api = FakeStatusApi({"queue": 0, "worker": 5, "avg1h": 10})
+    controller = LoadController(api, interval=60)
+    try:
+        controller.wait_for_capacity(timeout=1)
+        for _ in range(10):
+            controller.choose()
+        assert api.calls == 1
+    finally:
+        controller.close()
+
+
+def test_wait_for_capacity():
+    api = FakeStatusApi({"queue": 100, "worker": 5, "avg1h": 10})
+    controller = LoadController(api, saturation=3, start=False)
+    controller.sample()
+    assert controller.saturated
+    assert not controller.wait_for_capacity(timeout=0.05)
+
+    def drain():
+        api.status["queue"] = 5
+        controller.sample()
+    timer = threading.Timer(0.05, drain)
+    timer.start()
+    assert controller.wait_for_capacity(timeout=5)
+    timer.join()
+
+
+def test_submission_uses_controller():
+    def handler(method, url, params):
+        return FakeResponse({"captchaid": "1"})
+
+    session = FakeSession(handler)
+    controller = LoadController(FakeStatusApi(
+        {"queue": 40, "worker": 10, "avg1h": 15}), latency_target=60, start=False)
+    controller.sample()
+    api = api9kw("testkey123", session=session, load_controller=controller)
+    api.submit_interactive_captcha("sitekey")
+    params = session.calls[-1][2]
+    assert params["prio"] == 5 and params["maxtimeout"] == 150
+    api.submit_interactive_captcha("sitekey", prio=0, maxtimeout=90)
+    params = session.calls[-1][2]
+    assert params["prio"] == 0 and params["maxtimeout"] == 90
+    api.load_controller = None
+    api.submit_interactive_captcha("sitekey")
+    params = session.calls[-1][2]
+    assert params["prio"] == 0 and params["maxtimeout"] == 600
+
+
+def test_choose_submission():
+    controller = LoadController(FakeStatusApi(
+        {"queue": 40, "worker": 10, "avg1h": 15}), latency_target=60, start=False)
+    controller.sample()
+    api = api9kw("testkey123", session=FakeSession(lambda *args: None))
+    assert api.choose_submission() == (0, 600)
+    assert api.choose_submission(prio=3) == (3, 600)
+    api.load_controller = controller
+    assert api.choose_submission() == (5, 150)
+    assert api.choose_submission(maxtimeout=90) == (5, 90)
+
+
+def test_choose_before_first_sample():
+    controller = LoadController(FakeStatusApi(
+        {"queue": 0, "worker": 10, "avg1h": 15}), latency_target=30, start=False)
+    api = api9kw("testkey123", session=FakeSession(lambda *args: None),
+                 load_controller=controller)
+    assert api.choose_submission() == (0, 600)
+    controller.sample()
+    assert api.choose_submission() == (0, 60)
+    assert api.choose_submission(confirm=1) == (0, 150)
@@ -0,0 +1,74 @@
+import requests
+
+from captcha9kw import api9kw, MetricsRecorder
+
+from .test_captcha9kw import FakeResponse, FakeSession
+
+
+def test_no_hooks_no_events():
+    session = FakeSession(lambda method, url, params: FakeResponse(
+        {"credits": 10}))
+    api = api9kw("testkey123", session=session)
+    assert api.hooks == []
+    assert api.balance == 10
+
+
+def test_events_and_metrics(png):
+    polls = {"count": 0}
+
+    def handler(method, url, params):
+        if(params["action"] == "usercaptchaupload"):
+            return FakeResponse({"captchaid": "7"})
+        if(params["action"] == "usercaptchacorrectdata"):
+            polls["count"] += 1
+            if(polls["count"] == 1):
+                raise requests.ConnectionError("reset")
+            if(polls["count"] == 2):
+                return FakeResponse({"answer": "", "try_again": 1})
+            return FakeResponse({"answer": "abc"})
+        return FakeResponse(b"0002 API key not found")
+
+    events = []
+    recorder = MetricsRecorder()
+    api = api9kw("testkey123", session=FakeSession(handler), backoff=0,
+                 hooks=[lambda event, fields: events.append(event), recorder])
+    id = api.submit_image_captcha(png)
+    assert api.get_answer(id) == ""
+    assert api.get_answer(id) == "abc"
+    try:
+        api.balance
+    except Exception:
+        pass
+    assert events.count("image") == 1
+    assert events.count("retry") == 1
+    assert events.count("poll") == 2
+    assert events.count("answer") == 1
+
+    snapshot = recorder.snapshot()
+    assert snapshot["polls_total"][()] == 2
+    assert snapshot["polls_per_captcha"][()]["sum"] == 2
+    assert snapshot["answer_seconds"][(("kind", "image"),)]["count"] == 1
+    assert snapshot["image_bytes_total"][()] == len(png)
+    upload = (("action", "usercaptchaupload"),)
+    assert snapshot["sent_bytes_total"][upload] > len(png)
+    poll = (("action", "usercaptchacorrectdata"),)
+    assert snapshot["request_seconds"][poll]["count"] == 3
+    assert snapshot["errors_total"][poll + (("code", "ConnectionError"),)] == 1
+    assert snapshot["retries_total"][poll + (("code", ""),)] == 1
+    assert snapshot["errors_total"][(("action", "usercaptchaguthaben"),
+                                     ("code", "0002"))] == 1
+
+    text = recorder.prometheus()
+    assert "# TYPE captcha9kw_request_seconds histogram" in text
+    assert 'captcha9kw_polls_total 2' in text
+    assert 'captcha9kw_request_seconds_bucket{action="usercaptchaupload",le="+Inf"} 1' in text
+
+
+def test_failing_hook_is_ignored():
+    def hook(event, fields):
+        raise RuntimeError("broken")
+
+    session = FakeSession(lambda method, url, params: FakeResponse(
+        {"credits": 10}))
+    api = api9kw("testkey123", session=session, hooks=[hook])
+    assert api.balance == 10
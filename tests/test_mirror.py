@@ -0,0 +1,49 @@
+from captcha9kw import api9kw
+from captcha9kw.mirror import HistoryMirror
+
+from .test_captcha9kw import FakeResponse, FakeSession
+
+
+class History:
+    """Serves newest-first history pages of 10 records.
+    """
+
+    def __init__(self):
+        self.submitted = []
+        self.failed = []
+        self.requests = 0
+
+    def add(self, id, source="bot", solvetime=10, failed=False):
+        record = {"id": str(id), "time": "2026-01-01 12:00:00",
+                  "source": source, "solvetime": solvetime}
+        self.submitted.insert(0, record)
+        if(failed):
+            self.failed.insert(0, record)
+
+    def __call__(self, method, url, params):
+        self.requests += 1
+        records = {"userhistory": self.submitted, "userhistory2": [],
+                   "userhistory3": self.failed}[params["action"]]
+        page = params["page"]
+        return FakeResponse({"data": records[page * 10:page * 10 + 10]})
+
+
+def test_incremental_sync_and_queries(tmp_path):
+    history = History()
+    for id in range(1, 26):
+        history.add(id, source="a" if id % 2 else "b",
+                    solvetime=id, failed=id % 5 == 0)
+    api = api9kw("testkey123", session=FakeSession(history))
+    with HistoryMirror(api, str(tmp_path / "history.db")) as mirror:
+        assert mirror.sync() == {"submitted": 25, "solved": 0, "failed": 5}
+        assert mirror.checkpoint("submitted") == 25
+        history.add(26, source="b", solvetime=26)
+        history.requests = 0
+        assert mirror.sync(["submitted"]) == {"submitted": 1}
+        assert history.requests <= 3
+        percentiles = mirror.solve_time_percentiles((0.5, 1))
+        assert percentiles == {0.5: 13.5, 1: 26}
+        rates = mirror.failure_rate_by_source()
+        assert rates == {"a": 3 / 13, "b": 2 / 13}
+        assert mirror.query(
+            "SELECT COUNT(*) FROM records WHERE timestamp IS NOT NULL")[0][0] == 31
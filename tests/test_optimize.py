@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from captcha9kw import api9kw, ImageOptimizer
+
+from .test_captcha9kw import FakeResponse, FakeSession
+
+
+def noisy_png(width=400, height=300):
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, "PNG")
+    return output.getvalue()
+
+
+def test_fits_pixel_and_byte_budget():
+    data = noisy_png()
+    reports = []
+    optimizer = ImageOptimizer(max_bytes=20000, max_pixels=200 * 150,
+                               format="JPEG", on_report=reports.append)
+    results, report = optimizer.optimize(data)
+    assert reports == [report]
+    assert report.original_size == len(data)
+    assert report.optimized_size == len(results) <= 20000
+    assert report.optimized_dimensions[0] * \
+        report.optimized_dimensions[1] <= 200 * 150
+    assert optimizer.totals["images"] == 1
+
+
+def test_crop():
+    optimizer = ImageOptimizer(crop=(0, 0, 50, 40))
+    report = optimizer.optimize(noisy_png())[1]
+    assert report.optimized_dimensions == (50, 40)
+
+
+def test_client_uploads_optimized_image():
+    sizes = []
+
+    def handler(method, url, params):
+        return FakeResponse({"captchaid": "1"})
+
+    session = FakeSession(handler)
+    optimizer = ImageOptimizer(max_bytes=10000, format="WEBP",
+                               on_report=lambda report: sizes.append(report.optimized_size))
+    api = api9kw("testkey123", session=session, optimizer=optimizer)
+    api.submit_image_captcha(noisy_png())
+    assert sizes and sizes[0] <= 10000
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from captcha9kw import CaptchaError
+from captcha9kw.latency import LatencyStats
+from captcha9kw.poller import AnswerPoller
+
+from .test_captcha9kw import FakeResponse
+
+
+def fast_stats():
+    return LatencyStats(default_delay=0, interval=0.01, min_interval=0.01, max_interval=0.01)
+
+
+def answering(answers):
+    def handler(method, url, params):
+        return FakeResponse(answers[params["id"]](params))
+    return handler
+
+
+def test_futures_resolve_from_one_poller(make_session_api):
+    polls = {1: 0, 2: 0}
+
+    def slow(params):
+        polls[params["id"]] += 1
+        if(polls[params["id"]] < 3):
+            return {"answer": "", "try_again": 1}
+        return {"answer": f"answer{params['id']}"}
+
+    api = make_session_api(answering({1: slow, 2: slow}))
+    poller = AnswerPoller(api, workers=2, stats=fast_stats())
+    futures = [poller.watch(1), poller.watch(2)]
+    assert [f.result(timeout=5) for f in futures] == ["answer1", "answer2"]
+    assert poller.pending == 0
+    poller.close()
+
+
+def test_future_raises_on_try_again_zero(make_session_api):
+    api = make_session_api(answering({1: lambda params: {"answer": "", "try_again": 0}}))
+    poller = AnswerPoller(api, stats=fast_stats())
+    with pytest.raises(CaptchaError):
+        poller.watch(1).result(timeout=5)
+    poller.close()
+
+
+def test_future_raises_on_deadline(make_session_api):
+    api = make_session_api(answering({1: lambda params: {"answer": "", "try_again": 1}}))
+    poller = AnswerPoller(api, stats=fast_stats())
+    with pytest.raises(CaptchaError):
+        poller.watch(1, timeout=0.05).result(timeout=5)
+    poller.close()
+
+
+def test_close_cancels_pending(make_session_api):
+    api = make_session_api(answering({1: lambda params: {"answer": "", "try_again": 1}}))
+    poller = AnswerPoller(api)
+    future = poller.watch(1)
+    poller.close()
+    assert future.cancelled()
+
+
+def late_stats():
+    return LatencyStats(default_delay=0.01, interval=0.2, min_interval=0.2, max_interval=0.2, backoff=1)
+
+
+def test_late_watch_polls_once_now(make_session_api):
+    times = []
+
+    def answer(params):
+        times.append(time.monotonic())
+        return {"answer": "abc" if len(times) > 1 else "", "try_again": 1}
+
+    api = make_session_api(answering({1: answer}))
+    poller = AnswerPoller(api, stats=late_stats())
+    start = time.monotonic()
+    future = poller.watch(1, submitted=start - 10)
+    assert future.result(timeout=5) == "abc"
+    assert len(times) == 2
+    assert times[0] - start < 0.1 and times[1] - times[0] >= 0.15
+    poller.close()
+
+
+def test_late_get_answer_polls_once_now(make_session_api):
+    times = []
+
+    def handler(method, url, params):
+        if(params["action"] == "usercaptchaupload"):
+            return FakeResponse({"captchaid": "1"})
+        times.append(time.monotonic())
+        return FakeResponse({"answer": "abc" if len(times) > 1 else "", "try_again": 1})
+
+    api = make_session_api(handler, latency_stats=late_stats())
+    id = api.submit_interactive_captcha("sitekey")
+    time.sleep(0.5)
+    start = time.monotonic()
+    assert api.get_answer(id, wait=1) == "abc"
+    assert len(times) == 2
+    assert times[0] - start < 0.1 and times[1] - times[0] >= 0.15
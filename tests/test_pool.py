@@ -0,0 +1,124 @@
+import pytest
+
+from captcha9kw import AnswerCache, FatalAPIError, KeyPool, LatencyStats, RetryableAPIError
+from captcha9kw.transport import MemoryResponse, MemoryTransport
+
+
+class Service:
+    """Answers for several keys, numbering captchas globally.
+    """
+
+    def __init__(self):
+        self.next_id = 1
+        self.errors = {}
+        self.credits = {}
+        self.calls = []
+
+    def handler(self, method, url, params):
+        key, action = params["apikey"], params["action"]
+        self.calls.append((key, action, params.get("id")))
+        if(key in self.errors):
+            code = self.errors[key]
+            return MemoryResponse({"status": {"success": False}, "error": f"{code} error"})
+        if(action == "usercaptchaupload"):
+            self.next_id += 1
+            return {"captchaid": str(self.next_id)}
+        if(action == "usercaptchacorrectdata"):
+            return {"answer": "ok"}
+        if(action == "usercaptchaguthaben"):
+            return {"credits": self.credits.get(key, 1000)}
+        return {}
+
+
+def make_pool(service, keys=("keyaaaaa", "keybbbbb", "keyccccc"), **options):
+    return KeyPool(keys, transport=MemoryTransport(service.handler), retries=0, **options)
+
+
+def test_least_outstanding_and_ownership():
+    service = Service()
+    pool = make_pool(service)
+    ids = [pool.submit_interactive_captcha("sitekey") for _ in range(3)]
+    owners = [key for key, action, _ in service.calls if action ==
+              "usercaptchaupload"]
+    assert sorted(owners) == ["keyaaaaa", "keybbbbb", "keyccccc"]
+    assert pool.outstanding == dict.fromkeys(owners, 1)
+    for id, owner in zip(ids, owners):
+        assert pool.get_answer(id) == "ok"
+        assert service.calls[-1] == (owner, "usercaptchacorrectdata", id)
+        pool.captcha_feedback_correct(id)
+        assert service.calls[-1][0] == owner
+    assert pool.outstanding == dict.fromkeys(owners, 0)
+    with pytest.raises(KeyError):
+        pool.get_answer(12345)
+
+
+def test_weighted_round_robin():
+    service = Service()
+    pool = make_pool(service, keys=["keyaaaaa", "keybbbbb"], strategy="round_robin",
+                     weights={"keyaaaaa": 3})
+    for _ in range(8):
+        pool.submit_interactive_captcha("sitekey")
+    owners = [key for key, action, _ in service.calls if action ==
+              "usercaptchaupload"]
+    assert owners.count("keyaaaaa") == 6 and owners.count("keybbbbb") == 2
+
+
+def test_bad_keys_leave_rotation(png):
+    service = Service()
+    service.errors = {"keyaaaaa": "0002", "keybbbbb": "0056"}
+    pool = make_pool(service)
+    id = pool.submit_image_captcha(png)
+    assert pool.client_for(id).api_key == "keyccccc"
+    assert pool.disabled == {"keyaaaaa": "0002"}
+    assert pool.active_keys == ["keyccccc"]
+    service.errors["keyccccc"] = "0011"
+    with pytest.raises(RetryableAPIError):
+        pool.submit_interactive_captcha("sitekey")
+    assert pool.disabled == {"keyaaaaa": "0002", "keyccccc": "0011"}
+    pool.enable("keybbbbb")
+    service.errors.pop("keybbbbb")
+    assert pool.client_for(pool.submit_interactive_captcha("sitekey")).api_key == "keybbbbb"
+    pool.disable("keybbbbb")
+    with pytest.raises(FatalAPIError):
+        pool.submit_interactive_captcha("sitekey")
+
+
+def test_futures_release_keys():
+    service = Service()
+    pool = make_pool(service, keys=["keyaaaaa"],
+                     latency_stats=LatencyStats(default_delay=0.01))
+    future = pool.solve_interactive_captcha("sitekey")
+    assert future.result(timeout=10) == "ok"
+    pool.clients["keyaaaaa"].close()
+    assert pool.outstanding == {"keyaaaaa": 0}
+
+
+def test_failover_with_cache_reads_file_again(tmp_path, png):
+    path = tmp_path / "captcha.png"
+    path.write_bytes(png)
+    service = Service()
+    pool = make_pool(service, keys=["keyaaaaa", "keybbbbb"], answer_cache=AnswerCache(),
+                     latency_stats=LatencyStats(default_delay=0.01))
+    pool.clients["keyaaaaa"].balance
+    service.errors = {"keyaaaaa": "0002"}
+    future = pool.solve_image_captcha(str(path))
+    assert future.result(timeout=10) == "ok"
+    assert pool.client_for(future.captcha_id).api_key == "keybbbbb"
+
+
+def test_balances_synced_and_poor_keys_skipped():
+    service = Service()
+    service.credits = {"keyaaaaa": 5}
+    pool = make_pool(service, keys=["keyaaaaa", "keybbbbb"])
+    assert pool.balances == {"keyaaaaa": None, "keybbbbb": None}
+    id = pool.submit_interactive_captcha("sitekey")
+    assert pool.client_for(id).api_key == "keybbbbb"
+    assert pool.balances["keyaaaaa"] == 5
+    assert pool.balances["keybbbbb"] < 1000
+    uploads = [key for key, action, _ in service.calls if action ==
+               "usercaptchaupload"]
+    assert uploads == ["keybbbbb"]
+    service.credits["keybbbbb"] = 0
+    pool.clients["keybbbbb"].balance
+    with pytest.raises(FatalAPIError):
+        pool.submit_interactive_captcha("sitekey")
@@ -0,0 +1,47 @@
+import time
+
+from captcha9kw import api9kw, RateLimiter, TokenBucket
+
+from .test_captcha9kw import FakeResponse, FakeSession
+
+
+def test_bucket_limits_rate():
+    bucket = TokenBucket(rate=100, burst=1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+    bucket = TokenBucket(rate=1, burst=1)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0)
+
+
+def test_throttle_and_relax():
+    bucket = TokenBucket(rate=10, min_rate=2, recovery=0.1, cooldown=0)
+    bucket.throttle()
+    bucket.throttle()
+    bucket.throttle()
+    assert bucket.rate == 2
+    bucket.relax()
+    assert bucket.rate == 3
+    for _ in range(20):
+        bucket.relax()
+    assert bucket.rate == 10
+
+
+def test_categories():
+    limiter = RateLimiter(poll=None)
+    assert limiter.category("usercaptchaupload") == "upload"
+    assert limiter.category("userconfig") == "default"
+    assert "poll" not in limiter.buckets
+
+
+def test_client_throttles_on_too_quickly():
+    responses = [FakeResponse(b"0015 Captcha submitted too quickly."),
+                 FakeResponse({"captchaid": "1"})]
+    limiter = RateLimiter(upload=50)
+    api = api9kw("testkey123", session=FakeSession(
+        lambda method, url, params: responses.pop(0)), rate_limiter=limiter, backoff=0)
+    # The refused submission is retried once the limiter allows it.
+    assert api.submit_interactive_captcha("sitekey") == 1
+    assert limiter.buckets["upload"].rate == 25
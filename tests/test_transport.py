@@ -0,0 +1,57 @@
+import pytest
+
+from captcha9kw import (api9kw, APIError, HttpxTransport, MemoryResponse,
+                        MemoryTransport)
+
+from benchmarks.fake9kw import Fake9kw
+
+
+def test_memory_transport(png):
+    def handler(method, url, params):
+        if(url.endswith("servercheck.json")):
+            return {"queue": 1}
+        if(params["action"] == "usercaptchaupload"):
+            return {"captchaid": "5"}
+        return MemoryResponse(b"", 503, "Service Unavailable")
+
+    transport = MemoryTransport(handler, base_url="http://fake.test")
+    api = api9kw("testkey123", transport=transport, backoff=0)
+    assert api.base_url == "http://fake.test/"
+    assert api.service_status["queue"] == 1
+    assert api.submit_image_captcha(png) == 5
+    method, url, params, size = transport.requests[-1]
+    assert (method, url) == ("POST", "http://fake.test/index.cgi")
+    assert size > len(png)
+    with pytest.raises(APIError) as e:
+        api.balance
+    assert e.value.code == "503"
+    assert len(transport.requests) == 2 + 3
+
+
+def test_memory_transport_download(png):
+    transport = MemoryTransport(
+        lambda method, url, params: MemoryResponse(png))
+    api = api9kw("testkey123", transport=transport)
+    transport.handler = lambda method, url, params: (
+        MemoryResponse(png) if url.endswith(".png") else {"captchaid": "1"})
+    assert api.submit_image_captcha("https://images.test/captcha.png") == 1
+    assert transport.requests[0][1] == "https://images.test/captcha.png"
+
+
+def test_fake_server_in_memory(png, make_api):
+    with Fake9kw(solve_delay=0) as server:
+        api = make_api(server, {"default_delay": 0, "interval": 0.01})
+        id = api.submit_image_captcha(png)
+        assert api.get_answer(id, wait=1) == f"answer-{id}"
+
+
+def test_httpx_transport(png):
+    with Fake9kw(solve_delay=0) as server:
+        transport = HttpxTransport(base_url=server.base_url, timeout=(1, 1))
+        with api9kw("testkey123", transport=transport) as api:
+            id = api.submit_image_captcha(png)
+            assert api.get_answer(id) == f"answer-{id}"
+            with pytest.raises(APIError) as e:
+                api.captcha_feedback_correct(12345)
+            assert e.value.code == "0018"
+        transport.close()
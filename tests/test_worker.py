@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from captcha9kw import APIError, SolverWorker
+
+from benchmarks.fake9kw import Fake9kw
+
+
+def test_worker_actions(png, make_api):
+    with Fake9kw() as server:
+        api = make_api(server)
+        assert api.fetch_captcha() is None
+        id = server.add_task(png)
+        task = api.fetch_captcha()
+        assert int(task["captchaid"]) == id
+        assert api.show_captcha(id) == png
+        api.skip_captcha(id)
+        assert list(server.tasks) == [id]
+        api.answer_captcha(id, "abc")
+        assert server.solutions == {id: "abc"}
+        with pytest.raises(APIError) as e:
+            api.answer_captcha(id, "abc")
+        assert e.value.code == "0012"
+        with pytest.raises(APIError) as e:
+            api.show_captcha(999)
+        assert e.value.code == "0008"
+
+
+def test_worker_prefetches_while_solving(png, make_api):
+    with Fake9kw() as server:
+        ids = [server.add_task(png) for _ in range(5)]
+        api = make_api(server)
+        worker = SolverWorker(api, prefetch=1, idle_delay=0.01)
+        fetched = []
+
+        def solve(task):
+            assert task.image == png
+            time.sleep(0.05)
+            fetched.append(server.requests["usercaptchanew"])
+            return None if task.id == ids[2] else f"solved-{task.id}"
+
+        stats = worker.run(solve, max_tasks=5)
+        assert stats["solved"] == 4 and stats["skipped"] == 1
+        assert fetched[0] >= 2
+        assert set(server.solutions) == set(ids) - {ids[2]}
+        assert list(server.tasks) == [ids[2]]
+
+
+def test_worker_stop_skips_prefetched(png, make_api):
+    with Fake9kw() as server:
+        for _ in range(3):
+            server.add_task(png)
+        api = make_api(server)
+        worker = SolverWorker(api, prefetch=2, idle_delay=0.01)
+
+        def solve(task):
+            worker.stop()
+            return "x"
+
+        worker.run(solve)
+        assert len(server.solutions) == 1
+        assert len(server.tasks) == 2
+
+
+def test_worker_counts_failed_answer_and_carries_on(png, make_api):
+    with Fake9kw() as server:
+        ids = [server.add_task(png) for _ in range(4)]
+        api = make_api(server)
+        worker = SolverWorker(api, prefetch=0, idle_delay=0.01)
+
+        def solve(task):
+            if(task.id == ids[1]):
+                server.solutions[task.id] = "taken"
+            return f"solved-{task.id}"
+
+        stats = worker.run(solve, max_tasks=4)
+        assert stats["solved"] == 3 and stats["failed"] == 1
+        assert server.solutions[ids[1]] == "taken"
+        assert set(server.solutions) == set(ids)